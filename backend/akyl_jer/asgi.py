@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "akyl_jer.settings")
 
 application = get_asgi_application()
+
+# Open connections, prime caches and precompute dashboards when WARMUP_ON_STARTUP is set
+from core.warmup import on_startup  # noqa: E402
+
+on_startup()
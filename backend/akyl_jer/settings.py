@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "core.middleware.LoadSheddingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -51,6 +55,9 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.ReplicaPinningMiddleware",
+    "core.middleware.ProfilingMiddleware",
+    "core.middleware.IdempotencyMiddleware",
 ]
 
 ROOT_URLCONF = "akyl_jer.urls"
@@ -83,6 +90,76 @@ DATABASES = {
     }
 }
 
+# Opt-in production SQLite profile: WAL journal, tuned pragmas and a single
+# in-process writer queue. Enable with AKYL_JER_SQLITE_PROFILE=production.
+if os.environ.get("AKYL_JER_SQLITE_PROFILE") == "production":
+    DATABASES["default"].update({
+        "ENGINE": "core.backends.sqlite_wal",
+        # Keep connections (and their warmed page cache) across requests
+        "CONN_MAX_AGE": 300,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "transaction_mode": "IMMEDIATE",
+            "pragmas": {
+                "journal_mode": "WAL",
+                "synchronous": "NORMAL",
+                "busy_timeout": 5000,
+                "mmap_size": 256 * 1024 * 1024,
+                "cache_size": -64 * 1024,
+            },
+        },
+    })
+
+
+# Read replicas: AKYL_JER_DB_REPLICAS="/path/replica1.sqlite3,/path/replica2.sqlite3"
+# adds one alias per file (for Postgres replicas, add the aliases to DATABASES
+# and list them here). Safe-method requests read from a replica; writes, the
+# writing client's next REPLICA_PIN_SECONDS of reads and everything outside a
+# request (worker, management commands) use the primary.
+DATABASE_REPLICAS = []
+for _index, _name in enumerate(filter(None, os.environ.get("AKYL_JER_DB_REPLICAS", "").split(","))):
+    _alias = f"replica{_index + 1}"
+    DATABASES[_alias] = {
+        **DATABASES["default"],
+        "NAME": _name.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ["core.routers.PrimaryReplicaRouter"]
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# Throttle buckets (core.throttling), cache generations and precomputed payloads
+# (core.caching) must be shared by every web and worker process, with atomic
+# increments and O(1) writes. Whenever more than one process runs, set
+# AKYL_JER_REDIS_URL (pip install redis) or AKYL_JER_MEMCACHED_LOCATION
+# (host:port[,host:port], pip install pymemcache); manage.py run_worker refuses to
+# start and `manage.py check --deploy` fails without one. Otherwise each process
+# keeps its own memory cache, which only suits a single runserver and the tests.
+
+if os.environ.get("AKYL_JER_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["AKYL_JER_REDIS_URL"],
+        }
+    }
+elif os.environ.get("AKYL_JER_MEMCACHED_LOCATION"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": os.environ["AKYL_JER_MEMCACHED_LOCATION"].split(","),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -120,6 +197,9 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded job inputs and downloadable job results
+MEDIA_ROOT = BASE_DIR / "media"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -129,3 +209,115 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
 ]
+CORS_EXPOSE_HEADERS = ["X-Missing-Ids", "Retry-After", "Idempotent-Replayed"]
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key", "x-profile")
+
+# Live updates (Server-Sent Events)
+# Swap for a broker-backed implementation of core.pubsub.BaseBroker to fan out
+# across several ASGI processes.
+PUBSUB_BACKEND = "core.pubsub.InProcessBroker"
+LIVE_UPDATES_HEARTBEAT_SECONDS = 15
+
+# Upper bound on threads used by the async dashboard to run aggregates concurrently
+DASHBOARD_AGGREGATE_WORKERS = 5
+
+# Archival of resolved events and crop issues (manage.py archive_resolved)
+ARCHIVE_RESOLVED_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 1000
+
+# Largest radius accepted by /api/events/{id}/at-risk/
+AT_RISK_MAX_RADIUS_KM = 200
+
+# How long aggregate payloads stay cached when no model signal invalidates them
+STATS_CACHE_SECONDS = 300
+
+# Farm risk scoring (manage.py refresh_risk_scores)
+RISK_DISTANCE_SCALE_KM = 10
+RISK_MAX_DISTANCE_KM = 50
+RISK_CROP_ISSUE_WINDOW_DAYS = 30
+RISK_BATCH_SIZE = 2000
+RISK_WRITE_BATCH_SIZE = 500
+
+# Vaccination coverage (manage.py refresh_vaccination_coverage): a herd counts as
+# vaccinated when its farm had a vaccination event within this many days
+VACCINATION_COVERAGE_WINDOW_DAYS = 365
+
+# Recent outbreaks/crop issues returned by /api/dashboard/bundle/ (?limit= up to the max)
+DASHBOARD_BUNDLE_LIMIT = 10
+DASHBOARD_BUNDLE_MAX_LIMIT = 50
+
+# Most ids accepted by ?ids= on the farm, event and crop issue lists
+BATCH_IDS_MAX = 100
+
+# Page sizes for /api/farms/{id}/timeline/ (?limit= up to the max)
+TIMELINE_PAGE_SIZE = 50
+TIMELINE_MAX_PAGE_SIZE = 200
+
+# Admin changelists over large tables cache their exact row count in the shared
+# cache until rows are created or deleted, or for at most this long; the
+# precompute scheduler below recounts unfiltered ones
+ADMIN_COUNT_CACHE_SECONDS = 300
+
+# Farm registry import (manage.py import_farms, POST /api/farms/import/): rows per transaction
+IMPORT_CHUNK_SIZE = 500
+
+# Background jobs (manage.py run_worker)
+JOB_WORKER_THREADS = 4
+JOB_POLL_SECONDS = 2
+JOB_RETRY_BACKOFF_SECONDS = 30  # doubled after each failed attempt
+JOB_STALE_SECONDS = 3600  # running jobs locked longer than this are requeued
+JOB_HEARTBEAT_SECONDS = 60  # how often a worker refreshes the lock of a job it is running
+
+# Warm-up when the WSGI/ASGI app loads (core.warmup): open database connections,
+# prime lookup caches and precompute dashboard payloads and admin changelist counts,
+# then keep recomputing them every DASHBOARD_PRECOMPUTE_SECONDS (0 disables).
+# Enable with AKYL_JER_WARMUP=1.
+WARMUP_ON_STARTUP = os.environ.get("AKYL_JER_WARMUP") == "1"
+DASHBOARD_PRECOMPUTE_SECONDS = 60
+
+# Staff request profiling (?_profile=1 or X-Profile: 1, see core.middleware.ProfilingMiddleware):
+# stack sampling interval, and a directory to also keep each report in (None: only return it)
+PROFILE_SAMPLE_INTERVAL_MS = 1
+PROFILE_STORE_DIR = None
+
+# Token bucket throttles per client and endpoint (core.throttling.TokenBucketThrottle),
+# with separate budgets for reads and writes: up to "burst" requests at once, then
+# "per_second". Buckets live in the shared default cache (see CACHES).
+REST_FRAMEWORK = {
+    "DEFAULT_THROTTLE_CLASSES": ["core.throttling.TokenBucketThrottle"],
+}
+THROTTLE_BUDGETS = {
+    "read": {"burst": 300, "per_second": 20},
+    "write": {"burst": 60, "per_second": 2},
+}
+
+# Load shedding (core.middleware.LoadSheddingMiddleware): while the moving average of
+# database wait (query time and writer lock queueing, sampled from non-exempt requests)
+# is above LOAD_SHED_LATENCY_MS (0 disables), reads get 503 + Retry-After
+LOAD_SHED_LATENCY_MS = 250
+LOAD_SHED_EWMA_ALPHA = 0.1
+LOAD_SHED_IDLE_HALF_LIFE_SECONDS = 5
+LOAD_SHED_RETRY_AFTER_SECONDS = 5
+LOAD_SHED_EXEMPT_PATHS = ["/api/health/", "/admin/"]
+
+# Idempotency-Key on POST requests (core.idempotency): how long a key's response is
+# replayed, when an unfinished first request counts as abandoned, and rows deleted
+# per batch by manage.py sweep_idempotency_keys
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60
+IDEMPOTENCY_IN_FLIGHT_SECONDS = 60
+IDEMPOTENCY_SWEEP_BATCH_SIZE = 1000
+
+# Near-duplicate reports (core.duplicates): a new event or crop issue repeats an earlier
+# one of the same farm and type created within DUPLICATE_WINDOW_DAYS when their texts'
+# estimated Jaccard similarity is at least DUPLICATE_SIMILARITY
+DUPLICATE_WINDOW_DAYS = 14
+DUPLICATE_SIMILARITY = 0.6
+
+# Farm entity resolution (core.merging): farms sharing a phone, or a district and a
+# phonetic name key, are compared when the block has at most FARM_BLOCK_MAX_SIZE farms.
+# Pairs need a name similarity of FARM_MATCH_MIN_NAME_SIMILARITY; those scoring
+# FARM_MATCH_THRESHOLD are merged, FARM_MATCH_REVIEW_THRESHOLD only reported
+FARM_BLOCK_MAX_SIZE = 50
+FARM_MATCH_MIN_NAME_SIMILARITY = 0.85
+FARM_MATCH_THRESHOLD = 0.85
+FARM_MATCH_REVIEW_THRESHOLD = 0.6
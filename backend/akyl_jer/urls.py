@@ -18,7 +18,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from core.views import health, api_root, dashboard_summary, DistrictViewSet, FarmViewSet, EventViewSet, CropIssueViewSet
+from core.views import health, api_root, dashboard_summary, dashboard_bundle, crop_issue_stats, vaccination_coverage, dashboard_summary_async, live_updates, DistrictViewSet, FarmViewSet, EventViewSet, CropIssueViewSet, JobViewSet
 
 # Create router for DRF viewsets
 router = DefaultRouter()
@@ -26,11 +26,17 @@ router.register(r'districts', DistrictViewSet, basename='district')
 router.register(r'farms', FarmViewSet, basename='farm')
 router.register(r'events', EventViewSet, basename='event')
 router.register(r'crop-issues', CropIssueViewSet, basename='cropissue')
+router.register(r'jobs', JobViewSet, basename='job')
 
 urlpatterns = [
     path("", api_root, name="api-root"),
     path("admin/", admin.site.urls),
     path("api/health/", health, name="health"),
     path("api/dashboard/summary/", dashboard_summary, name="dashboard-summary"),
+    path("api/dashboard/bundle/", dashboard_bundle, name="dashboard-bundle"),
+    path("api/dashboard/summary/async/", dashboard_summary_async, name="dashboard-summary-async"),
+    path("api/stats/crop-issues/", crop_issue_stats, name="crop-issue-stats"),
+    path("api/stats/vaccination-coverage/", vaccination_coverage, name="vaccination-coverage"),
+    path("api/stream/", live_updates, name="live-updates"),
     path("api/", include(router.urls)),
 ]
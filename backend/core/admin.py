@@ -1,5 +1,71 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import District, Farm, Herd
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .caching import bump_generation, cached
+from .models import District, Farm, Herd, Event, CropIssue, Crop, CropSynonym, Disease, DiseaseSynonym
+from .signals import publish_change
+
+
+# Models whose admins page with EstimatedCountPaginator (LargeTableAdmin)
+LARGE_TABLE_MODELS = [Farm, Herd, Event, CropIssue]
+
+
+def cached_count(queryset):
+    """
+    Exact number of rows in ``queryset``, shared between processes and counted
+    again once rows are created or deleted (see signals) or after
+    ADMIN_COUNT_CACHE_SECONDS
+    """
+    queryset = queryset.order_by()
+    if queryset.query.where:
+        sql, params = queryset.values('pk').query.sql_with_params()
+        parts = (queryset.db, sql, params)
+    else:
+        parts = (queryset.db, queryset.model._meta.db_table)
+    return cached('admin-count', parts, queryset.count, settings.ADMIN_COUNT_CACHE_SECONDS)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that doesn't run an exact COUNT(*) over a whole large table on
+    every changelist view
+
+    Unfiltered changelists use the planner's row estimate on PostgreSQL.
+    Elsewhere, and for filtered changelists, the exact count is cached (see
+    cached_count); the precompute scheduler recounts the unfiltered large
+    tables in the background (core.warmup).
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if not queryset.query.where and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > 0:
+                return row[0]
+        return cached_count(queryset)
+
+
+def precompute_admin_counts():
+    """Count the unfiltered large-table changelists whose count isn't cached; returns tables checked"""
+    for model in LARGE_TABLE_MODELS:
+        cached_count(model.objects.all())
+    return len(LARGE_TABLE_MODELS)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class HerdInline(admin.TabularInline):
@@ -13,16 +79,104 @@ class DistrictAdmin(admin.ModelAdmin):
     search_fields = ['name', 'code']
 
 
+class CropSynonymInline(admin.TabularInline):
+    model = CropSynonym
+    extra = 1
+
+
+@admin.register(Crop)
+class CropAdmin(admin.ModelAdmin):
+    list_display = ['name', 'name_ky', 'name_ru']
+    search_fields = ['name', 'name_ky', 'name_ru', 'synonyms__term']
+    inlines = [CropSynonymInline]
+
+
+class DiseaseSynonymInline(admin.TabularInline):
+    model = DiseaseSynonym
+    extra = 1
+
+
+@admin.register(Disease)
+class DiseaseAdmin(admin.ModelAdmin):
+    list_display = ['name', 'name_ky', 'name_ru']
+    search_fields = ['name', 'name_ky', 'name_ru', 'synonyms__term']
+    inlines = [DiseaseSynonymInline]
+
+
 @admin.register(Farm)
-class FarmAdmin(admin.ModelAdmin):
+class FarmAdmin(LargeTableAdmin):
     list_display = ['farmer_name', 'village', 'district', 'phone', 'created_at']
     list_filter = ['district', 'created_at']
+    list_select_related = ['district']
     search_fields = ['farmer_name', 'phone', 'village']
     inlines = [HerdInline]
 
 
 @admin.register(Herd)
-class HerdAdmin(admin.ModelAdmin):
+class HerdAdmin(LargeTableAdmin):
     list_display = ['farm', 'animal_type', 'headcount']
     list_filter = ['animal_type']
+    list_select_related = ['farm']
+    autocomplete_fields = ['farm']
     search_fields = ['farm__farmer_name']
+
+
+STATUS_ACTION_BATCH_SIZE = 1000
+
+
+class StatusActionsMixin:
+    """
+    Bulk status changes as one UPDATE per STATUS_ACTION_BATCH_SIZE selected rows
+
+    queryset.update() skips save() and model signals, so the action sets
+    updated_at itself, publishes the live update for each changed row and
+    drops the cached aggregates.
+    """
+    actions = ['mark_in_progress', 'mark_resolved']
+
+    def _set_status(self, request, queryset, value):
+        model = queryset.model
+        changes = {'status': value}
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            changes['updated_at'] = timezone.now()
+        # Fixed ids, since the update can move rows out of a status-filtered selection
+        ids = list(queryset.order_by().values_list('pk', flat=True))
+        updated = 0
+        for start in range(0, len(ids), STATUS_ACTION_BATCH_SIZE):
+            batch = model.objects.filter(pk__in=ids[start:start + STATUS_ACTION_BATCH_SIZE])
+            updated += batch.update(**changes)
+            for record in batch:
+                publish_change(record)
+        bump_generation('crop-issue-stats')
+        bump_generation('dashboard')
+        self.message_user(request, f"{updated} records marked as {value.replace('_', ' ')}.")
+
+    @admin.action(description='Mark selected as in progress')
+    def mark_in_progress(self, request, queryset):
+        self._set_status(request, queryset, 'in_progress')
+
+    @admin.action(description='Mark selected as resolved')
+    def mark_resolved(self, request, queryset):
+        self._set_status(request, queryset, 'resolved')
+
+
+@admin.register(Event)
+class EventAdmin(StatusActionsMixin, LargeTableAdmin):
+    list_display = ['id', 'event_type', 'disease_suspected', 'farm', 'district', 'status', 'created_at']
+    # Each filter matches a (column, created_at) index
+    list_filter = ['status', 'event_type', 'district']
+    list_select_related = ['farm', 'district']
+    autocomplete_fields = ['farm']
+    search_fields = ['disease_suspected']
+    ordering = ['-created_at']
+
+
+@admin.register(CropIssue)
+class CropIssueAdmin(StatusActionsMixin, LargeTableAdmin):
+    list_display = ['id', 'title', 'crop_type', 'problem_type', 'severity', 'farm', 'district', 'status', 'created_at']
+    # Each filter matches a (column, created_at) index
+    list_filter = ['status', 'severity', 'problem_type', 'district']
+    list_select_related = ['farm', 'district']
+    autocomplete_fields = ['farm']
+    search_fields = ['title', 'crop_type']
+    ordering = ['-created_at']
@@ -0,0 +1,84 @@
+"""
+Hot/cold archival of resolved events and crop issues
+
+Resolved records older than a cutoff are copied into the archive tables and
+deleted from the hot tables in id-ordered batches, each batch in its own
+transaction. An ArchiveCheckpoint row records the cutoff and the last id
+moved, so an interrupted run can resume with the same cutoff.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchiveCheckpoint, ArchivedCropIssue, ArchivedEvent, CropIssue, Event
+
+
+ARCHIVE_MODELS = {
+    'event': (Event, ArchivedEvent),
+    'crop_issue': (CropIssue, ArchivedCropIssue),
+}
+
+
+def archive_model(label, cutoff, batch_size, resume=False, progress=None):
+    """
+    Move resolved records of one model created before ``cutoff`` to its archive
+
+    With ``resume`` an unfinished checkpoint's cutoff and position are reused.
+    Returns the number of rows archived by this call.
+    """
+    hot_model, archive_model = ARCHIVE_MODELS[label]
+    checkpoint = ArchiveCheckpoint.objects.filter(model_label=label).first()
+    if resume and checkpoint and not checkpoint.completed:
+        cutoff = checkpoint.cutoff
+    else:
+        checkpoint, _ = ArchiveCheckpoint.objects.update_or_create(
+            model_label=label,
+            defaults={'cutoff': cutoff, 'last_id': 0, 'rows_archived': 0, 'completed': False},
+        )
+
+    field_names = [field.attname for field in hot_model._meta.concrete_fields]
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                hot_model.objects.filter(
+                    status='resolved',
+                    created_at__lt=cutoff,
+                    id__gt=checkpoint.last_id,
+                ).order_by('id').values(*field_names)[:batch_size]
+            )
+            if not rows:
+                checkpoint.completed = True
+                checkpoint.save(update_fields=['completed', 'updated_at'])
+                break
+
+            ids = [row['id'] for row in rows]
+            archive_model.objects.bulk_create(
+                [archive_model(**row) for row in rows],
+                ignore_conflicts=True,
+            )
+            hot_model.objects.filter(id__in=ids).delete()
+
+            checkpoint.last_id = ids[-1]
+            checkpoint.rows_archived += len(ids)
+            checkpoint.save(update_fields=['last_id', 'rows_archived', 'updated_at'])
+
+        archived += len(ids)
+        if progress:
+            progress(label, checkpoint.rows_archived)
+    return archived
+
+
+def archive_resolved(older_than_days=None, batch_size=None, resume=False, progress=None):
+    """Archive resolved events and crop issues; returns rows moved per model"""
+    if older_than_days is None:
+        older_than_days = settings.ARCHIVE_RESOLVED_AFTER_DAYS
+    if batch_size is None:
+        batch_size = settings.ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return {
+        label: archive_model(label, cutoff, batch_size, resume=resume, progress=progress)
+        for label in ARCHIVE_MODELS
+    }
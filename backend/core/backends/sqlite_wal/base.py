@@ -0,0 +1,139 @@
+"""
+SQLite backend tuned for concurrent production use
+
+- Applies WAL journaling and the other pragmas in ``OPTIONS['pragmas']`` on
+  every new connection, so readers never wait for writers.
+- Serializes writers in this process through one lock per database file.
+  Transactions take it at BEGIN and release it at COMMIT/ROLLBACK; writes
+  outside a transaction take it for the single statement. Writers queue on
+  the lock instead of spinning on SQLITE_BUSY, and a lock that can't be
+  acquired within ``busy_timeout`` fails like SQLite would.
+- Reports how long each transaction queued for the lock to the callables in
+  ``connection.writer_wait_observers`` (milliseconds), e.g. for load
+  shedding. Single statements wait inside cursor.execute, where execute
+  wrappers already time them.
+
+Use ``OPTIONS['transaction_mode'] = 'IMMEDIATE'`` so a transaction never has
+to upgrade a read lock to a write lock, which SQLite can't wait out.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base as sqlite3_base
+
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # milliseconds
+    'mmap_size': 256 * 1024 * 1024,  # bytes
+    'cache_size': -64 * 1024,  # negative means KiB
+}
+
+READ_ONLY_STATEMENTS = ('SELECT', 'PRAGMA', 'EXPLAIN', 'WITH')
+
+_writer_locks = {}
+_writer_locks_guard = threading.Lock()
+
+
+def get_writer_lock(name):
+    """Return the process-wide writer lock for a database file"""
+    with _writer_locks_guard:
+        return _writer_locks.setdefault(str(name), threading.Lock())
+
+
+def is_write_statement(query):
+    return not query.lstrip()[:7].upper().startswith(READ_ONLY_STATEMENTS)
+
+
+class SQLiteCursorWrapper(sqlite3_base.SQLiteCursorWrapper):
+    db = None
+
+    def execute(self, query, params=None):
+        if self.db.holds_writer_lock or not is_write_statement(query):
+            return super().execute(query, params)
+        with self.db.writer_lock_held():
+            return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        if self.db.holds_writer_lock or not is_write_statement(query):
+            return super().executemany(query, param_list)
+        with self.db.writer_lock_held():
+            return super().executemany(query, param_list)
+
+
+class DatabaseWrapper(sqlite3_base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pragmas = {**DEFAULT_PRAGMAS, **self.settings_dict['OPTIONS'].get('pragmas', {})}
+        self.holds_writer_lock = False
+        self.writer_lock = get_writer_lock(self.settings_dict['NAME'])
+        self.writer_wait_observers = []
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=SQLiteCursorWrapper)
+        cursor.db = self
+        return cursor
+
+    def acquire_writer_lock(self):
+        timeout = int(self.pragmas['busy_timeout']) / 1000 or -1
+        if not self.writer_lock.acquire(timeout=timeout):
+            raise OperationalError('database is locked (writer queue timeout)')
+        self.holds_writer_lock = True
+
+    def release_writer_lock(self):
+        if self.holds_writer_lock:
+            self.holds_writer_lock = False
+            self.writer_lock.release()
+
+    @contextmanager
+    def writer_lock_held(self):
+        self.acquire_writer_lock()
+        try:
+            yield
+        finally:
+            self.release_writer_lock()
+
+    def _start_transaction_under_autocommit(self):
+        started = time.perf_counter()
+        self.acquire_writer_lock()
+        waited_ms = (time.perf_counter() - started) * 1000
+        for observer in self.writer_wait_observers:
+            observer(waited_ms)
+        try:
+            super()._start_transaction_under_autocommit()
+        except BaseException:
+            self.release_writer_lock()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self.release_writer_lock()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self.release_writer_lock()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self.release_writer_lock()
+
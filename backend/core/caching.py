@@ -0,0 +1,62 @@
+"""
+Generation-based cache keys
+
+Cached payloads are keyed by a namespace generation that is bumped whenever
+the underlying data changes (see signals), so every cached shape for that
+namespace is invalidated at once without having to track individual keys.
+Writes that bypass model signals (queryset.update, bulk loads) bump the
+generation themselves or are covered by the cache timeout.
+
+Generations and payloads live in the default cache, which must be Redis or
+memcached whenever more than one process runs (see CACHES and
+cache_is_shared), so a bump in any process (including jobs run by manage.py
+run_worker) invalidates the payloads every process serves, and concurrent
+bumps are atomic increments. A per-process cache would only invalidate the
+process that bumped.
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def cache_is_shared():
+    """Whether other processes see the default cache, i.e. it isn't per-process memory"""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def get_generation(namespace):
+    # A missing (e.g. evicted) generation restarts from the clock, never from a
+    # value whose keys might still be cached
+    return cache.get_or_set(f'{namespace}:generation', time.time_ns, None)
+
+
+def bump_generation(namespace):
+    key = f'{namespace}:generation'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def cache_key(namespace, *parts):
+    """Key for a payload of ``namespace`` identified by JSON-serializable parts"""
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f'{namespace}:{get_generation(namespace)}:{digest}'
+
+
+def cached(namespace, parts, build, timeout, refresh=False):
+    """
+    Return the cached payload for ``parts``, building and storing it on a miss
+
+    ``refresh`` rebuilds and stores it even on a hit (used to precompute).
+    """
+    key = cache_key(namespace, *parts)
+    payload = None if refresh else cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, timeout)
+    return payload
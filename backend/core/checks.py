@@ -0,0 +1,22 @@
+"""
+System checks for deployments running several processes
+"""
+from django.core.checks import Error, Tags, register
+
+from .caching import cache_is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    return [
+        Error(
+            'The default cache is local to each process.',
+            hint=(
+                'Throttle buckets and cache generations must be shared by every web and worker '
+                'process; set AKYL_JER_REDIS_URL or AKYL_JER_MEMCACHED_LOCATION.'
+            ),
+            id='core.E001',
+        )
+    ]
@@ -0,0 +1,167 @@
+"""
+Vaccination coverage per district and animal type
+
+A herd counts as vaccinated when its farm had a vaccination Event within
+the last VACCINATION_COVERAGE_WINDOW_DAYS. Farm.last_vaccinated_at carries
+the latest vaccination per farm (see signals), so coverage is one GROUP BY
+over Herd joined to Farm with no event scan.
+
+Results are stored in VaccinationCoverage and refreshed per district. A
+refresh only recomputes districts that are:
+
+- marked stale by signals (herd, farm or vaccination changes)
+- holding farms whose last vaccination slid out of the window since the
+  previous refresh
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+
+from .lookups import filter_by_district
+from .models import District, Farm, Herd, VaccinationCoverage
+
+
+REFRESH_TRIES = 5
+
+COVERAGE_FIELDS = [
+    'herds_total', 'herds_vaccinated', 'headcount_total', 'headcount_vaccinated', 'stale', 'computed_at',
+]
+
+def mark_stale(district_id, animal_type=None):
+    """Flag coverage rows of a district (optionally one animal type) for recomputation"""
+    if district_id is None:
+        return
+    if animal_type is None:
+        VaccinationCoverage.objects.filter(district_id=district_id).update(stale=True)
+    else:
+        VaccinationCoverage.objects.update_or_create(
+            district_id=district_id, animal_type=animal_type, defaults={'stale': True}
+        )
+
+
+def _dirty_districts(cutoff, window):
+    """Ids of districts whose coverage may have changed since the last refresh"""
+    last_refresh = VaccinationCoverage.objects.aggregate(last=Min('computed_at'))['last']
+    if last_refresh is None:
+        return set(District.objects.values_list('id', flat=True))
+
+    dirty = set(
+        VaccinationCoverage.objects.filter(Q(stale=True) | Q(computed_at__isnull=True))
+        .values_list('district_id', flat=True)
+    )
+    # Vaccinations that were inside the window at the last refresh but are not now
+    previous_cutoff = last_refresh - window
+    dirty.update(
+        Farm.objects.filter(last_vaccinated_at__gte=previous_cutoff, last_vaccinated_at__lt=cutoff)
+        .order_by().values_list('district_id', flat=True).distinct()
+    )
+    return dirty
+
+
+def _replace_coverage(district_ids, cutoff, now):
+    """
+    Recompute the coverage rows of ``district_ids`` inside the caller's transaction
+
+    The existing rows are locked and read before the herds are aggregated, so
+    a concurrent mark_stale either waits for the commit and flags the fresh
+    row, or adds a row this refresh never read, which stays stale.
+    """
+    existing = {
+        (row.district_id, row.animal_type): row
+        for row in VaccinationCoverage.objects.select_for_update().filter(district_id__in=district_ids)
+    }
+    vaccinated = Q(farm__last_vaccinated_at__gte=cutoff)
+    rows = (
+        Herd.objects.filter(farm__district_id__in=district_ids)
+        .order_by()
+        .values('farm__district_id', 'animal_type')
+        .annotate(
+            herds_total=Count('id'),
+            herds_vaccinated=Count('id', filter=vaccinated),
+            headcount_total=Sum('headcount'),
+            headcount_vaccinated=Sum('headcount', filter=vaccinated),
+        )
+    )
+    to_update, to_create = [], []
+    for row in rows:
+        key = (row['farm__district_id'], row['animal_type'])
+        coverage = existing.pop(key, None)
+        if coverage is None:
+            coverage = VaccinationCoverage(district_id=key[0], animal_type=key[1])
+            to_create.append(coverage)
+        else:
+            to_update.append(coverage)
+        coverage.herds_total = row['herds_total']
+        coverage.herds_vaccinated = row['herds_vaccinated']
+        coverage.headcount_total = row['headcount_total'] or 0
+        coverage.headcount_vaccinated = row['headcount_vaccinated'] or 0
+        coverage.stale = False
+        coverage.computed_at = now
+    VaccinationCoverage.objects.bulk_update(to_update, COVERAGE_FIELDS)
+    # A row mark_stale added meanwhile wins; it is recomputed next time
+    VaccinationCoverage.objects.bulk_create(to_create, ignore_conflicts=True)
+    # Read rows left without herds
+    VaccinationCoverage.objects.filter(pk__in=[row.pk for row in existing.values()]).delete()
+
+
+def refresh_vaccination_coverage(full=False):
+    """Recompute coverage for changed districts (or all with full=True); returns districts refreshed"""
+    now = timezone.now()
+    window = timedelta(days=settings.VACCINATION_COVERAGE_WINDOW_DAYS)
+    cutoff = now - window
+    for attempt in range(REFRESH_TRIES):
+        try:
+            with transaction.atomic():
+                if full:
+                    district_ids = set(District.objects.values_list('id', flat=True))
+                else:
+                    district_ids = _dirty_districts(cutoff, window)
+                if district_ids:
+                    _replace_coverage(district_ids, cutoff, now)
+                # Every row is now current as of this refresh, which is what the next
+                # refresh measures window crossings from
+                VaccinationCoverage.objects.update(computed_at=now)
+            return len(district_ids)
+        except OperationalError:
+            # SQLite can't turn this read transaction into a write while another
+            # connection writes; it was rolled back, so start over
+            if attempt == REFRESH_TRIES - 1:
+                raise
+            time.sleep(0.05 * 2 ** attempt)
+
+
+def _share(part, whole):
+    return round(part / whole, 4) if whole else None
+
+
+def coverage_report(district_code=None, animal_type=None):
+    """Stored coverage rows, optionally limited to one district code and/or animal type"""
+    queryset = VaccinationCoverage.objects.select_related('district')
+    if district_code:
+        queryset = filter_by_district(queryset, district_code)
+    if animal_type:
+        queryset = queryset.filter(animal_type=animal_type)
+    rows = list(queryset)
+    return {
+        'window_days': settings.VACCINATION_COVERAGE_WINDOW_DAYS,
+        'computed_at': max((row.computed_at for row in rows if row.computed_at), default=None),
+        'results': [
+            {
+                'district': row.district.code,
+                'district_name': row.district.name,
+                'animal_type': row.animal_type,
+                'herds_total': row.herds_total,
+                'herds_vaccinated': row.herds_vaccinated,
+                'herd_coverage': _share(row.herds_vaccinated, row.herds_total),
+                'headcount_total': row.headcount_total,
+                'headcount_vaccinated': row.headcount_vaccinated,
+                'headcount_coverage': _share(row.headcount_vaccinated, row.headcount_total),
+                'stale': row.stale,
+            }
+            for row in rows
+        ],
+    }
@@ -0,0 +1,216 @@
+"""
+Dashboard aggregates
+
+Each aggregate is an independent query so the summary can be built either
+sequentially (``build_summary``) or concurrently on a bounded thread pool
+(``abuild_summary``), with the same response shape either way.
+
+``build_bundle`` adds the district list and the latest open outbreaks and
+high-severity crop issues so the dashboard page loads in one round trip.
+``cached_summary`` / ``cached_bundle`` serve both from the 'dashboard' cache
+generation, which core.warmup precomputes for every district.
+"""
+import asyncio
+import contextvars
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Sum
+from django.db.models.functions import Trim
+
+from .caching import cached
+from .lookups import filter_by_district
+from .models import District, Farm, Herd, Event, CropIssue
+from .serializers import CropIssueSerializer, DistrictSerializer, EventSerializer
+from .vocabulary import canonical_name
+
+
+OUTBREAK_EVENT_TYPES = ['disease_report', 'mortality']
+OPEN_STATUSES = ['new', 'in_progress']
+
+
+def _farms(district_code):
+    queryset = Farm.objects.all()
+    if district_code:
+        queryset = filter_by_district(queryset, district_code)
+    return queryset
+
+
+def _herds(district_code):
+    queryset = Herd.objects.all()
+    if district_code:
+        queryset = filter_by_district(queryset, district_code, 'farm__district_id')
+    return queryset
+
+
+def _events(district_code):
+    queryset = Event.objects.all()
+    if district_code:
+        queryset = filter_by_district(queryset, district_code)
+    return queryset
+
+
+def total_farms(district_code=None):
+    return _farms(district_code).count()
+
+
+def total_animals(district_code=None):
+    """Sum of all herd headcounts"""
+    return _herds(district_code).aggregate(total=Sum('headcount'))['total'] or 0
+
+
+def open_outbreaks(district_code=None):
+    """Disease reports or mortality events with status new/in_progress, not counting near-duplicates"""
+    return _events(district_code).filter(
+        event_type__in=OUTBREAK_EVENT_TYPES,
+        status__in=OPEN_STATUSES,
+        duplicate_of__isnull=True
+    ).count()
+
+
+def farms_by_district(district_code=None):
+    """Farm counts per district (only the filtered district if one is given)"""
+    rows = _farms(district_code).values(
+        'district__code', 'district__name'
+    ).annotate(
+        farm_count=Count('id')
+    ).order_by('district__name')
+
+    return [
+        {
+            'district_code': item['district__code'],
+            'district_name': item['district__name'],
+            'farm_count': item['farm_count']
+        }
+        for item in rows
+    ]
+
+
+def outbreaks_by_disease(district_code=None):
+    """
+    Outbreak counts for disease_report/mortality events with a suspected disease
+
+    Grouped by the canonical disease; names the vocabulary doesn't know are
+    grouped by their trimmed text.
+    """
+    rows = _events(district_code).filter(
+        event_type__in=OUTBREAK_EVENT_TYPES,
+        disease_suspected__isnull=False
+    ).values(
+        'disease_id', label=Trim('disease_suspected')
+    ).annotate(
+        count=Count('id')
+    ).order_by()
+
+    counts = Counter()
+    for item in rows:
+        if item['disease_id'] is not None:
+            counts[canonical_name('disease', item['disease_id'])] += item['count']
+        elif item['label']:
+            counts[item['label']] += item['count']
+
+    return [
+        {
+            'disease_suspected': name,
+            'count': count
+        }
+        for name, count in counts.most_common()
+    ]
+
+
+AGGREGATES = {
+    'total_farms': total_farms,
+    'total_animals': total_animals,
+    'open_outbreaks': open_outbreaks,
+    'farms_by_district': farms_by_district,
+    'outbreaks_by_disease': outbreaks_by_disease,
+}
+
+
+def build_summary(district_code=None):
+    """Run every aggregate one after another on the calling thread"""
+    return {name: aggregate(district_code) for name, aggregate in AGGREGATES.items()}
+
+
+def recent_outbreaks(district_code=None, limit=10):
+    """Latest open disease_report/mortality events"""
+    queryset = _events(district_code).filter(
+        event_type__in=OUTBREAK_EVENT_TYPES,
+        status__in=OPEN_STATUSES
+    ).select_related('farm__district').order_by('-created_at')[:limit]
+    return EventSerializer(queryset, many=True).data
+
+
+def recent_severe_crop_issues(district_code=None, limit=10):
+    """Latest unresolved high-severity crop issues"""
+    queryset = CropIssue.objects.filter(severity='high', status__in=OPEN_STATUSES)
+    if district_code:
+        queryset = filter_by_district(queryset, district_code)
+    queryset = queryset.select_related('farm__district').order_by('-created_at')[:limit]
+    return CropIssueSerializer(queryset, many=True).data
+
+
+def build_bundle(district_code=None, limit=10):
+    """Summary, districts and recent alerts for the dashboard page in a fixed number of queries"""
+    return {
+        'summary': build_summary(district_code),
+        'districts': DistrictSerializer(District.objects.all(), many=True).data,
+        'recent_outbreaks': recent_outbreaks(district_code, limit),
+        'recent_severe_crop_issues': recent_severe_crop_issues(district_code, limit),
+    }
+
+
+def cached_summary(district_code=None, refresh=False):
+    return cached(
+        'dashboard', ('summary', district_code), lambda: build_summary(district_code),
+        settings.STATS_CACHE_SECONDS, refresh=refresh,
+    )
+
+
+def cached_bundle(district_code=None, limit=None, refresh=False):
+    limit = limit or settings.DASHBOARD_BUNDLE_LIMIT
+    return cached(
+        'dashboard', ('bundle', district_code, limit), lambda: build_bundle(district_code, limit),
+        settings.STATS_CACHE_SECONDS, refresh=refresh,
+    )
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'DASHBOARD_AGGREGATE_WORKERS', 5),
+                    thread_name_prefix='dashboard-aggregate',
+                )
+    return _executor
+
+
+def _run_aggregate(aggregate, district_code):
+    # Pool threads keep their connection between calls; drop it if it has
+    # gone stale or exceeded CONN_MAX_AGE, as a request worker would.
+    close_old_connections()
+    return aggregate(district_code)
+
+
+async def abuild_summary(district_code=None):
+    """Run the independent aggregates concurrently on a bounded thread pool"""
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    # Each task gets a copy of the caller's context so database routing
+    # (e.g. pinning to the primary) carries over to the pool threads
+    results = await asyncio.gather(*(
+        loop.run_in_executor(
+            executor, contextvars.copy_context().run, _run_aggregate, aggregate, district_code
+        )
+        for aggregate in AGGREGATES.values()
+    ))
+    return dict(zip(AGGREGATES.keys(), results))
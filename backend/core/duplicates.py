@@ -0,0 +1,185 @@
+"""
+Near-duplicate detection for events and crop issues
+
+Each new report's text is reduced to a MinHash signature over character
+3-grams, whose positions agree between two reports with probability equal
+to the Jaccard similarity of their 3-gram sets. The signature is split into
+BANDS bands; each band is hashed together with the farm and the report type
+into a bucket (locality-sensitive hashing). Only earlier reports sharing a
+bucket, created within DUPLICATE_WINDOW_DAYS, are compared, so the cost of a
+lookup depends on how many similar reports a farm has, not on table size.
+
+A report whose estimated similarity to a candidate reaches
+DUPLICATE_SIMILARITY gets ``duplicate_of`` set to that candidate's original.
+This runs on create (see signals); manage.py index_report_duplicates
+backfills recent reports and prunes signatures older than the window.
+"""
+import hashlib
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .caching import bump_generation
+from .models import CropIssue, Event, ReportBucket, ReportSignature
+from .normalize import normalize_term
+
+
+NUM_PERMUTATIONS = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+
+# Universal hashes (a * x + b) mod p; fixed so stored signatures stay comparable
+_PRIME = np.uint64((1 << 61) - 1)
+_random = np.random.RandomState(20240601)
+_A = _random.randint(1, 1 << 31, size=NUM_PERMUTATIONS).astype(np.uint64)
+_B = _random.randint(0, 1 << 31, size=NUM_PERMUTATIONS).astype(np.uint64)
+
+# Report kind -> model
+REPORT_MODELS = {
+    'event': Event,
+    'crop_issue': CropIssue,
+}
+
+
+def _report_text(kind, record):
+    if kind == 'event':
+        return f'{record.disease_suspected or ""} {record.description}'
+    return f'{record.title} {record.description}'
+
+
+def _report_type(kind, record):
+    return record.event_type if kind == 'event' else record.problem_type
+
+
+def shingles(text):
+    text = normalize_term(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[start:start + SHINGLE_SIZE] for start in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """MinHash signature (NUM_PERMUTATIONS uint64 values) of ``text``, or None if it has no words"""
+    grams = shingles(text)
+    if not grams:
+        return None
+    # 32-bit shingle hashes keep a * x + b below 2**64
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=4).digest(), 'big') for gram in grams],
+        dtype=np.uint64,
+    )
+    return ((np.outer(hashes, _A) + _B) % _PRIME).min(axis=0)
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return float((signature == other).mean())
+
+
+def band_buckets(kind, farm_id, report_type, signature):
+    """One signed 64-bit bucket per band, scoped to the farm and report type"""
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(f'{kind}:{farm_id}:{report_type}:{band}:'.encode(), digest_size=8)
+        digest.update(rows.tobytes())
+        buckets.append(int.from_bytes(digest.digest(), 'big', signed=True))
+    return buckets
+
+
+def find_original(kind, record, signature, buckets, at=None):
+    """
+    Id of the earlier report ``record`` repeats, or None
+
+    Candidates share a bucket and were created in the window before ``at``
+    (default now); the most similar one wins, the earliest on ties, and a
+    candidate that is itself a duplicate leads to its original.
+    """
+    at = at or timezone.now()
+    candidate_ids = set(
+        ReportBucket.objects.filter(kind=kind, bucket__in=buckets).values_list('record_id', flat=True)
+    )
+    candidate_ids.discard(record.pk)
+    if not candidate_ids:
+        return None
+    since = at - timedelta(days=settings.DUPLICATE_WINDOW_DAYS)
+    scored = []
+    for record_id, stored in ReportSignature.objects.filter(
+        kind=kind, record_id__in=candidate_ids, created_at__gte=since, created_at__lte=at
+    ).values_list('record_id', 'signature'):
+        score = similarity(signature, np.frombuffer(bytes(stored), dtype=np.uint64))
+        if score >= settings.DUPLICATE_SIMILARITY:
+            scored.append((-score, record_id))
+    # Signatures of deleted reports linger until pruned, so confirm the report exists
+    for _, record_id in sorted(scored):
+        candidate = REPORT_MODELS[kind].objects.filter(pk=record_id).values_list('id', 'duplicate_of_id').first()
+        if candidate is not None:
+            return candidate[1] or candidate[0]
+    return None
+
+
+def prepare(kind, record, at=None):
+    """
+    Compute ``record``'s signature and set its duplicate_of before it is first saved
+
+    The signature and buckets are kept on the instance for ``index``.
+    """
+    signature = minhash(_report_text(kind, record))
+    record._duplicate_signature = signature
+    if signature is None:
+        return
+    record._duplicate_buckets = band_buckets(kind, record.farm_id, _report_type(kind, record), signature)
+    if record.duplicate_of_id is None:
+        record.duplicate_of_id = find_original(kind, record, signature, record._duplicate_buckets, at)
+
+
+def index(kind, record):
+    """Store the signature and buckets computed by ``prepare`` for a saved record"""
+    signature = getattr(record, '_duplicate_signature', None)
+    if signature is None:
+        return
+    ReportSignature.objects.create(
+        kind=kind, record_id=record.pk, signature=signature.tobytes(), created_at=record.created_at
+    )
+    ReportBucket.objects.bulk_create([
+        ReportBucket(kind=kind, bucket=bucket, record_id=record.pk, created_at=record.created_at)
+        for bucket in record._duplicate_buckets
+    ])
+    del record._duplicate_signature
+
+
+def prune(older_than):
+    """Drop signatures and buckets of reports created before ``older_than``; returns signatures dropped"""
+    ReportBucket.objects.filter(created_at__lt=older_than).delete()
+    return ReportSignature.objects.filter(created_at__lt=older_than).delete()[0]
+
+
+def index_recent(days=None, progress=None):
+    """
+    Sign reports of the last ``days`` (default the window) that have no
+    signature yet, oldest first, marking duplicates among them; returns
+    (reports signed, duplicates found)
+    """
+    days = days or settings.DUPLICATE_WINDOW_DAYS
+    since = timezone.now() - timedelta(days=days)
+    signed = found = 0
+    for kind, model in REPORT_MODELS.items():
+        indexed = ReportSignature.objects.filter(kind=kind, created_at__gte=since).values('record_id')
+        records = model.objects.filter(created_at__gte=since).exclude(pk__in=indexed).order_by('created_at', 'id')
+        for record in records.iterator(chunk_size=500):
+            previous = record.duplicate_of_id
+            prepare(kind, record, at=record.created_at)
+            if record.duplicate_of_id != previous:
+                model.objects.filter(pk=record.pk).update(duplicate_of_id=record.duplicate_of_id)
+                found += 1
+            index(kind, record)
+            signed += 1
+            if progress and signed % 1000 == 0:
+                progress(signed, found)
+    if found:
+        # queryset.update() skips model signals
+        bump_generation('dashboard')
+    return signed, found
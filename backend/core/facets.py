@@ -0,0 +1,58 @@
+"""
+Facet counts for the event and crop issue lists
+
+``?facets=status,district`` returns, for every value of each named field,
+how many records match the list's other filters with that value. Facet
+fields are always known choices (or district codes), so each count is a
+conditional ``COUNT(*) FILTER (WHERE ...)`` and all of them come from one
+aggregate query over the table: filters on parameters that aren't facets
+go in the WHERE clause, while the filter on each facet's own parameter is
+left out of that facet's counts, so a chip shows what selecting it would
+return.
+"""
+from django.db.models import Count, Q
+
+from .filters import InvalidFilter, apply_filters, parse_values, record_filters
+from .lookups import district_ids_by_code
+
+
+def facet_values(model, name):
+    """(reported value, column, stored value) for each value of facet ``name``"""
+    if name == 'district':
+        return [(code, 'district_id', district_id) for code, district_id in sorted(district_ids_by_code().items())]
+    return [(value, name, value) for value, _ in model._meta.get_field(name).choices]
+
+
+def parse_facets(value, allowed):
+    names = list(dict.fromkeys(parse_values(value)))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise InvalidFilter(f"Unknown facets: {', '.join(unknown)}. Available: {', '.join(allowed)}")
+    return names
+
+
+def facet_counts(queryset, params, filter_params, names):
+    """
+    {facet: {value: count}} for ``queryset`` under the filters in ``params``
+
+    Runs one aggregate query; ``names`` must be filter parameters with known values.
+    """
+    conditions = record_filters(params, filter_params)
+    base = apply_filters(queryset.order_by(), {name: q for name, q in conditions.items() if name not in names})
+    aggregates = {}
+    labels = {}
+    for name in names:
+        others = Q()
+        for other, condition in conditions.items():
+            if other in names and other != name:
+                others &= condition
+        for value, column, stored in facet_values(queryset.model, name):
+            alias = f'facet_{len(aggregates)}'
+            aggregates[alias] = Count('pk', filter=Q(**{column: stored}) & others)
+            labels[alias] = (name, value)
+    counts = {name: {} for name in names}
+    if aggregates:
+        for alias, count in base.aggregate(**aggregates).items():
+            name, value = labels[alias]
+            counts[name][value] = count
+    return counts
@@ -0,0 +1,151 @@
+"""
+Query parameter filters shared by the list endpoints
+
+Each supported parameter compiles to one Q object over an indexed column:
+comma-separated values become ``IN`` lists, district codes are resolved to
+ids without joining District, crop and disease names are resolved through
+the vocabularies (core.vocabulary) to ids, ``created_after`` /
+``created_before`` become range predicates on created_at, and
+``collapse_duplicates`` keeps only reports that aren't near-duplicates. Keeping one Q per parameter lets
+callers apply them all, or all but one (e.g. for facet counts).
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .lookups import district_id_for_code
+from .vocabulary import resolve
+
+
+class InvalidFilter(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_code = 'invalid_filter'
+
+    def __init__(self, message):
+        super().__init__({'error': message})
+
+
+def parse_values(value):
+    """Split a comma-separated parameter into its non-empty values"""
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def parse_ids(value, limit):
+    """Parse a comma-separated list of integer ids, keeping order and dropping repeats"""
+    try:
+        ids = list(dict.fromkeys(int(item) for item in parse_values(value)))
+    except ValueError:
+        raise InvalidFilter("ids must be comma-separated integers")
+    if len(ids) > limit:
+        raise InvalidFilter(f"At most {limit} ids can be requested at once")
+    return ids
+
+
+def _aware(value):
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def parse_timestamp(name, value, end_of_day=False):
+    """
+    Parse an ISO 8601 date or datetime parameter
+
+    A bare date means the start of that day, or the start of the next day
+    with end_of_day=True so that ``created_before=<date>`` includes the date.
+    """
+    try:
+        day = parse_date(value)
+        parsed = None if day else parse_datetime(value)
+    except ValueError:
+        day = parsed = None
+    if parsed is not None:
+        return _aware(parsed)
+    if day is None:
+        raise InvalidFilter(f"{name} must be an ISO 8601 date or datetime")
+    if end_of_day:
+        day += timedelta(days=1)
+    return _aware(datetime.combine(day, time.min))
+
+
+def _in(field, values):
+    # A single value stays a plain equality predicate
+    if len(values) == 1:
+        return Q(**{field: values[0]})
+    return Q(**{f'{field}__in': values})
+
+
+def _district(values):
+    district_ids = [district_id for district_id in map(district_id_for_code, values) if district_id is not None]
+    if not district_ids:
+        return Q(pk__in=[])
+    return _in('district_id', district_ids)
+
+
+def _choice(field):
+    def build(values):
+        return _in(field, values)
+    return build
+
+
+def _term(vocabulary, field, text_field):
+    # Known names (in any language or spelling) become an indexed id lookup;
+    # names the vocabulary doesn't know fall back to matching the free text
+    def build(values):
+        entry_ids = []
+        condition = Q()
+        for value in values:
+            entry_id = resolve(vocabulary, value)
+            if entry_id is None:
+                condition |= Q(**{f'{text_field}__icontains': value})
+            elif entry_id not in entry_ids:
+                entry_ids.append(entry_id)
+        if entry_ids:
+            condition |= _in(field, entry_ids)
+        return condition
+    return build
+
+
+# Parameter -> builder taking the parsed values
+MULTI_VALUE_FILTERS = {
+    'district': _district,
+    'event_type': _choice('event_type'),
+    'problem_type': _choice('problem_type'),
+    'severity': _choice('severity'),
+    'status': _choice('status'),
+    'crop_type': _term('crop', 'crop_id', 'crop_type'),
+    'disease': _term('disease', 'disease_id', 'disease_suspected'),
+}
+
+
+def record_filters(params, names):
+    """
+    Compile the query parameters in ``names`` that are present in ``params``
+
+    Returns a dict of parameter name -> Q, in the order of ``names``.
+    """
+    conditions = {}
+    for name in names:
+        value = params.get(name)
+        if not value:
+            continue
+        if name == 'collapse_duplicates':
+            if value in ('1', 'true'):
+                conditions[name] = Q(duplicate_of_id__isnull=True)
+        elif name == 'created_after':
+            conditions[name] = Q(created_at__gte=parse_timestamp(name, value))
+        elif name == 'created_before':
+            conditions[name] = Q(created_at__lt=parse_timestamp(name, value, end_of_day=True))
+        else:
+            values = parse_values(value)
+            if values:
+                conditions[name] = MULTI_VALUE_FILTERS[name](values)
+    return conditions
+
+
+def apply_filters(queryset, conditions):
+    for condition in conditions.values():
+        queryset = queryset.filter(condition)
+    return queryset
@@ -0,0 +1,75 @@
+"""
+Vectorized distance queries over farm coordinates
+
+Farm ids and coordinates are loaded once into NumPy arrays and reused until
+farms change, so a radius query is a single vectorized haversine over every
+farm instead of a Python loop or a table scan per request. Each process keys
+its arrays on a generation in the shared cache, which farm saves and deletes
+(see signals), imports and merges bump, so a change made by any web or
+worker process reloads the arrays everywhere.
+"""
+import threading
+
+import numpy as np
+
+from .caching import bump_generation, get_generation
+from .models import Farm
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Great-circle distances in km from one point (degrees) to arrays of points (radians)"""
+    lat, lng = np.radians(lat), np.radians(lng)
+    a = (
+        np.sin((lats - lat) / 2) ** 2
+        + np.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class FarmCoordinateIndex:
+    """Cached arrays of farm ids and coordinates (in radians)"""
+    namespace = 'farm-coordinates'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (generation, arrays)
+        self._loaded = None
+
+    def invalidate(self):
+        """Make every process reload the arrays on next use"""
+        bump_generation(self.namespace)
+        with self._lock:
+            self._loaded = None
+
+    def arrays(self):
+        """Return (ids, lats, lngs) for every farm with coordinates"""
+        # Read before loading, so a change during the load triggers another reload
+        generation = get_generation(self.namespace)
+        loaded = self._loaded
+        if loaded is None or loaded[0] != generation:
+            rows = Farm.objects.filter(
+                location_lat__isnull=False, location_lng__isnull=False
+            ).order_by('id').values_list('id', 'location_lat', 'location_lng')
+            table = np.array(list(rows), dtype=np.float64).reshape(-1, 3)
+            loaded = (generation, (
+                table[:, 0].astype(np.int64),
+                np.radians(table[:, 1]),
+                np.radians(table[:, 2]),
+            ))
+            with self._lock:
+                self._loaded = loaded
+        return loaded[1]
+
+    def within(self, lat, lng, radius_km):
+        """Return (farm ids, distances in km) of farms within radius_km, nearest first"""
+        ids, lats, lngs = self.arrays()
+        distances = haversine_km(lat, lng, lats, lngs)
+        mask = distances <= radius_km
+        order = np.argsort(distances[mask], kind='stable')
+        return ids[mask][order], distances[mask][order]
+
+
+farm_index = FarmCoordinateIndex()
@@ -0,0 +1,122 @@
+"""
+Idempotency-Key support for POST requests (see core.middleware.IdempotencyMiddleware)
+
+The first request with a key claims it by inserting an IdempotencyKey row;
+the unique (client, key) constraint lets only one of several concurrent
+retries win. When it finishes, its response is stored on the row and any
+retry with the same key and body gets that response back without the view
+(validation, writes, signals) running again. Server errors and transient
+refusals such as 429 Too Many Requests are not stored, so the client can
+retry them for real.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+# Responses saying "not now" rather than giving the view's result
+TRANSIENT_STATUS_CODES = {408, 425, 429}
+
+
+def client_for(request):
+    user = request.user
+    return f'user:{user.pk}' if user.is_authenticated else 'anonymous'
+
+
+def request_hash(request):
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    # Uploads over the in-memory limit are streamed to the view, so they are
+    # matched by size only rather than read here
+    length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if length <= settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
+        digest.update(request.body)
+    else:
+        digest.update(str(length).encode())
+    return digest.hexdigest()
+
+
+def claim(request, key):
+    """
+    Claim ``key`` for this request
+
+    Returns (record, None) when the request should run, or (None, response)
+    with the stored response or a conflict error when it should not.
+    """
+    client = client_for(request)
+    fingerprint = request_hash(request)
+    now = timezone.now()
+    # An unfinished claim this old belongs to a request that died mid-way
+    abandoned_before = now - timedelta(seconds=settings.IDEMPOTENCY_IN_FLIGHT_SECONDS)
+    IdempotencyKey.objects.filter(client=client, key=key).filter(
+        Q(expires_at__lte=now) | Q(status_code__isnull=True, created_at__lt=abandoned_before)
+    ).delete()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                key=key,
+                client=client,
+                request_hash=fingerprint,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+            )
+        return record, None
+    except IntegrityError:
+        pass
+
+    existing = IdempotencyKey.objects.filter(client=client, key=key).first()
+    if existing is None:
+        # Finished and swept between the insert and this read; run it again
+        return claim(request, key)
+    if existing.request_hash != fingerprint:
+        return None, JsonResponse(
+            {'error': 'Idempotency-Key was already used for a different request'}, status=422
+        )
+    if existing.status_code is None:
+        response = JsonResponse(
+            {'error': 'A request with this Idempotency-Key is still being processed'}, status=409
+        )
+        response['Retry-After'] = '1'
+        return None, response
+    return None, replay(existing)
+
+
+def replay(record):
+    response = HttpResponse(bytes(record.response_body), status=record.status_code, content_type=record.content_type)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def store(record, response):
+    """Keep the response for replays, or release the key if it can't be replayed"""
+    if response.streaming or response.status_code >= 500 or response.status_code in TRANSIENT_STATUS_CODES:
+        record.delete()
+        return
+    IdempotencyKey.objects.filter(pk=record.pk).update(
+        status_code=response.status_code,
+        content_type=response.get('Content-Type', ''),
+        response_body=response.content,
+    )
+
+
+def sweep_expired(batch_size=None, progress=None):
+    """Delete expired keys in batches of primary keys; returns rows deleted"""
+    batch_size = batch_size or settings.IDEMPOTENCY_SWEEP_BATCH_SIZE
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
+        if progress:
+            progress(deleted)
@@ -0,0 +1,308 @@
+"""
+Streaming import of the national farm registry (CSV or XLSX)
+
+Rows are read one at a time and processed in chunks. Each chunk is one
+transaction that:
+
+- resolves district codes from the in-memory district map
+- loads the existing farms sharing a normalized phone with one query
+- upserts farms by (normalized phone, normalized farmer name) with
+  bulk_create / bulk_update
+- upserts one herd per animal type column with bulk_create / bulk_update
+- advances the ImportRun checkpoint
+
+so after a failure the import can resume after the last committed row.
+
+Expected columns (header names are case-insensitive): district (code),
+farmer_name, phone, village, and optionally location_lat, location_lng and
+one headcount column per animal type (cattle, sheep, goat, horse, poultry).
+"""
+import codecs
+import csv
+import hashlib
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import bump_generation
+from .coverage import mark_stale
+from .geo import farm_index
+from .lookups import district_id_for_code
+from .models import ArchivedCropIssue, ArchivedEvent, CropIssue, Event, Farm, Herd, ImportRun
+from .normalize import normalize_name, normalize_phone
+from .outbreaks import ALL_SPECIES
+
+
+FARM_FIELDS = ['district_id', 'farmer_name', 'phone', 'phone_normalized', 'village', 'location_lat', 'location_lng']
+
+# Keep the first few row errors on the run; the rest are only counted
+MAX_STORED_ERRORS = 100
+
+
+class RegistryImportError(ValueError):
+    pass
+
+
+def file_sha256(fileobj):
+    """Hash a seekable binary file in blocks and rewind it"""
+    digest = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(1 << 20), b''):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def _csv_rows(fileobj):
+    reader = csv.reader(codecs.iterdecode(fileobj, 'utf-8-sig'))
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [name.strip().lower() for name in header]
+    for values in reader:
+        yield dict(zip(columns, values))
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    # Numeric cells (e.g. phones typed as numbers) come back as floats
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _xlsx_rows(fileobj):
+    # Checked before the first row is read, so uploads are rejected up front
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RegistryImportError("Reading .xlsx files requires openpyxl (pip install openpyxl)")
+
+    def rows():
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            values = workbook.active.iter_rows(values_only=True)
+            header = next(values, None)
+            if header is None:
+                return
+            columns = [str(name or '').strip().lower() for name in header]
+            for row in values:
+                yield {column: _cell_text(value) for column, value in zip(columns, row)}
+        finally:
+            workbook.close()
+    return rows()
+
+
+def read_rows(fileobj, filename):
+    """Yield each data row of a CSV or XLSX file as a dict keyed by lower-cased header"""
+    if filename.lower().endswith('.xlsx'):
+        return _xlsx_rows(fileobj)
+    if filename.lower().endswith('.csv'):
+        return _csv_rows(fileobj)
+    raise RegistryImportError("Only .csv and .xlsx files can be imported")
+
+
+def _float(value, name):
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise RegistryImportError(f"{name} is not a number")
+
+
+def parse_row(row):
+    """Validate one row; returns (farm field values, {animal_type: headcount})"""
+    code = (row.get('district') or row.get('district_code') or '').strip()
+    district_id = district_id_for_code(code)
+    if district_id is None:
+        raise RegistryImportError(f"Unknown district code {code!r}")
+    farmer_name = ' '.join((row.get('farmer_name') or '').split())
+    phone = (row.get('phone') or '').strip()
+    if not farmer_name or not normalize_phone(phone):
+        raise RegistryImportError("farmer_name and phone are required")
+
+    headcounts = {}
+    for animal_type in ALL_SPECIES:
+        value = (row.get(animal_type) or '').strip()
+        if value:
+            try:
+                headcounts[animal_type] = int(float(value))
+            except ValueError:
+                raise RegistryImportError(f"{animal_type} headcount is not a number")
+            if headcounts[animal_type] < 0:
+                raise RegistryImportError(f"{animal_type} headcount is negative")
+
+    values = {
+        'district_id': district_id,
+        'farmer_name': farmer_name[:200],
+        'phone': phone[:20],
+        'phone_normalized': normalize_phone(phone)[:20],
+        'village': (row.get('village') or '').strip()[:100],
+        'location_lat': _float(row.get('location_lat'), 'location_lat'),
+        'location_lng': _float(row.get('location_lng'), 'location_lng'),
+    }
+    return values, headcounts
+
+
+class _Chunk:
+    """Parsed rows of one chunk, merged by match key (the last row wins)"""
+
+    def __init__(self):
+        self.farms = {}
+        self.headcounts = {}
+        self.errors = []
+
+    def add(self, row_number, row):
+        try:
+            values, headcounts = parse_row(row)
+        except RegistryImportError as exc:
+            self.errors.append({'row': row_number, 'error': str(exc)})
+            return
+        key = (values['phone_normalized'], normalize_name(values['farmer_name']))
+        self.farms[key] = values
+        self.headcounts.setdefault(key, {}).update(headcounts)
+
+
+def _write_chunk(chunk, touched):
+    """Upsert a chunk's farms and herds; returns (created, updated, herds written)"""
+    existing = {}
+    phones = {phone for phone, _ in chunk.farms}
+    for farm in Farm.objects.filter(phone_normalized__in=phones).order_by('id'):
+        existing.setdefault((farm.phone_normalized, normalize_name(farm.farmer_name)), farm)
+
+    to_create, to_update, moved = [], [], {}
+    farms_by_key = {}
+    for key, values in chunk.farms.items():
+        farm = existing.get(key)
+        if farm is None:
+            farm = Farm(**values)
+            to_create.append(farm)
+        else:
+            if farm.district_id != values['district_id']:
+                moved.setdefault(values['district_id'], []).append(farm.id)
+                touched.add((farm.district_id, None))
+            if any(getattr(farm, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(farm, field, value)
+                to_update.append(farm)
+        farms_by_key[key] = farm
+
+    Farm.objects.bulk_create(to_create)
+    if to_update:
+        now = timezone.now()
+        for farm in to_update:
+            farm.updated_at = now
+        Farm.objects.bulk_update(to_update, FARM_FIELDS + ['updated_at'])
+    # bulk_update skips Farm.save(), so keep the denormalized district in sync here
+    for district_id, farm_ids in moved.items():
+        for model in (Event, CropIssue, ArchivedEvent, ArchivedCropIssue):
+            model.objects.filter(farm_id__in=farm_ids).update(district_id=district_id)
+
+    # One herd per farm and animal type: update the oldest, or create one.
+    # Herds of moved farms are loaded too so their new district gets refreshed.
+    moved_ids = {farm_id for farm_ids in moved.values() for farm_id in farm_ids}
+    farms_by_id = {farm.id: farm for farm in farms_by_key.values()}
+    farm_ids = [
+        farm.id for key, farm in farms_by_key.items()
+        if chunk.headcounts.get(key) or farm.id in moved_ids
+    ]
+    herds = {}
+    for herd in Herd.objects.filter(farm_id__in=farm_ids).order_by('id'):
+        herds.setdefault((herd.farm_id, herd.animal_type), herd)
+        if herd.farm_id in moved_ids:
+            touched.add((farms_by_id[herd.farm_id].district_id, herd.animal_type))
+    herds_to_create, herds_to_update = [], []
+    for key, farm in farms_by_key.items():
+        for animal_type, headcount in chunk.headcounts.get(key, {}).items():
+            touched.add((farm.district_id, animal_type))
+            herd = herds.get((farm.id, animal_type))
+            if herd is None:
+                herds_to_create.append(Herd(farm_id=farm.id, animal_type=animal_type, headcount=headcount))
+            elif herd.headcount != headcount:
+                herd.headcount = headcount
+                herds_to_update.append(herd)
+    Herd.objects.bulk_create(herds_to_create)
+    Herd.objects.bulk_update(herds_to_update, ['headcount'])
+
+    return len(to_create), len(to_update), len(herds_to_create) + len(herds_to_update)
+
+
+def _commit_chunk(run, chunk, rows_processed, touched):
+    with transaction.atomic():
+        created, updated, herds = _write_chunk(chunk, touched)
+        run.rows_processed = rows_processed
+        run.rows_failed += len(chunk.errors)
+        run.farms_created += created
+        run.farms_updated += updated
+        run.herds_written += herds
+        run.errors = (run.errors + chunk.errors)[:MAX_STORED_ERRORS]
+        run.save()
+
+
+def import_farms(fileobj, filename, chunk_size=None, resume=False, progress=None, run=None):
+    """
+    Import a registry file (binary, seekable) and return its ImportRun
+
+    With ``resume`` the latest unfinished run of the same file continues
+    after its last committed row. ``progress(run, rows_per_second)`` is
+    called after every chunk.
+    """
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    sha256 = file_sha256(fileobj)
+    rows = read_rows(fileobj, filename)
+    if run is None and resume:
+        run = ImportRun.objects.filter(source_sha256=sha256).exclude(status='completed').first()
+    if run is None:
+        run = ImportRun.objects.create(source_name=filename, source_sha256=sha256)
+    else:
+        run.source_sha256 = sha256
+        run.status = 'running'
+        run.save(update_fields=['source_sha256', 'status', 'updated_at'])
+
+    skip = run.rows_processed
+    started = time.perf_counter()
+    touched = set()
+    chunk = _Chunk()
+    row_number = 0
+    try:
+        for row_number, row in enumerate(rows, start=1):
+            if row_number <= skip:
+                continue
+            chunk.add(row_number, row)
+            if (row_number - skip) % chunk_size == 0:
+                _commit_chunk(run, chunk, row_number, touched)
+                chunk = _Chunk()
+                if progress:
+                    progress(run, (row_number - skip) / (time.perf_counter() - started))
+        if chunk.farms or chunk.errors:
+            _commit_chunk(run, chunk, row_number, touched)
+            if progress:
+                progress(run, (row_number - skip) / (time.perf_counter() - started))
+    except Exception as exc:
+        run.status = 'failed'
+        run.errors = (run.errors + [{'row': run.rows_processed + 1, 'error': str(exc)}])[:MAX_STORED_ERRORS]
+        run.save(update_fields=['status', 'errors', 'updated_at'])
+        raise
+    finally:
+        _after_import(touched)
+
+    run.status = 'completed'
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'finished_at', 'updated_at'])
+    return run
+
+
+def _after_import(touched):
+    """Invalidate what the bulk writes bypassed model signals for"""
+    farm_index.invalidate()
+    bump_generation('dashboard')
+    bump_generation('admin-count')
+    # (district, None) marks a district farms moved out of, taking their crop issues along
+    if any(animal_type is None for _, animal_type in touched):
+        bump_generation('crop-issue-stats')
+    for district_id, animal_type in touched:
+        mark_stale(district_id, animal_type)
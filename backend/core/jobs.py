@@ -0,0 +1,233 @@
+"""
+Database-backed background job queue
+
+Jobs are rows in the Job table, so no external broker is needed. Workers
+(manage.py run_worker) claim a job with a conditional UPDATE that only one
+process can win, run its registered handler on a thread pool, and record the
+result. Failures are retried with exponential backoff until max_attempts.
+
+Handlers are registered by kind with the ``job`` decorator (see core.tasks)
+and called as ``handler(job, **params)``. They may report progress with
+``report_progress``, attach a downloadable file with ``attach_result_file``
+and return a JSON-serializable result. While a handler runs, a heartbeat
+thread refreshes the job's ``locked_at`` every JOB_HEARTBEAT_SECONDS, so
+only jobs whose worker died are requeued as stale; a worker whose job was
+requeued anyway doesn't record its outcome over the new run's.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.db import OperationalError, close_old_connections, connection
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def job(kind):
+    """Register the decorated function as the handler for jobs of ``kind``"""
+    def register(handler):
+        _handlers[kind] = handler
+        return handler
+    return register
+
+
+def registered_kinds():
+    return sorted(_handlers)
+
+
+def enqueue(kind, params=None, priority=0, max_attempts=3, input_file=None):
+    """Queue a job; ``input_file`` is an optional django File saved alongside it"""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    new_job = Job(
+        kind=kind,
+        params=params or {},
+        priority=priority,
+        max_attempts=max_attempts,
+        run_after=timezone.now(),
+    )
+    if input_file is not None:
+        new_job.input_file.save(os.path.basename(input_file.name), input_file, save=False)
+    new_job.save()
+    return new_job
+
+
+def report_progress(job, fraction=None, message=''):
+    Job.objects.filter(pk=job.pk).update(
+        progress=fraction, progress_message=message[:255], locked_at=timezone.now()
+    )
+
+
+def attach_result_file(job, filename, content):
+    """Store bytes or a binary file object as the job's downloadable result"""
+    job.result_file.save(filename, ContentFile(content) if isinstance(content, bytes) else File(content), save=False)
+    Job.objects.filter(pk=job.pk).update(result_file=job.result_file.name)
+
+
+def _update(queryset, tries=5, **changes):
+    """queryset.update() retried with backoff while the database is locked by another writer"""
+    for attempt in range(tries):
+        try:
+            return queryset.update(**changes)
+        except OperationalError:
+            if attempt == tries - 1:
+                raise
+            time.sleep(0.05 * 2 ** attempt)
+
+
+def requeue_stale():
+    """Put back jobs whose worker stopped reporting (e.g. it was killed)"""
+    stale_before = timezone.now() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    return _update(
+        Job.objects.filter(status='running', locked_at__lt=stale_before),
+        status='queued', locked_by='', locked_at=None, run_after=timezone.now()
+    )
+
+
+class Heartbeat:
+    """Keep a running job's lock fresh from a background thread until stopped"""
+
+    def __init__(self, claimed, interval=None):
+        self.claimed = claimed
+        self.interval = interval or settings.JOB_HEARTBEAT_SECONDS
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f'job-heartbeat-{claimed.pk}', daemon=True)
+
+    def _beat(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                Job.objects.filter(pk=self.claimed.pk, status='running', locked_by=self.claimed.locked_by).update(
+                    locked_at=timezone.now()
+                )
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+
+def claim_next(worker_id):
+    """Claim the highest-priority due job for this worker, or return None"""
+    while True:
+        now = timezone.now()
+        candidate = (
+            Job.objects.filter(status='queued', run_after__lte=now)
+            .order_by('-priority', 'run_after', 'id')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if candidate is None:
+            return None
+        # Only one worker can move the row out of 'queued'; losers try the next job
+        claimed = Job.objects.filter(pk=candidate, status='queued').update(
+            status='running', locked_by=worker_id, locked_at=now, started_at=now
+        )
+        if claimed:
+            return Job.objects.get(pk=candidate)
+
+
+def execute(claimed):
+    """Run a claimed job's handler and record success, a retry or failure"""
+    attempts = claimed.attempts + 1
+    # Only the worker still holding the lock may record the outcome
+    locked = Job.objects.filter(pk=claimed.pk, status='running', locked_by=claimed.locked_by)
+    try:
+        handler = _handlers[claimed.kind]
+        with Heartbeat(claimed):
+            result = handler(claimed, **claimed.params)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s (%s) attempt %s failed", claimed.pk, claimed.kind, attempts)
+        if attempts < claimed.max_attempts and claimed.kind in _handlers:
+            backoff = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+            recorded = _update(
+                locked,
+                status='queued', attempts=attempts, error=error, locked_by='', locked_at=None,
+                run_after=timezone.now() + timedelta(seconds=backoff),
+            )
+        else:
+            recorded = _update(
+                locked,
+                status='failed', attempts=attempts, error=error, finished_at=timezone.now()
+            )
+        if not recorded:
+            logger.warning("Job %s (%s) lost its lock; outcome not recorded", claimed.pk, claimed.kind)
+        return False
+    recorded = _update(
+        locked,
+        status='succeeded', attempts=attempts, result=result, error='', progress=1.0,
+        finished_at=timezone.now(),
+    )
+    if not recorded:
+        logger.warning("Job %s (%s) lost its lock; outcome not recorded", claimed.pk, claimed.kind)
+        return False
+    return True
+
+
+def run_pending(worker_id='inline'):
+    """Run due jobs one at a time on the calling thread until none are left; returns jobs run"""
+    count = 0
+    while (claimed := claim_next(worker_id)) is not None:
+        execute(claimed)
+        count += 1
+    return count
+
+
+class Worker:
+    """Poll the queue and run up to ``threads`` jobs at once"""
+
+    def __init__(self, threads=None, poll_seconds=None):
+        self.threads = threads or settings.JOB_WORKER_THREADS
+        self.poll_seconds = poll_seconds or settings.JOB_POLL_SECONDS
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._slots = threading.BoundedSemaphore(self.threads)
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self, claimed):
+        try:
+            close_old_connections()
+            execute(claimed)
+        finally:
+            close_old_connections()
+            self._slots.release()
+
+    def run(self):
+        requeue_stale()
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='job-worker') as pool:
+            while not self._stopping.is_set():
+                if not self._slots.acquire(timeout=self.poll_seconds):
+                    continue
+                try:
+                    claimed = claim_next(self.worker_id)
+                    if claimed is None:
+                        requeue_stale()
+                except OperationalError:
+                    # Locked by another writer; poll again rather than stop the worker
+                    logger.warning("Job queue poll failed", exc_info=True)
+                    claimed = None
+                if claimed is None:
+                    self._slots.release()
+                    self._stopping.wait(self.poll_seconds)
+                    continue
+                pool.submit(self._run, claimed)
@@ -0,0 +1,80 @@
+"""
+Small in-process caches for reference data
+
+Districts are few and rarely change, so the whole code <-> id map is loaded
+at once and dropped whenever a District is saved or deleted (see signals).
+An unknown code triggers a reload in case another process added it, but at
+most once per RELOAD_ON_MISS_SECONDS, so a client repeating a bad
+``?district=`` can't make every request reload the table.
+"""
+import threading
+import time
+
+from .models import District
+
+
+RELOAD_ON_MISS_SECONDS = 5
+
+_lock = threading.Lock()
+_district_ids_by_code = None
+_district_codes_by_id = None
+_loaded_at = 0.0
+
+
+def _load_districts():
+    global _district_ids_by_code, _district_codes_by_id, _loaded_at
+    rows = list(District.objects.values_list('code', 'id'))
+    ids_by_code = dict(rows)
+    codes_by_id = {district_id: code for code, district_id in rows}
+    with _lock:
+        _district_ids_by_code = ids_by_code
+        _district_codes_by_id = codes_by_id
+        _loaded_at = time.monotonic()
+    return ids_by_code, codes_by_id
+
+
+def _reload_on_miss():
+    return time.monotonic() - _loaded_at >= RELOAD_ON_MISS_SECONDS
+
+
+def prime_district_cache():
+    _load_districts()
+
+
+def clear_district_cache():
+    global _district_ids_by_code, _district_codes_by_id
+    with _lock:
+        _district_ids_by_code = None
+        _district_codes_by_id = None
+
+
+def district_id_for_code(code):
+    """Resolve a district code to its id, or None if there is no such district"""
+    mapping = _district_ids_by_code
+    if mapping is None or (code not in mapping and _reload_on_miss()):
+        mapping = _load_districts()[0]
+    return mapping.get(code)
+
+
+def district_code_for_id(district_id):
+    """Resolve a district id to its code, or None if there is no such district"""
+    mapping = _district_codes_by_id
+    if mapping is None or (district_id not in mapping and _reload_on_miss()):
+        mapping = _load_districts()[1]
+    return mapping.get(district_id)
+
+
+def district_ids_by_code():
+    """The whole district code -> id map"""
+    mapping = _district_ids_by_code
+    if mapping is None:
+        mapping = _load_districts()[0]
+    return mapping
+
+
+def filter_by_district(queryset, district_code, field='district_id'):
+    """Filter on a district id column by code without joining District"""
+    district_id = district_id_for_code(district_code)
+    if district_id is None:
+        return queryset.none()
+    return queryset.filter(**{field: district_id})
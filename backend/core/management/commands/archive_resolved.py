@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.archive import archive_resolved
+
+
+class Command(BaseCommand):
+    help = 'Moves resolved events and crop issues older than a cutoff into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=settings.ARCHIVE_RESOLVED_AFTER_DAYS,
+            help='Archive resolved records created more than this many days ago',
+        )
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE)
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted run with its original cutoff',
+        )
+
+    def handle(self, *args, **options):
+        def progress(label, total):
+            self.stdout.write(f'{label}: {total} archived so far')
+
+        results = archive_resolved(
+            older_than_days=options['older_than_days'],
+            batch_size=options['batch_size'],
+            resume=options['resume'],
+            progress=progress,
+        )
+        for label, count in results.items():
+            self.stdout.write(self.style.SUCCESS(f'Archived {count} {label} records'))
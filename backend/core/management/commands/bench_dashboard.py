@@ -0,0 +1,65 @@
+import asyncio
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from core.views import dashboard_summary, dashboard_summary_async
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the sync dashboard summary view against the async variant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--district', default=None, help='District code to filter by')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        params = {'district': options['district']} if options['district'] else {}
+        factory = RequestFactory()
+
+        def run_sync():
+            request = factory.get('/api/dashboard/summary/', params)
+            response = dashboard_summary(request)
+            response.render()
+            return response
+
+        async def run_async():
+            request = factory.get('/api/dashboard/summary/async/', params)
+            return await dashboard_summary_async(request)
+
+        async def time_async():
+            timings = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                await run_async()
+                timings.append(time.perf_counter() - started)
+            return timings
+
+        # Warm up connections and the aggregate thread pool
+        run_sync()
+        asyncio.run(run_async())
+
+        sync_timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            run_sync()
+            sync_timings.append(time.perf_counter() - started)
+
+        async_timings = asyncio.run(time_async())
+
+        self.report('sync', sync_timings)
+        self.report('async', async_timings)
+
+        speedup = statistics.mean(sync_timings) / statistics.mean(async_timings)
+        self.stdout.write(self.style.SUCCESS(f'async speedup: {speedup:.2f}x'))
+
+    def report(self, label, timings):
+        timings_ms = sorted(t * 1000 for t in timings)
+        p95 = timings_ms[max(0, int(len(timings_ms) * 0.95) - 1)]
+        self.stdout.write(
+            f'{label:>5}: mean {statistics.mean(timings_ms):.2f} ms, '
+            f'p50 {statistics.median(timings_ms):.2f} ms, p95 {p95:.2f} ms'
+        )
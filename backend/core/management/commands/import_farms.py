@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import RegistryImportError, import_farms
+
+
+class Command(BaseCommand):
+    help = 'Imports (upserts) farms and herds from a registry CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to a .csv or .xlsx file')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows written per transaction')
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an unfinished import of the same file after its last committed row',
+        )
+
+    def handle(self, *args, **options):
+        def progress(run, rows_per_second):
+            self.stdout.write(f'{run.rows_processed} rows processed ({rows_per_second:.0f} rows/sec)')
+
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                run = import_farms(
+                    fileobj,
+                    options['path'],
+                    chunk_size=options['chunk_size'],
+                    resume=options['resume'],
+                    progress=progress,
+                )
+        except (OSError, RegistryImportError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {run.rows_processed} rows: {run.farms_created} farms created, '
+            f'{run.farms_updated} updated, {run.herds_written} herds written, {run.rows_failed} rows failed'
+        ))
+        for error in run.errors:
+            self.stdout.write(self.style.WARNING(f"Row {error['row']}: {error['error']}"))
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.duplicates import index_recent, prune
+
+
+class Command(BaseCommand):
+    help = 'Signs recent events and crop issues for near-duplicate detection and prunes old signatures'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.DUPLICATE_WINDOW_DAYS,
+            help='Sign unsigned reports created in the last this many days',
+        )
+
+    def handle(self, *args, **options):
+        def progress(signed, found):
+            self.stdout.write(f'{signed} reports signed, {found} duplicates so far')
+
+        pruned = prune(timezone.now() - timedelta(days=settings.DUPLICATE_WINDOW_DAYS))
+        signed, found = index_recent(days=options['days'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Signed {signed} reports, found {found} duplicates, pruned {pruned} old signatures'
+        ))
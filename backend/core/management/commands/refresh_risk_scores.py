@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.risk import refresh_risk_scores
+
+
+class Command(BaseCommand):
+    help = 'Recomputes farm outbreak risk scores and stores the ones that changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Farms scored per vectorized batch')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = refresh_risk_scores(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Updated {written} farm risk scores in {elapsed:.2f}s'))
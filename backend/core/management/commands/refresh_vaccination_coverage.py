@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.coverage import refresh_vaccination_coverage
+
+
+class Command(BaseCommand):
+    help = 'Recomputes vaccination coverage for districts that changed since the last refresh'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every district')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        refreshed = refresh_vaccination_coverage(full=options['full'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Refreshed coverage for {refreshed} districts in {elapsed:.2f}s'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.vocabulary import VOCABULARIES, relink_records
+
+
+class Command(BaseCommand):
+    help = 'Re-resolves crop types and suspected diseases after the vocabularies were edited'
+
+    def add_arguments(self, parser):
+        parser.add_argument('vocabulary', nargs='*', choices=sorted(VOCABULARIES), help='Defaults to all')
+
+    def handle(self, *args, **options):
+        for vocabulary in options['vocabulary'] or sorted(VOCABULARIES):
+            changed = relink_records(vocabulary)
+            self.stdout.write(self.style.SUCCESS(f'Re-linked {changed} records to the {vocabulary} vocabulary'))
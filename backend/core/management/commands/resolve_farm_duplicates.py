@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.merging import resolve_farms
+
+
+class Command(BaseCommand):
+    help = 'Finds farms registered more than once and merges them into the oldest registration (dry run by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Merge the matched farms instead of only reporting them',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the full merge plan as JSON to this file',
+        )
+
+    def handle(self, *args, **options):
+        def progress(done, total):
+            if done % 100 == 0:
+                self.stdout.write(f'{done} of {total} clusters merged')
+
+        plan = resolve_farms(apply=options['apply'], progress=progress)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(plan, output, ensure_ascii=False, indent=2)
+        for merge in plan['merges']:
+            self.stdout.write(
+                f"#{merge['survivor']} {merge['survivor_name']} <- "
+                + ', '.join(f'#{farm_id} {name}' for farm_id, name in zip(merge['merged'], merge['merged_names']))
+            )
+        merged = sum(len(merge['merged']) for merge in plan['merges'])
+        summary = (
+            f"{plan['farms']} farms, {plan['pairs_compared']} pairs compared: "
+            f"{merged} farms in {len(plan['merges'])} clusters, {len(plan['review'])} pairs for review"
+        )
+        if plan['applied']:
+            self.stdout.write(self.style.SUCCESS(f"Merged {summary}; {plan['records_moved']} records moved"))
+        else:
+            self.stdout.write(self.style.WARNING(f'Dry run, nothing changed. {summary}'))
@@ -0,0 +1,35 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.caching import cache_is_shared
+from core.jobs import Worker, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs from the database on a thread pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=None, help='Jobs run at the same time')
+        parser.add_argument('--poll-seconds', type=float, default=None, help='Wait between polls of an empty queue')
+        parser.add_argument('--once', action='store_true', help='Run due jobs one by one until the queue is empty, then exit')
+
+    def handle(self, *args, **options):
+        if not cache_is_shared():
+            # Cache invalidations made by jobs would never reach the web processes
+            raise CommandError(
+                'The worker needs a cache shared with the web processes: '
+                'set AKYL_JER_REDIS_URL or AKYL_JER_MEMCACHED_LOCATION'
+            )
+        if options['once']:
+            count = run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Ran {count} jobs'))
+            return
+
+        worker = Worker(threads=options['threads'], poll_seconds=options['poll_seconds'])
+        # Finish running jobs on SIGTERM/Ctrl-C instead of abandoning them
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        signal.signal(signal.SIGINT, lambda *_: worker.stop())
+        self.stdout.write(f'Worker {worker.worker_id} running {worker.threads} threads')
+        worker.run()
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.idempotency import sweep_expired
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired Idempotency-Key records in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.IDEMPOTENCY_SWEEP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        deleted = sweep_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
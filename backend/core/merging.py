@@ -0,0 +1,221 @@
+"""
+Farm entity resolution: find farms registered more than once and merge them
+
+Farms are grouped into blocks that share a normalized phone, or a district
+and a phonetic name key (core.normalize), and only farms within a block are
+compared, never all pairs. A pair is scored from name similarity (which must
+reach FARM_MATCH_MIN_NAME_SIMILARITY, so relatives sharing a phone stay
+apart), equal phones, village similarity and the same district. Pairs
+scoring FARM_MATCH_THRESHOLD or more are clustered; the oldest farm of each
+cluster survives. Pairs between FARM_MATCH_REVIEW_THRESHOLD and the match
+threshold are only reported for review.
+
+Applying the plan re-points herds, events and crop issues (hot and archived)
+to the survivor with one UPDATE per model and cluster, then deletes the
+merged farms. Where both farms have a herd of one animal type the survivor's
+herd is kept with the larger headcount, since both registrations count the
+same animals.
+"""
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .caching import bump_generation
+from .coverage import mark_stale
+from .geo import farm_index
+from .models import ArchivedCropIssue, ArchivedEvent, CropIssue, Event, Farm, Herd
+from .normalize import normalize_name, phonetic_key, transliterate
+
+
+FARM_RECORD_MODELS = [Event, CropIssue, ArchivedEvent, ArchivedCropIssue]
+
+
+def _comparable(text):
+    """Lower-cased Latin form with words sorted, so word order and script don't matter"""
+    return ' '.join(sorted(transliterate(normalize_name(text)).split()))
+
+
+def _ratio(left, right):
+    if not left or not right:
+        return 0.0
+    return SequenceMatcher(None, left, right).ratio()
+
+
+def score_pair(left, right):
+    """Match score in [0, 1] and the reasons behind it, or (0, []) below the name gate"""
+    name = _ratio(left['name'], right['name'])
+    if name < settings.FARM_MATCH_MIN_NAME_SIMILARITY:
+        return 0.0, []
+    reasons = [f'name {name:.2f}']
+    score = 0.5 * name
+    if left['phone'] and left['phone'] == right['phone']:
+        score += 0.3
+        reasons.append('same phone')
+    village = _ratio(left['village'], right['village'])
+    score += 0.1 * village
+    reasons.append(f'village {village:.2f}')
+    if left['district_id'] == right['district_id']:
+        score += 0.1
+        reasons.append('same district')
+    return round(score, 3), reasons
+
+
+def _load_farms():
+    farms = {}
+    rows = Farm.objects.order_by('id').values_list('id', 'district_id', 'farmer_name', 'phone_normalized', 'village')
+    for farm_id, district_id, farmer_name, phone, village in rows.iterator(chunk_size=5000):
+        farms[farm_id] = {
+            'id': farm_id,
+            'district_id': district_id,
+            'farmer_name': farmer_name,
+            'name': _comparable(farmer_name),
+            'key': phonetic_key(farmer_name),
+            'phone': phone,
+            'village': _comparable(village),
+        }
+    return farms
+
+
+def blocks(farms):
+    """Groups of farm ids sharing a blocking key; oversized blocks are skipped"""
+    grouped = defaultdict(list)
+    for farm in farms.values():
+        if farm['phone']:
+            grouped[('phone', farm['phone'])].append(farm['id'])
+        if farm['key']:
+            grouped[('name', farm['district_id'], farm['key'])].append(farm['id'])
+    return [ids for ids in grouped.values() if 1 < len(ids) <= settings.FARM_BLOCK_MAX_SIZE]
+
+
+def _find(parents, farm_id):
+    while parents[farm_id] != farm_id:
+        parents[farm_id] = parents[parents[farm_id]]
+        farm_id = parents[farm_id]
+    return farm_id
+
+
+def build_plan():
+    """
+    Score candidate pairs and return the merge plan:
+
+    {'farms': n, 'pairs_compared': n, 'merges': [{'survivor', 'merged', 'matches'}],
+     'review': [{'farms', 'score', 'reasons'}]}
+    """
+    farms = _load_farms()
+    compared = set()
+    matches, review = [], []
+    for ids in blocks(farms):
+        for index, left_id in enumerate(ids):
+            for right_id in ids[index + 1:]:
+                if (left_id, right_id) in compared:
+                    continue
+                compared.add((left_id, right_id))
+                score, reasons = score_pair(farms[left_id], farms[right_id])
+                if score >= settings.FARM_MATCH_THRESHOLD:
+                    matches.append((left_id, right_id, score, reasons))
+                elif score >= settings.FARM_MATCH_REVIEW_THRESHOLD:
+                    review.append({'farms': [left_id, right_id], 'score': score, 'reasons': reasons})
+
+    # Union-find; the smallest (oldest) id becomes the cluster root
+    parents = {}
+    for left_id, right_id, _, _ in matches:
+        parents.setdefault(left_id, left_id)
+        parents.setdefault(right_id, right_id)
+        left_root, right_root = _find(parents, left_id), _find(parents, right_id)
+        parents[max(left_root, right_root)] = min(left_root, right_root)
+    clusters = defaultdict(lambda: {'merged': [], 'matches': []})
+    for farm_id in parents:
+        root = _find(parents, farm_id)
+        if farm_id != root:
+            clusters[root]['merged'].append(farm_id)
+    for left_id, right_id, score, reasons in matches:
+        clusters[_find(parents, left_id)]['matches'].append(
+            {'farms': [left_id, right_id], 'score': score, 'reasons': reasons}
+        )
+
+    merges = []
+    for survivor, cluster in sorted(clusters.items()):
+        merges.append({
+            'survivor': survivor,
+            'survivor_name': farms[survivor]['farmer_name'],
+            'merged': sorted(cluster['merged']),
+            'merged_names': [farms[farm_id]['farmer_name'] for farm_id in sorted(cluster['merged'])],
+            'matches': cluster['matches'],
+        })
+    review.sort(key=lambda item: -item['score'])
+    return {'farms': len(farms), 'pairs_compared': len(compared), 'merges': merges, 'review': review}
+
+
+def _merge_herds(survivor_id, merged_ids, touched):
+    herds = defaultdict(list)
+    for herd in Herd.objects.filter(farm_id__in=[survivor_id, *merged_ids]).order_by('id'):
+        herds[herd.animal_type].append(herd)
+    to_repoint, to_delete, to_update = [], [], []
+    for animal_type, group in herds.items():
+        touched.add(animal_type)
+        kept = next((herd for herd in group if herd.farm_id == survivor_id), group[0])
+        others = [herd for herd in group if herd is not kept]
+        headcount = max(herd.headcount for herd in group)
+        if kept.headcount != headcount:
+            kept.headcount = headcount
+            to_update.append(kept)
+        if kept.farm_id != survivor_id:
+            to_repoint.append(kept.id)
+        to_delete += [herd.id for herd in others]
+    Herd.objects.filter(id__in=to_delete).delete()
+    Herd.objects.bulk_update(to_update, ['headcount'])
+    Herd.objects.filter(id__in=to_repoint).update(farm_id=survivor_id)
+
+
+def apply_merge(merge):
+    """Re-point one cluster's records to its survivor and delete the merged farms; returns records moved"""
+    survivor = Farm.objects.get(pk=merge['survivor'])
+    merged_ids = list(Farm.objects.filter(pk__in=merge['merged']).values_list('id', flat=True))
+    if not merged_ids:
+        return 0
+    touched_types = set()
+    stale_districts = {survivor.district_id} | set(
+        Farm.objects.filter(pk__in=merged_ids).values_list('district_id', flat=True)
+    )
+    with transaction.atomic():
+        _merge_herds(survivor.id, merged_ids, touched_types)
+        moved = 0
+        for model in FARM_RECORD_MODELS:
+            moved += model.objects.filter(farm_id__in=merged_ids).update(
+                farm_id=survivor.id, district_id=survivor.district_id
+            )
+        # Keep what the survivor is missing
+        merged = Farm.objects.filter(pk__in=merged_ids)
+        if survivor.location_lat is None:
+            located = merged.filter(location_lat__isnull=False, location_lng__isnull=False).first()
+            if located:
+                survivor.location_lat, survivor.location_lng = located.location_lat, located.location_lng
+        latest = merged.aggregate(latest=Max('last_vaccinated_at'))['latest']
+        if latest and (survivor.last_vaccinated_at is None or latest > survivor.last_vaccinated_at):
+            survivor.last_vaccinated_at = latest
+        survivor.save()
+        merged.delete()
+    for district_id in stale_districts:
+        for animal_type in touched_types:
+            mark_stale(district_id, animal_type)
+    return moved
+
+
+def resolve_farms(apply=False, progress=None):
+    """Build the merge plan and, with ``apply``, carry it out; returns the plan"""
+    plan = build_plan()
+    if apply:
+        plan['records_moved'] = 0
+        for done, merge in enumerate(plan['merges'], start=1):
+            plan['records_moved'] += apply_merge(merge)
+            if progress:
+                progress(done, len(plan['merges']))
+        farm_index.invalidate()
+        # queryset.update() skips model signals
+        bump_generation('dashboard')
+        bump_generation('crop-issue-stats')
+    plan['applied'] = apply
+    return plan
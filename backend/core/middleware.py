@@ -0,0 +1,233 @@
+import json
+import time
+from pathlib import Path
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+from . import idempotency
+from .profiling import profile
+from .routers import pinned_to_primary
+from .throttling import db_latency
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class LoadSheddingMiddleware:
+    """
+    Answer low-priority requests with a fast 503 while the database is slow
+
+    While the moving average of database wait (core.throttling.db_latency) is
+    above LOAD_SHED_LATENCY_MS, reads outside LOAD_SHED_EXEMPT_PATHS get a 503
+    with Retry-After before any session or database work; writes (field
+    reports) are always let through. LOAD_SHED_LATENCY_MS = 0 disables it.
+    Only requests outside the exempt paths feed the average.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.exempt(request):
+            return self.get_response(request)
+        if self.should_shed(request):
+            return self.shed()
+        with db_latency.measure():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.exempt(request):
+            return await self.get_response(request)
+        if self.should_shed(request):
+            return self.shed()
+        with db_latency.measure():
+            return await self.get_response(request)
+
+    def exempt(self, request):
+        return request.path.startswith(tuple(settings.LOAD_SHED_EXEMPT_PATHS))
+
+    def should_shed(self, request):
+        threshold = settings.LOAD_SHED_LATENCY_MS
+        return (
+            bool(threshold)
+            and request.method in SAFE_METHODS
+            and db_latency.value_ms() > threshold
+        )
+
+    def shed(self):
+        response = JsonResponse({'error': 'Server is busy, please retry shortly'}, status=503)
+        response['Retry-After'] = str(settings.LOAD_SHED_RETRY_AFTER_SECONDS)
+        return response
+
+
+class ReplicaPinningMiddleware:
+    """
+    Pin requests to the primary database when they need fresh data
+
+    Reads default to the primary; only safe-method requests are unpinned and
+    read from replicas. A successful write also sets a short-lived cookie so
+    the same client's following reads stay on the primary until replicas have
+    caught up.
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'db_pin_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with pinned_to_primary(self.should_pin(request)):
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        with pinned_to_primary(self.should_pin(request)):
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def should_pin(self, request):
+        return request.method not in SAFE_METHODS or self.cookie_name in request.COOKIES
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                self.cookie_name,
+                '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class IdempotencyMiddleware:
+    """
+    Replay the stored response for a POST retried with the same Idempotency-Key
+
+    Only POSTs to /api/ carrying the header are affected; see core.idempotency.
+    Place it after ReplicaPinningMiddleware so the key lookups read the primary.
+    """
+    sync_capable = True
+    async_capable = True
+    header = 'HTTP_IDEMPOTENCY_KEY'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = self.key_for(request)
+        if key is None:
+            return self.get_response(request)
+        record, response = idempotency.claim(request, key)
+        if response is not None:
+            return response
+        response = self.get_response(request)
+        idempotency.store(record, response)
+        return response
+
+    async def __acall__(self, request):
+        key = self.key_for(request)
+        if key is None:
+            return await self.get_response(request)
+        record, response = await sync_to_async(idempotency.claim)(request, key)
+        if response is not None:
+            return response
+        response = await self.get_response(request)
+        await sync_to_async(idempotency.store)(record, response)
+        return response
+
+    def key_for(self, request):
+        if request.method != 'POST' or not request.path.startswith('/api/'):
+            return None
+        key = request.META.get(self.header, '').strip()
+        return key[:255] or None
+
+
+class ProfilingMiddleware:
+    """
+    Profile one request for staff users with ?_profile=1 or an X-Profile: 1 header
+
+    The view's response is replaced by a JSON report with the folded stack
+    samples and every SQL query with its duration and call site; with
+    ``_profile=folded`` only the folded stacks are returned as text, ready
+    for flamegraph.pl or speedscope. When PROFILE_STORE_DIR is set the report
+    is also written there. Requests without the flag pay one substring
+    check on the query string and one header lookup. Place it before
+    IdempotencyMiddleware so a key stores the view's response, not the report.
+    """
+    sync_capable = True
+    async_capable = True
+    param = '_profile'
+    header = 'HTTP_X_PROFILE'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = self.requested_mode(request)
+        if mode is None or not request.user.is_staff:
+            return self.get_response(request)
+        return self.profiled(request, self.get_response, mode)
+
+    async def __acall__(self, request):
+        mode = self.requested_mode(request)
+        if mode is None or not (await request.auser()).is_staff:
+            return await self.get_response(request)
+        # Run the rest of the chain from one worker thread; sync views called
+        # from it run back on that thread, which is the one being sampled
+        return await sync_to_async(self.profiled)(request, async_to_sync(self.get_response), mode)
+
+    def requested_mode(self, request):
+        if self.param in request.META.get('QUERY_STRING', ''):
+            mode = request.GET.get(self.param)
+        else:
+            mode = request.META.get(self.header)
+        if mode in (None, '', '0'):
+            return None
+        return 'folded' if mode == 'folded' else 'json'
+
+    def profiled(self, request, get_response, mode):
+        with profile() as result:
+            response = get_response(request)
+        response.close()
+        report = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status_code': response.status_code,
+            **result.report(),
+        }
+        if settings.PROFILE_STORE_DIR:
+            report['stored_as'] = self.store(report)
+        if mode == 'folded':
+            return HttpResponse('\n'.join(report['folded']) + '\n', content_type='text/plain; charset=utf-8')
+        return JsonResponse(report)
+
+    def store(self, report):
+        directory = Path(settings.PROFILE_STORE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        slug = report['path'].split('?')[0].strip('/').replace('/', '-') or 'root'
+        path = directory / f'{time.strftime("%Y%m%d-%H%M%S")}-{report["method"].lower()}-{slug}.json'
+        path.write_text(json.dumps(report, indent=2))
+        path.with_suffix('.folded').write_text('\n'.join(report['folded']) + '\n')
+        return str(path)
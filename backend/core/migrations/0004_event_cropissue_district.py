@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_district(apps, schema_editor):
+    Farm = apps.get_model("core", "Farm")
+    farm_district = Subquery(
+        Farm.objects.filter(pk=OuterRef("farm_id")).values("district_id")[:1]
+    )
+    for model_name in ("Event", "CropIssue"):
+        model = apps.get_model("core", model_name)
+        model.objects.update(district_id=farm_district)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_cropissue"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cropissue",
+            name="district",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="crop_issues",
+                to="core.district",
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="district",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="events",
+                to="core.district",
+            ),
+        ),
+        migrations.RunPython(backfill_district, migrations.RunPython.noop),
+    ]
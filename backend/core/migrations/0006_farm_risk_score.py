@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_archive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="farm",
+            name="risk_score",
+            field=models.FloatField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="farm",
+            name="risk_scored_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
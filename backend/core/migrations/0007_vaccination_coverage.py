@@ -0,0 +1,89 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Q, Subquery
+
+
+def backfill_last_vaccinated_at(apps, schema_editor):
+    Farm = apps.get_model("core", "Farm")
+    for model_name in ("Event", "ArchivedEvent"):
+        model = apps.get_model("core", model_name)
+        latest = Subquery(
+            model.objects.filter(farm_id=OuterRef("pk"), event_type="vaccination")
+            .order_by()
+            .values("farm_id")
+            .annotate(latest=Max("created_at"))
+            .values("latest")
+        )
+        Farm.objects.filter(
+            Q(last_vaccinated_at__isnull=True) | Q(last_vaccinated_at__lt=latest)
+        ).update(last_vaccinated_at=latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_farm_risk_score"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="farm",
+            name="last_vaccinated_at",
+            field=models.DateTimeField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.CreateModel(
+            name="VaccinationCoverage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "animal_type",
+                    models.CharField(
+                        choices=[
+                            ("cattle", "Cattle"),
+                            ("sheep", "Sheep"),
+                            ("goat", "Goat"),
+                            ("horse", "Horse"),
+                            ("poultry", "Poultry"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("herds_total", models.IntegerField(default=0)),
+                ("herds_vaccinated", models.IntegerField(default=0)),
+                ("headcount_total", models.IntegerField(default=0)),
+                ("headcount_vaccinated", models.IntegerField(default=0)),
+                ("stale", models.BooleanField(db_index=True, default=True)),
+                ("computed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "district",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="vaccination_coverage",
+                        to="core.district",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["district__name", "animal_type"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("district", "animal_type"),
+                        name="unique_coverage_district_animal_type",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_last_vaccinated_at, migrations.RunPython.noop),
+    ]
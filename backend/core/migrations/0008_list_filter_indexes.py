@@ -0,0 +1,81 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_vaccination_coverage"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cropissue",
+            index=models.Index(
+                fields=["created_at"], name="core_cropis_created_06c1b2_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cropissue",
+            index=models.Index(
+                fields=["district", "created_at"], name="core_cropis_distric_66a9cc_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cropissue",
+            index=models.Index(
+                fields=["status", "created_at"], name="core_cropis_status_054d03_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cropissue",
+            index=models.Index(
+                fields=["problem_type", "created_at"],
+                name="core_cropis_problem_8114d6_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cropissue",
+            index=models.Index(
+                fields=["severity", "created_at"], name="core_cropis_severit_6116fb_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["created_at"], name="core_event_created_0bbd2e_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["district", "created_at"], name="core_event_distric_75d5fc_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["status", "created_at"], name="core_event_status_610412_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["event_type", "created_at"],
+                name="core_event_event_t_0f2b1b_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="farm",
+            index=models.Index(
+                fields=["created_at"], name="core_farm_created_9bf76c_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="farm",
+            index=models.Index(
+                fields=["district", "created_at"], name="core_farm_distric_a8219d_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_list_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="archivedcropissue",
+            index=models.Index(
+                fields=["farm", "created_at", "id"],
+                name="core_archiv_farm_id_c91986_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="archivedevent",
+            index=models.Index(
+                fields=["farm", "created_at", "id"],
+                name="core_archiv_farm_id_d9463a_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cropissue",
+            index=models.Index(
+                fields=["farm", "created_at", "id"],
+                name="core_cropis_farm_id_843719_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["farm", "created_at", "id"],
+                name="core_event_farm_id_e6f1fc_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:11
+
+from django.db import migrations, models
+
+from core.normalize import normalize_phone
+
+
+def backfill_phone_normalized(apps, schema_editor):
+    Farm = apps.get_model("core", "Farm")
+    batch = []
+    for farm in Farm.objects.only("id", "phone").iterator(chunk_size=2000):
+        farm.phone_normalized = normalize_phone(farm.phone)
+        batch.append(farm)
+        if len(batch) == 2000:
+            Farm.objects.bulk_update(batch, ["phone_normalized"])
+            batch = []
+    Farm.objects.bulk_update(batch, ["phone_normalized"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_farm_timeline_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source_name", models.CharField(max_length=255)),
+                ("source_sha256", models.CharField(db_index=True, max_length=64)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="running",
+                        max_length=20,
+                    ),
+                ),
+                ("rows_processed", models.IntegerField(default=0)),
+                ("rows_failed", models.IntegerField(default=0)),
+                ("farms_created", models.IntegerField(default=0)),
+                ("farms_updated", models.IntegerField(default=0)),
+                ("herds_written", models.IntegerField(default=0)),
+                ("errors", models.JSONField(blank=True, default=list)),
+                ("started_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["-started_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="farm",
+            name="phone_normalized",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=20
+            ),
+        ),
+        migrations.RunPython(backfill_phone_normalized, migrations.RunPython.noop),
+    ]
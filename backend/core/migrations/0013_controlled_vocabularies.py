@@ -0,0 +1,238 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.normalize import normalize_term, transliterate
+
+
+# name, Kyrgyz name, Russian name, other spellings
+CROPS = [
+    ("wheat", "буудай", "пшеница", ["winter wheat", "spring wheat", "озимая пшеница"]),
+    ("barley", "арпа", "ячмень", []),
+    ("potatoes", "картошка", "картофель", ["potato", "картофан"]),
+    ("corn", "жүгөрү", "кукуруза", ["maize"]),
+    ("tomatoes", "помидор", "томат", ["tomato", "помидоры", "томаты"]),
+    ("carrots", "сабиз", "морковь", ["carrot"]),
+    ("onions", "пияз", "лук", ["onion", "репчатый лук"]),
+    ("sunflower", "күн карама", "подсолнечник", ["sunflowers", "подсолнух"]),
+    ("cotton", "пахта", "хлопок", []),
+    ("rice", "күрүч", "рис", []),
+    ("beans", "буурчак", "фасоль", ["bean", "kidney beans"]),
+    ("sugar beet", "кызылча", "сахарная свекла", ["sugar beets", "beet"]),
+    ("alfalfa", "беде", "люцерна", ["lucerne"]),
+    ("apples", "алма", "яблоки", ["apple", "яблоня"]),
+]
+
+DISEASES = [
+    ("Foot-and-mouth disease", "шарп", "ящур", ["fmd", "aphthous fever", "шарп оорусу"]),
+    ("Brucellosis", "бруцеллёз", "бруцеллёз", ["brucella"]),
+    ("Anthrax", "куйдургу", "сибирская язва", ["сибирка"]),
+    ("Tuberculosis", "кургак учук", "туберкулёз", ["tb", "bovine tuberculosis"]),
+    ("Mastitis", "мастит", "мастит", []),
+    ("Blackleg", "эмкар", "эмфизематозный карбункул", ["black quarter", "эмкар оорусу"]),
+    ("Sheep pox", "кой чечеги", "оспа овец", ["sheeppox", "оспа"]),
+    ("Rabies", "кутурма", "бешенство", []),
+    ("Avian influenza", "куш тумоосу", "птичий грипп", ["bird flu", "avian flu", "грипп птиц"]),
+    ("Newcastle disease", "Ньюкасл оорусу", "болезнь Ньюкасла", ["newcastle", "ньюкасл"]),
+]
+
+
+def _seed(Entry, Synonym, entry_field, rows):
+    for name, name_ky, name_ru, others in rows:
+        entry = Entry.objects.create(name=name, name_ky=name_ky, name_ru=name_ru)
+        terms = {normalize_term(term) for term in others}
+        Synonym.objects.bulk_create([Synonym(**{entry_field: entry, "term": term}) for term in sorted(terms)])
+
+
+def _ids_by_term(Entry, Synonym, entry_field):
+    spellings = []
+    for entry in Entry.objects.all():
+        spellings += [(entry.name, entry.id), (entry.name_ky, entry.id), (entry.name_ru, entry.id)]
+    spellings += Synonym.objects.values_list("term", f"{entry_field}_id")
+    ids_by_term = {}
+    for spelling, entry_id in spellings:
+        term = normalize_term(spelling)
+        if term:
+            ids_by_term.setdefault(term, entry_id)
+            ids_by_term.setdefault(transliterate(term), entry_id)
+    return ids_by_term
+
+
+def _link(model, text_field, fk_field, ids_by_term):
+    texts = model.objects.order_by().values_list(text_field, flat=True).distinct()
+    for text in texts:
+        term = normalize_term(text)
+        entry_id = ids_by_term.get(term) or ids_by_term.get(transliterate(term))
+        if entry_id is not None:
+            model.objects.filter(**{text_field: text}).update(**{fk_field: entry_id})
+
+
+def seed_and_backfill(apps, schema_editor):
+    for entry_name, synonym_name, entry_field, text_field, rows, record_models in [
+        ("Crop", "CropSynonym", "crop", "crop_type", CROPS, ["CropIssue", "ArchivedCropIssue"]),
+        ("Disease", "DiseaseSynonym", "disease", "disease_suspected", DISEASES, ["Event", "ArchivedEvent"]),
+    ]:
+        Entry = apps.get_model("core", entry_name)
+        Synonym = apps.get_model("core", synonym_name)
+        _seed(Entry, Synonym, entry_field, rows)
+        ids_by_term = _ids_by_term(Entry, Synonym, entry_field)
+        for model_name in record_models:
+            _link(apps.get_model("core", model_name), text_field, entry_field, ids_by_term)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Crop",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("name_ky", models.CharField(blank=True, max_length=100)),
+                ("name_ru", models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="CropSynonym",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("term", models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Disease",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=200, unique=True)),
+                ("name_ky", models.CharField(blank=True, max_length=200)),
+                ("name_ru", models.CharField(blank=True, max_length=200)),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+        migrations.CreateModel(
+            name="DiseaseSynonym",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("term", models.CharField(max_length=200, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="archivedcropissue",
+            name="crop",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="archived_crop_issues",
+                to="core.crop",
+            ),
+        ),
+        migrations.AddField(
+            model_name="cropissue",
+            name="crop",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="crop_issues",
+                to="core.crop",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cropissue",
+            index=models.Index(
+                fields=["crop", "created_at"], name="core_cropis_crop_id_12b627_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="cropsynonym",
+            name="crop",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="synonyms",
+                to="core.crop",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedevent",
+            name="disease",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="archived_events",
+                to="core.disease",
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="disease",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="events",
+                to="core.disease",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["disease", "created_at"], name="core_event_disease_5c98e9_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="diseasesynonym",
+            name="disease",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="synonyms",
+                to="core.disease",
+            ),
+        ),
+        migrations.RunPython(seed_and_backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_controlled_vocabularies"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedcropissue",
+            name="duplicate_of_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="archivedevent",
+            name="duplicate_of_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="cropissue",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="duplicates",
+                to="core.cropissue",
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="duplicates",
+                to="core.event",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ReportBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=20)),
+                ("bucket", models.BigIntegerField()),
+                ("record_id", models.BigIntegerField()),
+                ("created_at", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["kind", "bucket"], name="core_report_kind_43fd9a_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ReportSignature",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=20)),
+                ("record_id", models.BigIntegerField()),
+                ("signature", models.BinaryField()),
+                ("created_at", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "record_id"), name="unique_report_signature"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_report_duplicates"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="cropissue",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="duplicates",
+                to="core.cropissue",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="event",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="duplicates",
+                to="core.event",
+            ),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from .normalize import normalize_phone, normalize_term
+
 
 class District(models.Model):
     """Administrative district/region"""
@@ -13,22 +15,106 @@ class District(models.Model):
         return f"{self.name} ({self.code})"
 
 
+class Crop(models.Model):
+    """Canonical crop in the controlled vocabulary (core.vocabulary)"""
+    name = models.CharField(max_length=100, unique=True)  # English, e.g. wheat
+    name_ky = models.CharField(max_length=100, blank=True)
+    name_ru = models.CharField(max_length=100, blank=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class CropSynonym(models.Model):
+    """Other spelling of a crop name in any language, stored normalized"""
+    crop = models.ForeignKey(Crop, on_delete=models.CASCADE, related_name='synonyms')
+    term = models.CharField(max_length=100, unique=True)
+    
+    def __str__(self):
+        return f"{self.term} -> {self.crop.name}"
+    
+    def save(self, *args, **kwargs):
+        self.term = normalize_term(self.term)
+        super().save(*args, **kwargs)
+
+
+class Disease(models.Model):
+    """Canonical animal disease in the controlled vocabulary (core.vocabulary)"""
+    name = models.CharField(max_length=200, unique=True)  # English, e.g. Brucellosis
+    name_ky = models.CharField(max_length=200, blank=True)
+    name_ru = models.CharField(max_length=200, blank=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class DiseaseSynonym(models.Model):
+    """Other spelling of a disease name in any language, stored normalized"""
+    disease = models.ForeignKey(Disease, on_delete=models.CASCADE, related_name='synonyms')
+    term = models.CharField(max_length=200, unique=True)
+    
+    def __str__(self):
+        return f"{self.term} -> {self.disease.name}"
+    
+    def save(self, *args, **kwargs):
+        self.term = normalize_term(self.term)
+        super().save(*args, **kwargs)
+
+
 class Farm(models.Model):
     """Farm registration with location and owner details"""
     district = models.ForeignKey(District, on_delete=models.CASCADE, related_name='farms')
     farmer_name = models.CharField(max_length=200)
     phone = models.CharField(max_length=20)
+    # Digits-only phone, the registry import's match key together with the name
+    phone_normalized = models.CharField(max_length=20, blank=True, editable=False, db_index=True)
     village = models.CharField(max_length=100)
     location_lat = models.FloatField(null=True, blank=True)
     location_lng = models.FloatField(null=True, blank=True)
+    # Outbreak risk, refreshed in batches by core.risk (manage.py refresh_risk_scores)
+    risk_score = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    risk_scored_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Latest vaccination event at this farm, maintained by signals for coverage stats
+    last_vaccinated_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['district', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.farmer_name} - {self.village}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_district_id = instance.__dict__.get('district_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.phone_normalized = normalize_phone(self.phone)
+        moved = (
+            getattr(self, '_loaded_district_id', None) is not None
+            and self._loaded_district_id != self.district_id
+        )
+        # Read by the post_save coverage signal to refresh the old district too
+        self._moved_from_district_id = self._loaded_district_id if moved else None
+        super().save(*args, **kwargs)
+        if moved:
+            # Keep the district denormalized onto this farm's records (hot and archived) in sync
+            for model in (Event, CropIssue, ArchivedEvent, ArchivedCropIssue):
+                model.objects.filter(farm_id=self.id).update(district_id=self.district_id)
+        self._loaded_district_id = self.district_id
 
 
 class Herd(models.Model):
@@ -68,18 +154,41 @@ class Event(models.Model):
     ]
     
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='events')
+    # Copied from farm.district on save so district filters skip the farm join
+    district = models.ForeignKey(District, on_delete=models.CASCADE, related_name='events', null=True, editable=False)
     event_type = models.CharField(max_length=50, choices=EVENT_TYPES)
     disease_suspected = models.CharField(max_length=200, null=True, blank=True)
+    # disease_suspected resolved through the vocabulary on save (see signals)
+    disease = models.ForeignKey(Disease, on_delete=models.SET_NULL, related_name='events', null=True, blank=True, editable=False)
     description = models.TextField()
     animals_affected = models.IntegerField(null=True, blank=True)
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='new')
+    # Earlier report this one repeats, found on create by core.duplicates. The original
+    # may since have been archived, so the id is kept without a constraint
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.DO_NOTHING, db_constraint=False, related_name='duplicates', null=True, blank=True
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        # List filters are IN/range predicates, newest first
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['district', 'created_at']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['event_type', 'created_at']),
+            models.Index(fields=['disease', 'created_at']),
+            models.Index(fields=['farm', 'created_at', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.get_event_type_display()} at {self.farm.farmer_name}'s farm - {self.status}"
+    
+    def save(self, *args, **kwargs):
+        if self.farm_id is not None:
+            self.district_id = self.farm.district_id
+        super().save(*args, **kwargs)
 
 
 class CropIssue(models.Model):
@@ -106,7 +215,11 @@ class CropIssue(models.Model):
     ]
     
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='crop_issues')
+    # Copied from farm.district on save so district filters skip the farm join
+    district = models.ForeignKey(District, on_delete=models.CASCADE, related_name='crop_issues', null=True, editable=False)
     crop_type = models.CharField(max_length=100)  # e.g. wheat, barley, potatoes
+    # crop_type resolved through the vocabulary on save (see signals)
+    crop = models.ForeignKey(Crop, on_delete=models.SET_NULL, related_name='crop_issues', null=True, blank=True, editable=False)
     problem_type = models.CharField(max_length=50, choices=PROBLEM_TYPE_CHOICES)
     title = models.CharField(max_length=200)  # short farmer-facing title
     description = models.TextField()  # longer text describing problem
@@ -114,11 +227,260 @@ class CropIssue(models.Model):
     area_affected_ha = models.FloatField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='new')
     reported_via = models.CharField(max_length=20, default='mobile')
+    # Earlier report this one repeats, found on create by core.duplicates. The original
+    # may since have been archived, so the id is kept without a constraint
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.DO_NOTHING, db_constraint=False, related_name='duplicates', null=True, blank=True
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        # List filters are IN/range predicates, newest first
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['district', 'created_at']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['problem_type', 'created_at']),
+            models.Index(fields=['severity', 'created_at']),
+            models.Index(fields=['crop', 'created_at']),
+            models.Index(fields=['farm', 'created_at', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.title} at {self.farm.farmer_name}'s farm - {self.status}"
+    
+    def save(self, *args, **kwargs):
+        if self.farm_id is not None:
+            self.district_id = self.farm.district_id
+        super().save(*args, **kwargs)
+
+
+class ArchivedEvent(models.Model):
+    """Resolved Event moved out of the hot table; keeps the original id"""
+    id = models.BigIntegerField(primary_key=True)
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='archived_events')
+    district = models.ForeignKey(District, on_delete=models.CASCADE, related_name='archived_events', null=True)
+    event_type = models.CharField(max_length=50, choices=Event.EVENT_TYPES)
+    disease_suspected = models.CharField(max_length=200, null=True, blank=True)
+    disease = models.ForeignKey(Disease, on_delete=models.SET_NULL, related_name='archived_events', null=True, blank=True)
+    description = models.TextField()
+    animals_affected = models.IntegerField(null=True, blank=True)
+    status = models.CharField(max_length=50, choices=Event.STATUS_CHOICES)
+    duplicate_of_id = models.BigIntegerField(null=True, blank=True)  # hot or archived event
+    created_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['farm', 'created_at', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_event_type_display()} at {self.farm.farmer_name}'s farm - archived"
+
+
+class ArchivedCropIssue(models.Model):
+    """Resolved CropIssue moved out of the hot table; keeps the original id"""
+    id = models.BigIntegerField(primary_key=True)
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='archived_crop_issues')
+    district = models.ForeignKey(District, on_delete=models.CASCADE, related_name='archived_crop_issues', null=True)
+    crop_type = models.CharField(max_length=100)
+    crop = models.ForeignKey(Crop, on_delete=models.SET_NULL, related_name='archived_crop_issues', null=True, blank=True)
+    problem_type = models.CharField(max_length=50, choices=CropIssue.PROBLEM_TYPE_CHOICES)
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    severity = models.CharField(max_length=20, choices=CropIssue.SEVERITY_CHOICES)
+    area_affected_ha = models.FloatField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=CropIssue.STATUS_CHOICES)
+    reported_via = models.CharField(max_length=20)
+    duplicate_of_id = models.BigIntegerField(null=True, blank=True)  # hot or archived crop issue
+    created_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['farm', 'created_at', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.title} at {self.farm.farmer_name}'s farm - archived"
+
+
+class ArchiveCheckpoint(models.Model):
+    """Progress of an archival run, so an interrupted run can resume"""
+    model_label = models.CharField(max_length=50, unique=True)
+    cutoff = models.DateTimeField()
+    last_id = models.BigIntegerField(default=0)
+    rows_archived = models.IntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.model_label} archived up to id {self.last_id}"
+
+
+class ImportRun(models.Model):
+    """
+    Progress of a farm registry import (core.imports), committed with each
+    chunk so an interrupted import can resume after the last committed row
+    """
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    source_name = models.CharField(max_length=255)
+    source_sha256 = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    rows_processed = models.IntegerField(default=0)
+    rows_failed = models.IntegerField(default=0)
+    farms_created = models.IntegerField(default=0)
+    farms_updated = models.IntegerField(default=0)
+    herds_written = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Import of {self.source_name} ({self.status}, {self.rows_processed} rows)"
+
+
+class VaccinationCoverage(models.Model):
+    """
+    Precomputed share of herds vaccinated within the coverage window, per
+    district and animal type. Rows are marked stale by signals and refreshed
+    per district by core.coverage (manage.py refresh_vaccination_coverage).
+    """
+    district = models.ForeignKey(District, on_delete=models.CASCADE, related_name='vaccination_coverage')
+    animal_type = models.CharField(max_length=50, choices=Herd.ANIMAL_TYPES)
+    herds_total = models.IntegerField(default=0)
+    herds_vaccinated = models.IntegerField(default=0)
+    headcount_total = models.IntegerField(default=0)
+    headcount_vaccinated = models.IntegerField(default=0)
+    stale = models.BooleanField(default=True, db_index=True)
+    computed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['district__name', 'animal_type']
+        constraints = [
+            models.UniqueConstraint(fields=['district', 'animal_type'], name='unique_coverage_district_animal_type'),
+        ]
+    
+    def __str__(self):
+        return f"{self.animal_type} coverage in {self.district.name}"
+
+
+class Job(models.Model):
+    """
+    Background job in the database-backed queue (core.jobs), run by
+    manage.py run_worker. Higher priority runs first; failed attempts are
+    retried with backoff until max_attempts.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    kind = models.CharField(max_length=100)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    priority = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField()
+    progress = models.FloatField(null=True, blank=True)  # 0..1 when known
+    progress_message = models.CharField(max_length=255, blank=True)
+    input_file = models.FileField(upload_to='job_inputs/', blank=True)
+    result = models.JSONField(null=True, blank=True)
+    result_file = models.FileField(upload_to='job_results/', blank=True)
+    error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Workers claim the next due job by (priority desc, run_after, id)
+            models.Index(fields=['status', '-priority', 'run_after', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} job #{self.pk} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Outcome of a POST sent with an Idempotency-Key header (core.idempotency).
+    A retry with the same key and body gets the stored response back; rows
+    expire after IDEMPOTENCY_KEY_TTL_SECONDS and are removed by
+    manage.py sweep_idempotency_keys.
+    """
+    key = models.CharField(max_length=255)
+    client = models.CharField(max_length=100)  # 'user:<id>' or 'anonymous'
+    request_hash = models.CharField(max_length=64)
+    status_code = models.IntegerField(null=True, blank=True)  # null while the first request runs
+    content_type = models.CharField(max_length=100, blank=True)
+    response_body = models.BinaryField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'key'], name='unique_idempotency_client_key'),
+        ]
+    
+    def __str__(self):
+        return f"Idempotency key {self.key} ({self.client})"
+
+
+class ReportSignature(models.Model):
+    """
+    MinHash signature of an event's or crop issue's text (core.duplicates),
+    kept for DUPLICATE_WINDOW_DAYS so new reports can be compared with it
+    """
+    kind = models.CharField(max_length=20)  # 'event' or 'crop_issue'
+    record_id = models.BigIntegerField()
+    signature = models.BinaryField()
+    created_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'record_id'], name='unique_report_signature'),
+        ]
+    
+    def __str__(self):
+        return f"Signature of {self.kind} #{self.record_id}"
+
+
+class ReportBucket(models.Model):
+    """
+    LSH band bucket of a report signature; reports of the same farm and type
+    sharing any bucket are near-duplicate candidates
+    """
+    kind = models.CharField(max_length=20)
+    bucket = models.BigIntegerField()
+    record_id = models.BigIntegerField()
+    created_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'bucket']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.record_id} in bucket {self.bucket}"
@@ -0,0 +1,84 @@
+"""
+Normalization of free-text identifiers used for matching records
+"""
+import re
+
+
+_NON_DIGITS = re.compile(r'\D')
+
+KYRGYZSTAN_CALLING_CODE = '996'
+
+
+def normalize_phone(phone):
+    """
+    Digits-only phone number in international form
+
+    '+996 555 123 456', '996555123456' and the national '0555 123 456' all
+    normalize to '996555123456'.
+    """
+    digits = _NON_DIGITS.sub('', phone or '')
+    if digits.startswith('00'):
+        digits = digits[2:]
+    elif len(digits) == 10 and digits.startswith('0'):
+        digits = KYRGYZSTAN_CALLING_CODE + digits[1:]
+    return digits
+
+
+def normalize_name(name):
+    """Case- and whitespace-insensitive form of a person's name"""
+    return ' '.join((name or '').split()).casefold()
+
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+# Russian and Kyrgyz Cyrillic -> Latin, as farmers type these names on Latin keyboards
+_CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh', 'з': 'z',
+    'и': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'ң': 'ng', 'о': 'o', 'ө': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ү': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+}
+_TRANSLITERATION = str.maketrans(_CYRILLIC_TO_LATIN)
+
+
+def normalize_term(text):
+    """
+    Case-, punctuation- and whitespace-insensitive form of a vocabulary term
+
+    'Foot-and-mouth disease ' and 'foot and mouth  DISEASE' both normalize
+    to 'foot and mouth disease'; 'ё' is folded into 'е'.
+    """
+    folded = (text or '').casefold().replace('ё', 'е')
+    return ' '.join(_NON_WORD.sub(' ', folded).split())
+
+
+def transliterate(text):
+    """Latin spelling of Cyrillic text ('бруцеллез' -> 'brutsellez'); Latin text is unchanged"""
+    return text.translate(_TRANSLITERATION)
+
+
+# Soundex-style consonant classes; vowels and h, w, y carry no code
+_SOUND_CLASSES = str.maketrans({
+    **dict.fromkeys('bfpv', '1'), **dict.fromkeys('cgjkqsxz', '2'), **dict.fromkeys('dt', '3'),
+    'l': '4', **dict.fromkeys('mn', '5'), 'r': '6', **dict.fromkeys('aeiouhwy', ''),
+})
+_NON_LATIN = re.compile(r'[^a-z]')
+
+
+def phonetic_key(name):
+    """
+    Spelling-insensitive key of a person's name, in any script and word order
+
+    Each word keeps its first letter followed by the sound classes of its
+    remaining consonants, so 'Aibek Usenov', 'Aybek Usenov' and
+    'Усенов Айбек' share the key 'a12 u251'.
+    """
+    words = []
+    for word in transliterate(normalize_name(name)).split():
+        letters = _NON_LATIN.sub('', word)
+        if not letters:
+            continue
+        codes = letters[1:].translate(_SOUND_CLASSES)
+        collapsed = ''.join(code for index, code in enumerate(codes) if index == 0 or code != codes[index - 1])
+        words.append(letters[0] + collapsed)
+    return ' '.join(sorted(words))
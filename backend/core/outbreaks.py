@@ -0,0 +1,93 @@
+"""
+Population-at-risk around a reported outbreak
+"""
+from collections import defaultdict
+
+from .geo import farm_index
+from .models import Farm, Herd
+from .vocabulary import canonical_disease_name
+
+
+ALL_SPECIES = [animal_type for animal_type, _ in Herd.ANIMAL_TYPES]
+
+# Species susceptible to each disease, keyed by lower-cased canonical disease
+# name (core.vocabulary). Diseases not listed here put every species at risk.
+SUSCEPTIBLE_SPECIES = {
+    'foot-and-mouth disease': ['cattle', 'sheep', 'goat'],
+    'brucellosis': ['cattle', 'sheep', 'goat'],
+    'anthrax': ['cattle', 'sheep', 'goat', 'horse'],
+    'tuberculosis': ['cattle', 'goat'],
+    'mastitis': ['cattle', 'sheep', 'goat'],
+    'blackleg': ['cattle', 'sheep'],
+    'sheep pox': ['sheep', 'goat'],
+    'rabies': ['cattle', 'sheep', 'goat', 'horse'],
+    'avian influenza': ['poultry'],
+    'newcastle disease': ['poultry'],
+}
+
+
+# Keep IN (...) lists under SQLite's bound-parameter limit
+IN_CLAUSE_CHUNK = 900
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def susceptible_species(disease):
+    if not disease:
+        return ALL_SPECIES
+    return SUSCEPTIBLE_SPECIES.get(canonical_disease_name(disease).strip().lower(), ALL_SPECIES)
+
+
+def population_at_risk(event, radius_km):
+    """
+    Sum susceptible headcounts on farms within radius_km of the event's farm
+
+    Returns None if the event's farm has no coordinates.
+    """
+    farm = event.farm
+    if farm.location_lat is None or farm.location_lng is None:
+        return None
+
+    species = susceptible_species(event.disease_suspected)
+    farm_ids, distances = farm_index.within(farm.location_lat, farm.location_lng, radius_km)
+    distance_by_farm = dict(zip(farm_ids.tolist(), distances.tolist()))
+
+    totals = dict.fromkeys(species, 0)
+    by_farm = defaultdict(dict)
+    for chunk in _chunks(list(distance_by_farm), IN_CLAUSE_CHUNK):
+        herds = Herd.objects.filter(
+            farm_id__in=chunk, animal_type__in=species
+        ).values_list('farm_id', 'animal_type', 'headcount')
+        for farm_id, animal_type, headcount in herds:
+            totals[animal_type] += headcount
+            by_farm[farm_id][animal_type] = by_farm[farm_id].get(animal_type, 0) + headcount
+
+    names = {}
+    for chunk in _chunks(list(by_farm), IN_CLAUSE_CHUNK):
+        for row in Farm.objects.filter(id__in=chunk).values('id', 'farmer_name', 'village'):
+            names[row['id']] = row
+    farms = [
+        {
+            'farm_id': farm_id,
+            'farmer_name': names[farm_id]['farmer_name'],
+            'village': names[farm_id]['village'],
+            'distance_km': round(distance_by_farm[farm_id], 3),
+            'animals_at_risk': by_farm[farm_id],
+        }
+        for farm_id in distance_by_farm
+        if farm_id in names
+    ]
+
+    return {
+        'event_id': event.id,
+        'disease_suspected': event.disease_suspected,
+        'radius_km': radius_km,
+        'susceptible_species': species,
+        'total_animals_at_risk': sum(totals.values()),
+        'totals_by_species': totals,
+        'farm_count': len(farms),
+        'farms': farms,
+    }
@@ -0,0 +1,133 @@
+"""
+On-demand request profiling (see core.middleware.ProfilingMiddleware)
+
+A sampling profiler reads the profiled thread's Python stack every
+PROFILE_SAMPLE_INTERVAL_MS from a helper thread and counts identical stacks
+in the collapsed ("folded") format that flamegraph.pl, speedscope and
+inferno read directly:
+
+    core/views.py:list;core/filters.py:record_filters 12
+
+An execute wrapper on every database connection records each SQL statement
+with its duration and the innermost project frame that issued it.
+"""
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+
+_THIS_FILE = str(Path(__file__).resolve())
+
+
+def _project_file(filename):
+    return filename.startswith(str(settings.BASE_DIR)) and filename != _THIS_FILE
+
+
+def _relative(filename):
+    try:
+        return str(Path(filename).relative_to(settings.BASE_DIR))
+    except ValueError:
+        return filename
+
+
+class StackSampler:
+    """Sample one thread's stack at a fixed interval into folded stack counts"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{_relative(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def folded(self):
+        return [f'{stack} {count}' for stack, count in self.stacks.most_common()]
+
+
+class QueryRecorder:
+    """Database execute wrapper recording SQL, timing and the project call site"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'duration_ms': round(duration_ms, 3),
+                'call_site': self._call_site(),
+            })
+
+    @staticmethod
+    def _call_site():
+        for frame in reversed(traceback.extract_stack()):
+            if _project_file(frame.filename):
+                return f'{_relative(frame.filename)}:{frame.lineno} in {frame.name}'
+        return None
+
+
+class Profile:
+    def __init__(self):
+        self.sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        self.recorder = QueryRecorder()
+        self.duration_ms = None
+
+    def report(self):
+        queries = self.recorder.queries
+        return {
+            'duration_ms': round(self.duration_ms, 3),
+            'sample_interval_ms': settings.PROFILE_SAMPLE_INTERVAL_MS,
+            'samples': sum(self.sampler.stacks.values()),
+            'folded': self.sampler.folded(),
+            'queries': {
+                'count': len(queries),
+                'total_ms': round(sum(query['duration_ms'] for query in queries), 3),
+                'items': queries,
+            },
+        }
+
+
+@contextmanager
+def profile():
+    """Profile the calling thread (stack samples and SQL) for the duration of the block"""
+    result = Profile()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(result.recorder))
+        result.sampler.start()
+        started = time.perf_counter()
+        try:
+            yield result
+        finally:
+            result.duration_ms = (time.perf_counter() - started) * 1000
+            result.sampler.stop()
@@ -0,0 +1,120 @@
+"""
+In-process publish/subscribe used to push live Event and CropIssue updates
+
+Publishers (model signals) run on sync worker threads while subscribers
+(streaming responses) wait on the ASGI event loop, so messages are handed
+over with ``loop.call_soon_threadsafe``. Subscriptions are indexed by
+district code so one publish only touches the clients that asked for it.
+
+The broker class is loaded from ``settings.PUBSUB_BACKEND`` so it can be
+swapped for one backed by a local message broker without touching callers.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """A single connected client waiting for messages"""
+
+    def __init__(self, broker, district_code=None, max_queue=100):
+        self.broker = broker
+        self.district_code = district_code
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def deliver(self, message):
+        """Queue a message for this client; called on the subscriber's loop"""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A slow client must never hold up the publisher
+            self.dropped += 1
+
+    async def get(self, timeout=None):
+        """Wait for the next message, returning None on timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class BaseBroker:
+    """Interface every pub/sub backend implements"""
+
+    def subscribe(self, district_code=None):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def publish(self, message):
+        raise NotImplementedError
+
+
+class InProcessBroker(BaseBroker):
+    """
+    Fan out messages to subscriptions living in this process
+
+    Messages are dicts; a message with a ``district`` key is delivered to
+    subscribers of that district and to unfiltered subscribers.
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._by_district = {}
+
+    def subscribe(self, district_code=None):
+        subscription = Subscription(self, district_code, self.max_queue)
+        with self._lock:
+            self._by_district.setdefault(district_code, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._by_district.get(subscription.district_code)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_district[subscription.district_code]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._by_district.values())
+
+    def publish(self, message):
+        district_code = message.get('district')
+        with self._lock:
+            targets = list(self._by_district.get(None, ()))
+            if district_code is not None:
+                targets.extend(self._by_district.get(district_code, ()))
+
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down; drop it
+                self.unsubscribe(subscription)
+        return len(targets)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker configured by PUBSUB_BACKEND"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                backend = getattr(settings, 'PUBSUB_BACKEND', 'core.pubsub.InProcessBroker')
+                _broker = import_string(backend)()
+    return _broker
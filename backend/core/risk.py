@@ -0,0 +1,141 @@
+"""
+Farm-level outbreak risk scoring in vectorized batches
+
+Everything the score needs is loaded into compact NumPy arrays with a few
+queries:
+
+- farm coordinates (radians, NaN when missing) and a farms x species
+  headcount matrix from Herd
+- open disease_report/mortality events: coordinates and a species
+  susceptibility mask from the suspected disease
+- recent unresolved CropIssue severity summed per farm
+
+For each batch of farms the outbreak exposure is a farms x events matrix of
+distance-decayed weights times the susceptible headcount each event
+threatens, so no per-farm Python loop is needed. Only scores that changed
+are written back.
+
+    score = log1p(sum_e exp(-d / scale) * susceptible_headcount_e)
+            + CROP_WEIGHT * recent crop issue severity
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .dashboard import OPEN_STATUSES, OUTBREAK_EVENT_TYPES
+from .geo import EARTH_RADIUS_KM
+from .models import CropIssue, Event, Farm, Herd
+from .outbreaks import ALL_SPECIES, susceptible_species
+
+
+SEVERITY_WEIGHTS = {'low': 1.0, 'medium': 2.0, 'high': 3.0}
+CROP_WEIGHT = 0.5
+
+
+def _farm_rows(ids, farm_ids):
+    """Positions of farm_ids in the sorted ids array"""
+    return np.searchsorted(ids, np.asarray(farm_ids, dtype=np.int64))
+
+
+def load_inputs():
+    """Load farm, herd, outbreak and crop issue arrays for scoring"""
+    farms = Farm.objects.order_by('id').values_list('id', 'location_lat', 'location_lng', 'risk_score')
+    # None (missing coordinates or score) becomes NaN in a float array
+    table = np.array(list(farms), dtype=np.float64).reshape(-1, 4)
+    ids = table[:, 0].astype(np.int64)
+    lats, lngs = np.radians(table[:, 1]), np.radians(table[:, 2])
+    current_scores = table[:, 3]
+
+    species_index = {animal_type: column for column, animal_type in enumerate(ALL_SPECIES)}
+    headcounts = np.zeros((len(ids), len(ALL_SPECIES)), dtype=np.float64)
+    herd_rows = list(
+        Herd.objects.order_by().values_list('farm_id', 'animal_type').annotate(total=Sum('headcount'))
+    )
+    if herd_rows:
+        farm_ids, animal_types, totals = zip(*herd_rows)
+        columns = [species_index[animal_type] for animal_type in animal_types]
+        np.add.at(headcounts, (_farm_rows(ids, farm_ids), columns), totals)
+
+    outbreaks = list(
+        Event.objects.filter(
+            event_type__in=OUTBREAK_EVENT_TYPES,
+            status__in=OPEN_STATUSES,
+            farm__location_lat__isnull=False,
+            farm__location_lng__isnull=False,
+        ).values_list('farm__location_lat', 'farm__location_lng', 'disease_suspected')
+    )
+    outbreak_lats = np.radians(np.array([row[0] for row in outbreaks], dtype=np.float64))
+    outbreak_lngs = np.radians(np.array([row[1] for row in outbreaks], dtype=np.float64))
+    susceptibility = np.zeros((len(outbreaks), len(ALL_SPECIES)), dtype=np.float64)
+    for row, (_, _, disease) in enumerate(outbreaks):
+        susceptibility[row, [species_index[s] for s in susceptible_species(disease)]] = 1.0
+
+    since = timezone.now() - timedelta(days=settings.RISK_CROP_ISSUE_WINDOW_DAYS)
+    crop_severity = np.zeros(len(ids), dtype=np.float64)
+    crop_rows = list(
+        CropIssue.objects.filter(created_at__gte=since).exclude(status='resolved')
+        .values_list('farm_id', 'severity')
+    )
+    if crop_rows:
+        farm_ids, severities = zip(*crop_rows)
+        np.add.at(crop_severity, _farm_rows(ids, farm_ids), [SEVERITY_WEIGHTS[s] for s in severities])
+
+    return {
+        'ids': ids,
+        'lats': lats,
+        'lngs': lngs,
+        'current_scores': current_scores,
+        'headcounts': headcounts,
+        'outbreak_lats': outbreak_lats,
+        'outbreak_lngs': outbreak_lngs,
+        'susceptibility': susceptibility,
+        'crop_severity': crop_severity,
+    }
+
+
+def compute_scores(inputs, batch_size=None):
+    """Compute every farm's score from load_inputs() arrays, batch_size farms at a time"""
+    batch_size = batch_size or settings.RISK_BATCH_SIZE
+    scale_km = settings.RISK_DISTANCE_SCALE_KM
+    radius_km = settings.RISK_MAX_DISTANCE_KM
+    lats, lngs = inputs['lats'], inputs['lngs']
+    outbreak_lats, outbreak_lngs = inputs['outbreak_lats'], inputs['outbreak_lngs']
+
+    exposure = np.zeros(len(lats), dtype=np.float64)
+    if len(outbreak_lats):
+        for start in range(0, len(lats), batch_size):
+            stop = start + batch_size
+            # farms x outbreaks distance matrix for this batch
+            dlat = outbreak_lats[None, :] - lats[start:stop, None]
+            dlng = outbreak_lngs[None, :] - lngs[start:stop, None]
+            a = (
+                np.sin(dlat / 2) ** 2
+                + np.cos(lats[start:stop, None]) * np.cos(outbreak_lats[None, :]) * np.sin(dlng / 2) ** 2
+            )
+            distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+            # NaN distances (farms without coordinates) fail the comparison and weigh 0
+            weights = np.where(distances <= radius_km, np.exp(-distances / scale_km), 0.0)
+            # susceptible headcount of each farm for each outbreak's species
+            at_risk = inputs['headcounts'][start:stop] @ inputs['susceptibility'].T
+            exposure[start:stop] = (weights * at_risk).sum(axis=1)
+
+    return np.log1p(exposure) + CROP_WEIGHT * inputs['crop_severity']
+
+
+def refresh_risk_scores(batch_size=None, tolerance=1e-6):
+    """Recompute all farm scores and write back only those that changed; returns rows written"""
+    inputs = load_inputs()
+    scores = np.round(compute_scores(inputs, batch_size), 6)
+    current = inputs['current_scores']
+    changed = np.isnan(current) | (np.abs(scores - np.nan_to_num(current)) > tolerance)
+
+    now = timezone.now()
+    farms = [
+        Farm(id=farm_id, risk_score=score, risk_scored_at=now)
+        for farm_id, score in zip(inputs['ids'][changed].tolist(), scores[changed].tolist())
+    ]
+    Farm.objects.bulk_update(farms, ['risk_score', 'risk_scored_at'], batch_size=settings.RISK_WRITE_BATCH_SIZE)
+    return len(farms)
@@ -0,0 +1,53 @@
+"""
+Primary/replica database routing
+
+Writes always go to ``default``, and so do reads unless the current context
+is unpinned. Only ReplicaPinningMiddleware unpins: safe-method requests read
+from a random alias in ``settings.DATABASE_REPLICAS``, except for a short
+window after the client has written (read-your-writes). The worker, the
+management commands and other code outside a request keep reading the
+primary, since they write based on what they read.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+PRIMARY = 'default'
+
+_pinned_to_primary = ContextVar('pinned_to_primary', default=True)
+
+
+def is_pinned_to_primary():
+    return _pinned_to_primary.get()
+
+
+@contextmanager
+def pinned_to_primary(pinned=True):
+    """Route every read in this context to the primary"""
+    token = _pinned_to_primary.set(pinned)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas or is_pinned_to_primary():
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication (or a file copy)
+        return db == PRIMARY
@@ -1,5 +1,6 @@
+from django.urls import reverse
 from rest_framework import serializers
-from .models import District, Farm, Herd, Event, CropIssue, CropIssue
+from .models import District, Farm, Herd, Event, CropIssue, CropIssue, Job
 
 
 class DistrictSerializer(serializers.ModelSerializer):
@@ -39,9 +40,11 @@ class FarmSerializer(serializers.ModelSerializer):
             'district_code',
             'herds',
             'total_animals',
+            'risk_score',
             'created_at',
             'updated_at'
         ]
+        read_only_fields = ['risk_score']
     
     def get_total_animals(self, obj):
         """Calculate total number of animals across all herds"""
@@ -52,6 +55,8 @@ class EventSerializer(serializers.ModelSerializer):
     """Serializer for Event model with embedded farm summary"""
     event_type_display = serializers.CharField(source='get_event_type_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
+    # Plain id so archived records (whose original may be hot or archived) serialize too
+    duplicate_of = serializers.IntegerField(source='duplicate_of_id', read_only=True)
     farm_summary = serializers.SerializerMethodField()
     
     class Meta:
@@ -67,6 +72,7 @@ class EventSerializer(serializers.ModelSerializer):
             'animals_affected',
             'status',
             'status_display',
+            'duplicate_of',
             'created_at'
         ]
         read_only_fields = ['created_at']
@@ -86,6 +92,8 @@ class CropIssueSerializer(serializers.ModelSerializer):
     problem_type_display = serializers.CharField(source='get_problem_type_display', read_only=True)
     severity_display = serializers.CharField(source='get_severity_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
+    # Plain id so archived records (whose original may be hot or archived) serialize too
+    duplicate_of = serializers.IntegerField(source='duplicate_of_id', read_only=True)
     farm_summary = serializers.SerializerMethodField()
     
     class Meta:
@@ -105,6 +113,7 @@ class CropIssueSerializer(serializers.ModelSerializer):
             'status',
             'status_display',
             'reported_via',
+            'duplicate_of',
             'created_at',
             'updated_at'
         ]
@@ -118,3 +127,50 @@ class CropIssueSerializer(serializers.ModelSerializer):
             'village': obj.farm.village,
             'district_name': obj.farm.district.name
         }
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background jobs; new jobs are queued through core.jobs.enqueue"""
+    result_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'kind',
+            'params',
+            'status',
+            'priority',
+            'attempts',
+            'max_attempts',
+            'progress',
+            'progress_message',
+            'result',
+            'result_url',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at'
+        ]
+        read_only_fields = [
+            'status', 'attempts', 'progress', 'progress_message', 'result', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
+    
+    def get_result_url(self, obj):
+        """Download link for the job's result file, if it has one"""
+        if not obj.result_file:
+            return None
+        request = self.context.get('request')
+        path = reverse('job-result', args=[obj.pk])
+        return request.build_absolute_uri(path) if request else path
+    
+    def validate_kind(self, value):
+        from .jobs import registered_kinds
+        if value not in registered_kinds():
+            raise serializers.ValidationError(f"Unknown job kind. Available: {', '.join(registered_kinds())}")
+        return value
+    
+    def create(self, validated_data):
+        from .jobs import enqueue
+        return enqueue(**validated_data)
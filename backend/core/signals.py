@@ -0,0 +1,193 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import bump_generation
+from .coverage import mark_stale
+from . import duplicates
+from .geo import farm_index
+from .lookups import clear_district_cache, district_code_for_id
+from .models import District, Farm, Herd, Event, ArchivedEvent, CropIssue, Crop, CropSynonym, Disease, DiseaseSynonym
+from .pubsub import get_broker
+from .throttling import db_latency
+from .vocabulary import invalidate_vocabulary, resolve_crop, resolve_disease
+
+
+@receiver(connection_created)
+def track_query_latency(sender, connection, **kwargs):
+    # Fires again on reconnect; the wrapper list outlives the connection
+    if db_latency not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_latency)
+    observers = getattr(connection, 'writer_wait_observers', None)
+    if observers is not None and db_latency.observe_writer_wait not in observers:
+        observers.append(db_latency.observe_writer_wait)
+
+
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+def invalidate_district_cache(sender, **kwargs):
+    clear_district_cache()
+
+
+@receiver(post_save, sender=Farm)
+@receiver(post_delete, sender=Farm)
+def invalidate_farm_coordinates(sender, **kwargs):
+    farm_index.invalidate()
+
+
+@receiver(post_save, sender=Crop)
+@receiver(post_delete, sender=Crop)
+@receiver(post_save, sender=CropSynonym)
+@receiver(post_delete, sender=CropSynonym)
+@receiver(post_save, sender=Disease)
+@receiver(post_delete, sender=Disease)
+@receiver(post_save, sender=DiseaseSynonym)
+@receiver(post_delete, sender=DiseaseSynonym)
+def invalidate_vocabulary_cache(sender, **kwargs):
+    invalidate_vocabulary('crop' if sender in (Crop, CropSynonym) else 'disease')
+
+
+@receiver(pre_save, sender=CropIssue)
+def resolve_crop_type(sender, instance, **kwargs):
+    instance.crop_id = resolve_crop(instance.crop_type)
+
+
+@receiver(pre_save, sender=Event)
+def resolve_disease_suspected(sender, instance, **kwargs):
+    instance.disease_id = resolve_disease(instance.disease_suspected)
+
+
+@receiver(pre_save, sender=Event)
+@receiver(pre_save, sender=CropIssue)
+def find_duplicate_report(sender, instance, **kwargs):
+    if instance._state.adding:
+        duplicates.prepare(_report_kind(sender), instance)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=CropIssue)
+def index_report_signature(sender, instance, created, **kwargs):
+    if created:
+        duplicates.index(_report_kind(sender), instance)
+
+
+def _report_kind(sender):
+    return 'event' if sender is Event else 'crop_issue'
+
+
+def _publish_after_commit(message):
+    transaction.on_commit(lambda: get_broker().publish(message))
+
+
+def publish_change(instance, created=False):
+    """Push an Event or CropIssue create/update notification to live subscribers after commit"""
+    message = {
+        'type': 'event' if isinstance(instance, Event) else 'crop_issue',
+        'action': 'created' if created else 'updated',
+        'id': instance.id,
+        'farm_id': instance.farm_id,
+        'district': district_code_for_id(instance.district_id),
+    }
+    if isinstance(instance, Event):
+        message['event_type'] = instance.event_type
+    else:
+        message.update(problem_type=instance.problem_type, severity=instance.severity)
+    message.update(status=instance.status, created_at=instance.created_at.isoformat())
+    _publish_after_commit(message)
+
+
+@receiver(post_save, sender=Event)
+def publish_event_change(sender, instance, created, **kwargs):
+    """Push Event create/update notifications to live subscribers"""
+    publish_change(instance, created)
+
+
+@receiver(post_save, sender=CropIssue)
+def publish_crop_issue_change(sender, instance, created, **kwargs):
+    """Push CropIssue create/update notifications to live subscribers"""
+    publish_change(instance, created)
+
+
+@receiver(post_save, sender=CropIssue)
+@receiver(post_delete, sender=CropIssue)
+def invalidate_crop_issue_stats(sender, **kwargs):
+    bump_generation('crop-issue-stats')
+
+
+@receiver(post_save, sender=Farm)
+def invalidate_moved_farm_crop_issue_stats(sender, instance, **kwargs):
+    # Farm.save moved the farm's crop issues to its new district with queryset.update()
+    if getattr(instance, '_moved_from_district_id', None) is not None:
+        bump_generation('crop-issue-stats')
+
+
+@receiver(post_save, sender=Herd)
+@receiver(post_delete, sender=Herd)
+def mark_herd_coverage_stale(sender, instance, **kwargs):
+    district_id = Farm.objects.filter(pk=instance.farm_id).values_list('district_id', flat=True).first()
+    mark_stale(district_id, instance.animal_type)
+
+
+@receiver(post_save, sender=Farm)
+def mark_moved_farm_coverage_stale(sender, instance, **kwargs):
+    old_district_id = getattr(instance, '_moved_from_district_id', None)
+    if old_district_id is None:
+        return
+    mark_stale(old_district_id)
+    for animal_type in instance.herds.order_by().values_list('animal_type', flat=True).distinct():
+        mark_stale(instance.district_id, animal_type)
+
+
+@receiver(post_save, sender=Event)
+def record_vaccination(sender, instance, **kwargs):
+    """Keep Farm.last_vaccinated_at current and flag the district's coverage"""
+    if instance.event_type != 'vaccination':
+        return
+    Farm.objects.filter(pk=instance.farm_id).exclude(
+        last_vaccinated_at__gte=instance.created_at
+    ).update(last_vaccinated_at=instance.created_at)
+    mark_stale(instance.district_id)
+
+
+@receiver(post_delete, sender=Event)
+def forget_vaccination(sender, instance, **kwargs):
+    if instance.event_type != 'vaccination':
+        return
+    latest = [
+        model.objects.filter(farm_id=instance.farm_id, event_type='vaccination')
+        .aggregate(latest=Max('created_at'))['latest']
+        for model in (Event, ArchivedEvent)
+    ]
+    latest = max((value for value in latest if value is not None), default=None)
+    Farm.objects.filter(pk=instance.farm_id).update(last_vaccinated_at=latest)
+    mark_stale(instance.district_id)
+
+
+@receiver(post_save, sender=Farm)
+@receiver(post_delete, sender=Farm)
+@receiver(post_save, sender=Herd)
+@receiver(post_delete, sender=Herd)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=CropIssue)
+@receiver(post_delete, sender=CropIssue)
+def invalidate_admin_counts(sender, created=True, **kwargs):
+    """Changelist row counts (core.admin.cached_count) change on creates and deletes only"""
+    if created:
+        bump_generation('admin-count')
+
+
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+@receiver(post_save, sender=Farm)
+@receiver(post_delete, sender=Farm)
+@receiver(post_save, sender=Herd)
+@receiver(post_delete, sender=Herd)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=CropIssue)
+@receiver(post_delete, sender=CropIssue)
+def invalidate_dashboard(sender, **kwargs):
+    bump_generation('dashboard')
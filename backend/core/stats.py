@@ -0,0 +1,135 @@
+"""
+Multi-dimensional aggregation (cube/rollup) of crop issues
+
+One GROUP BY query at the finest requested grain feeds an in-memory rollup
+that produces subtotals for every prefix of the grouping, like SQL
+``GROUP BY ROLLUP(...)``. Crops are grouped by their canonical vocabulary
+entry, so every spelling of one crop lands in one row; names the vocabulary
+doesn't know are grouped by their trimmed text.
+"""
+from django.db.models import Count, Sum
+from django.db.models.functions import Trim
+
+from .lookups import district_code_for_id, filter_by_district
+from .models import CropIssue
+from .vocabulary import canonical_name, resolve_crop
+
+
+# Public dimension name -> CropIssue column
+CROP_ISSUE_DIMENSIONS = {
+    'district': 'district_id',
+    'crop_type': 'crop_id',
+    'problem_type': 'problem_type',
+    'severity': 'severity',
+    'status': 'status',
+    'reported_via': 'reported_via',
+}
+
+CROP_ISSUE_METRICS = ['count', 'area_sum', 'area_avg']
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def parse_list(value, allowed, name):
+    items = [item.strip() for item in (value or '').split(',') if item.strip()]
+    unknown = [item for item in items if item not in allowed]
+    if unknown:
+        raise InvalidQuery(f"Unknown {name}: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    if len(set(items)) != len(items):
+        raise InvalidQuery(f"Duplicate {name}")
+    return items
+
+
+def _metrics(totals, metrics):
+    count, area_sum, area_count = totals
+    values = {}
+    if 'count' in metrics:
+        values['count'] = count
+    if 'area_sum' in metrics:
+        values['area_sum'] = round(area_sum, 3)
+    if 'area_avg' in metrics:
+        values['area_avg'] = round(area_sum / area_count, 3) if area_count else None
+    return values
+
+
+def _crop_value(row):
+    if row['crop_id'] is not None:
+        return canonical_name('crop', row['crop_id'])
+    return row['crop_text']
+
+
+def crop_issue_rollup(group_by, metrics, filters=None):
+    """
+    Aggregate crop issues by ``group_by`` with subtotals for each prefix
+
+    ``filters`` maps dimension names to required values. Returns one level
+    per grouping prefix, from the grand total to the full grouping.
+    """
+    columns = [CROP_ISSUE_DIMENSIONS[dimension] for dimension in group_by]
+    queryset = CropIssue.objects.all()
+    for dimension, value in (filters or {}).items():
+        if dimension == 'district':
+            queryset = filter_by_district(queryset, value)
+        elif dimension == 'crop_type':
+            crop_id = resolve_crop(value)
+            if crop_id is None:
+                queryset = queryset.alias(crop_text=Trim('crop_type')).filter(
+                    crop_id__isnull=True, crop_text__iexact=value.strip()
+                )
+            else:
+                queryset = queryset.filter(crop_id=crop_id)
+        else:
+            queryset = queryset.filter(**{CROP_ISSUE_DIMENSIONS[dimension]: value})
+
+    aggregates = {
+        'row_count': Count('id'),
+        'row_area_sum': Sum('area_affected_ha'),
+        'row_area_count': Count('area_affected_ha'),
+    }
+    if columns:
+        # Unknown crops are told apart by their text
+        labels = {'crop_text': Trim('crop_type')} if 'crop_type' in group_by else {}
+        rows = queryset.order_by().values(*columns, **labels).annotate(**aggregates)
+    else:
+        rows = [queryset.aggregate(**aggregates)]
+
+    # levels[k] maps a k-dimension key tuple to [count, area_sum, area_count]
+    levels = [{} for _ in range(len(group_by) + 1)]
+    for row in rows:
+        key = tuple(
+            _crop_value(row) if dimension == 'crop_type' else row[column]
+            for dimension, column in zip(group_by, columns)
+        )
+        for depth, level in enumerate(levels):
+            totals = level.setdefault(key[:depth], [0, 0.0, 0])
+            totals[0] += row['row_count']
+            totals[1] += row['row_area_sum'] or 0.0
+            totals[2] += row['row_area_count']
+
+    def label(dimension, value):
+        return district_code_for_id(value) if dimension == 'district' else value
+
+    return {
+        'group_by': group_by,
+        'metrics': metrics,
+        'levels': [
+            {
+                'group_by': group_by[:depth],
+                'rows': [
+                    {
+                        **{
+                            dimension: label(dimension, value)
+                            for dimension, value in zip(group_by, key)
+                        },
+                        **_metrics(totals, metrics),
+                    }
+                    for key, totals in sorted(
+                        level.items(), key=lambda item: tuple(str(v) for v in item[0])
+                    )
+                ],
+            }
+            for depth, level in enumerate(levels)
+        ],
+    }
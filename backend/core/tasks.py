@@ -0,0 +1,119 @@
+"""
+Job handlers for the background queue (see core.jobs)
+"""
+import csv
+import io
+import json
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .archive import archive_resolved
+from .coverage import refresh_vaccination_coverage
+from .duplicates import index_recent, prune
+from .idempotency import sweep_expired
+from .imports import import_farms
+from .jobs import attach_result_file, job, report_progress
+from .merging import resolve_farms
+from .models import Farm
+from .risk import refresh_risk_scores
+
+
+@job('import_farms')
+def run_import_farms(job, resume=True):
+    """Import the job's uploaded registry file; a retried job resumes its ImportRun"""
+    def progress(run, rows_per_second):
+        report_progress(job, None, f'{run.rows_processed} rows processed ({rows_per_second:.0f} rows/sec)')
+
+    with job.input_file.open('rb') as fileobj:
+        run = import_farms(fileobj, job.input_file.name, resume=resume, progress=progress)
+    return {
+        'import_run': run.pk,
+        'rows_processed': run.rows_processed,
+        'rows_failed': run.rows_failed,
+        'farms_created': run.farms_created,
+        'farms_updated': run.farms_updated,
+        'herds_written': run.herds_written,
+        'errors': run.errors,
+    }
+
+
+@job('export_farms')
+def run_export_farms(job, district=None):
+    """Write farms (optionally one district code) as a downloadable CSV"""
+    queryset = Farm.objects.order_by('id').values_list(
+        'id', 'district__code', 'farmer_name', 'phone', 'village', 'location_lat', 'location_lng', 'risk_score'
+    )
+    if district:
+        queryset = queryset.filter(district__code=district)
+    total = queryset.count()
+    with tempfile.TemporaryFile() as output:
+        text = io.TextIOWrapper(output, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(['id', 'district', 'farmer_name', 'phone', 'village', 'location_lat', 'location_lng', 'risk_score'])
+        for written, row in enumerate(queryset.iterator(chunk_size=2000), start=1):
+            writer.writerow(row)
+            if written % 10000 == 0:
+                report_progress(job, written / total, f'{written} of {total} farms')
+        text.flush()
+        text.detach()
+        output.seek(0)
+        attach_result_file(job, f'farms-{job.pk}.csv', output)
+    return {'farms': total}
+
+
+@job('refresh_risk_scores')
+def run_refresh_risk_scores(job):
+    return {'farms_updated': refresh_risk_scores()}
+
+
+@job('refresh_vaccination_coverage')
+def run_refresh_vaccination_coverage(job, full=False):
+    return {'districts_refreshed': refresh_vaccination_coverage(full=full)}
+
+
+@job('archive_resolved')
+def run_archive_resolved(job, older_than_days=None):
+    def progress(label, rows_archived):
+        report_progress(job, None, f'{rows_archived} {label} archived')
+
+    return archive_resolved(older_than_days=older_than_days, resume=True, progress=progress)
+
+
+@job('sweep_idempotency_keys')
+def run_sweep_idempotency_keys(job):
+    def progress(deleted):
+        report_progress(job, None, f'{deleted} expired keys deleted')
+
+    return {'deleted': sweep_expired(progress=progress)}
+
+
+@job('index_report_duplicates')
+def run_index_report_duplicates(job, days=None):
+    """Prune signatures older than the duplicate window and sign unsigned recent reports"""
+    def progress(signed, found):
+        report_progress(job, None, f'{signed} reports signed, {found} duplicates')
+
+    pruned = prune(timezone.now() - timedelta(days=settings.DUPLICATE_WINDOW_DAYS))
+    signed, found = index_recent(days=days, progress=progress)
+    return {'signed': signed, 'duplicates': found, 'pruned': pruned}
+
+
+@job('resolve_farm_duplicates')
+def run_resolve_farm_duplicates(job, apply=False):
+    """Match duplicate farm registrations (merging them with ``apply``) and attach the plan as JSON"""
+    def progress(done, total):
+        report_progress(job, done / total, f'{done} of {total} clusters merged')
+
+    plan = resolve_farms(apply=apply, progress=progress)
+    content = json.dumps(plan, ensure_ascii=False, indent=2).encode('utf-8')
+    attach_result_file(job, f'farm-merge-plan-{job.pk}.json', content)
+    return {
+        'applied': plan['applied'],
+        'clusters': len(plan['merges']),
+        'farms_merged': sum(len(merge['merged']) for merge in plan['merges']),
+        'review': len(plan['review']),
+        'records_moved': plan.get('records_moved', 0),
+    }
@@ -1,6 +1,38 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
+
 from rest_framework.test import APITestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import District, Farm, Herd, Event, CropIssue, CropIssue
+from django.utils import timezone
+from .admin import precompute_admin_counts
+from .archive import archive_resolved
+from .caching import bump_generation
+from .coverage import mark_stale, refresh_vaccination_coverage
+from .imports import import_farms
+from .warmup import PeriodicScheduler, on_startup, warm_up
+from .jobs import Worker, claim_next, enqueue, execute, run_pending
+from .merging import build_plan, resolve_farms
+from .risk import refresh_risk_scores
+from .throttling import db_latency
+from .vocabulary import clear_vocabulary_cache, relink_records
+from .backends.sqlite_wal.base import DatabaseWrapper as SQLiteWALDatabaseWrapper
+from .middleware import ReplicaPinningMiddleware
+from .models import District, Farm, Herd, Event, CropIssue, CropIssue, ArchivedEvent, ArchivedCropIssue, ArchiveCheckpoint, ImportRun, Job, IdempotencyKey, Crop, CropSynonym, ReportSignature
+from .pubsub import InProcessBroker
+from .routers import PrimaryReplicaRouter, pinned_to_primary
+from .views import dashboard_summary_async, live_updates
 
 
 class HealthAPITest(APITestCase):
@@ -588,3 +620,1772 @@ class CropIssueAPITest(APITestCase):
         self.crop_issue1.refresh_from_db()
         self.assertEqual(self.crop_issue1.status, 'in_progress')  # Still in_progress from before
         self.assertEqual(self.crop_issue1.title, original_title)  # Title unchanged
+
+
+class PubSubTest(SimpleTestCase):
+    def test_publish_respects_district_filter(self):
+        """Test that subscribers only receive messages for their district"""
+        async def scenario():
+            broker = InProcessBroker()
+            everything = broker.subscribe()
+            chuy = broker.subscribe('CHU')
+            osh = broker.subscribe('OSH')
+            
+            delivered = broker.publish({'type': 'event', 'id': 1, 'district': 'CHU'})
+            await asyncio.sleep(0)
+            
+            self.assertEqual(delivered, 2)
+            self.assertEqual((await everything.get(timeout=1))['id'], 1)
+            self.assertEqual((await chuy.get(timeout=1))['id'], 1)
+            self.assertIsNone(await osh.get(timeout=0.01))
+            
+            chuy.close()
+            self.assertEqual(broker.subscriber_count(), 2)
+        
+        asyncio.run(scenario())
+    
+    def test_stream_pushes_published_messages(self):
+        """Test that /api/stream/ emits Server-Sent Events for published changes"""
+        broker = InProcessBroker()
+        
+        async def scenario():
+            request = RequestFactory().get('/api/stream/', {'district': 'CHU'})
+            response = await live_updates(request)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            
+            stream = aiter(response.streaming_content)
+            self.assertTrue((await anext(stream)).startswith(b'retry:'))
+            
+            broker.publish({'type': 'crop_issue', 'id': 7, 'district': 'CHU'})
+            chunk = (await anext(stream)).decode()
+            self.assertTrue(chunk.startswith('event: crop_issue'))
+            self.assertEqual(json.loads(chunk.split('data: ', 1)[1])['id'], 7)
+            self.assertEqual(broker.subscriber_count(), 1)
+        
+        with mock.patch('core.views.get_broker', return_value=broker):
+            asyncio.run(scenario())
+        
+        # Closing the stream on disconnect drops the subscription
+        self.assertEqual(broker.subscriber_count(), 0)
+
+
+class LiveUpdateSignalTest(APITestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.district = District.objects.create(name='Chuy Region', code='CHU')
+        self.farm = Farm.objects.create(
+            district=self.district,
+            farmer_name='Bolot Mamatov',
+            phone='+996 555 123 456',
+            village='Tokmok'
+        )
+    
+    def test_create_and_update_are_published(self):
+        """Test that saving an event publishes created and updated messages after commit"""
+        broker = mock.Mock()
+        with mock.patch('core.signals.get_broker', return_value=broker):
+            with self.captureOnCommitCallbacks(execute=True):
+                event = Event.objects.create(
+                    farm=self.farm,
+                    event_type='disease_report',
+                    description='Suspected outbreak'
+                )
+            with self.captureOnCommitCallbacks(execute=True):
+                url = reverse('event-detail', args=[event.id])
+                self.client.patch(url, {'status': 'in_progress'}, format='json')
+        
+        messages = [call.args[0] for call in broker.publish.call_args_list]
+        self.assertEqual([m['action'] for m in messages], ['created', 'updated'])
+        self.assertEqual(messages[0]['district'], 'CHU')
+        self.assertEqual(messages[1]['status'], 'in_progress')
+
+
+class AsyncDashboardTest(TransactionTestCase):
+    def setUp(self):
+        """Set up committed test data visible to the aggregate worker threads"""
+        district1 = District.objects.create(name='Almaty Region', code='ALM')
+        district2 = District.objects.create(name='Nur-Sultan Region', code='NUR')
+        farm1 = Farm.objects.create(district=district1, farmer_name='Almas Nurzhanov', phone='+7 701 234 5678', village='Kaskelen')
+        farm2 = Farm.objects.create(district=district2, farmer_name='Yerlan Suleimenov', phone='+7 703 456 7890', village='Aksu')
+        Herd.objects.create(farm=farm1, animal_type='cattle', headcount=25)
+        Herd.objects.create(farm=farm2, animal_type='sheep', headcount=100)
+        Event.objects.create(
+            farm=farm1,
+            event_type='disease_report',
+            status='new',
+            description='Test outbreak',
+            disease_suspected='Foot-and-mouth disease'
+        )
+    
+    def test_async_summary_matches_sync_summary(self):
+        """Test that the async dashboard returns the same payload as the sync one"""
+        for params in ({}, {'district': 'ALM'}):
+            sync_data = self.client.get(reverse('dashboard-summary'), params).json()
+            request = RequestFactory().get('/api/dashboard/summary/async/', params)
+            response = asyncio.run(dashboard_summary_async(request))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content), sync_data)
+
+
+class SQLiteProductionProfileTest(SimpleTestCase):
+    def setUp(self):
+        """Point standalone connections at a temporary database file"""
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(lambda: [os.remove(p) for p in (self.path, self.path + '-wal', self.path + '-shm') if os.path.exists(p)])
+        
+        db = self.open_connection()
+        with db.cursor() as cursor:
+            cursor.execute('CREATE TABLE reports (id INTEGER PRIMARY KEY, worker INTEGER, n INTEGER)')
+        db.close()
+    
+    def open_connection(self):
+        settings_dict = {
+            **connection.settings_dict,
+            'ENGINE': 'core.backends.sqlite_wal',
+            'NAME': self.path,
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'pragmas': {'busy_timeout': 2000}},
+        }
+        return SQLiteWALDatabaseWrapper(settings_dict, alias='stress')
+    
+    def test_pragmas_applied_on_connect(self):
+        """Test that every new connection is switched to WAL with the tuned pragmas"""
+        db = self.open_connection()
+        with db.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 2000)
+        db.close()
+    
+    def test_concurrent_writers_and_readers_never_hit_lock_errors(self):
+        """Stress test: concurrent transactions, autocommit writes and reads"""
+        errors = []
+        iterations = 40
+        
+        def transactional_writer(worker):
+            db = self.open_connection()
+            try:
+                for n in range(iterations):
+                    db.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                    with db.cursor() as cursor:
+                        cursor.execute('SELECT COUNT(*) FROM reports')
+                        cursor.execute('INSERT INTO reports (worker, n) VALUES (%s, %s)', [worker, n])
+                        cursor.execute('UPDATE reports SET n = n + 0 WHERE worker = %s', [worker])
+                    db.commit()
+                    db.set_autocommit(True)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                db.close()
+        
+        def autocommit_writer(worker):
+            db = self.open_connection()
+            try:
+                for n in range(iterations):
+                    with db.cursor() as cursor:
+                        cursor.execute('INSERT INTO reports (worker, n) VALUES (%s, %s)', [worker, n])
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                db.close()
+        
+        def reader(worker):
+            db = self.open_connection()
+            try:
+                for _ in range(iterations):
+                    with db.cursor() as cursor:
+                        cursor.execute('SELECT COUNT(*), MAX(n) FROM reports')
+                        cursor.fetchone()
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                db.close()
+        
+        threads = []
+        for worker in range(6):
+            threads.append(threading.Thread(target=transactional_writer, args=(worker,)))
+            threads.append(threading.Thread(target=autocommit_writer, args=(100 + worker,)))
+            threads.append(threading.Thread(target=reader, args=(worker,)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        db = self.open_connection()
+        with db.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM reports')
+            self.assertEqual(cursor.fetchone()[0], 12 * iterations)
+        db.close()
+    
+    def test_writer_lock_waits_are_reported(self):
+        """Test that a transaction queued behind another writer reports its wait to the observers"""
+        waits = []
+        db = self.open_connection()
+        db.writer_wait_observers.append(waits.append)
+        db.writer_lock.acquire()
+        threading.Timer(0.1, db.writer_lock.release).start()
+        db.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        db.rollback()
+        db.set_autocommit(True)
+        db.close()
+        self.assertEqual(len(waits), 1)
+        self.assertGreaterEqual(waits[0], 90)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+    
+    def route_reads(self, request):
+        """Run a request through the pinning middleware and report the read alias"""
+        def view(request):
+            response = HttpResponse()
+            response.read_alias = self.router.db_for_read(Event)
+            return response
+        return ReplicaPinningMiddleware(view)(request)
+    
+    def test_reads_use_replicas_and_writes_use_primary(self):
+        """Test that unpinned reads go to a replica and writes to the primary"""
+        with pinned_to_primary(False):
+            self.assertIn(self.router.db_for_read(Event), ['replica1', 'replica2'])
+            self.assertEqual(self.router.db_for_write(Event), 'default')
+            with pinned_to_primary():
+                self.assertEqual(self.router.db_for_read(Event), 'default')
+    
+    def test_reads_outside_requests_use_primary(self):
+        """Test that the worker and commands, which run outside requests, read the primary"""
+        self.assertEqual(self.router.db_for_read(Job), 'default')
+        self.assertEqual(self.router.db_for_read(Farm), 'default')
+    
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        """Test that reads fall back to the primary without replicas"""
+        self.assertEqual(self.router.db_for_read(Event), 'default')
+    
+    def test_write_pins_client_to_primary(self):
+        """Test read-your-writes: a write pins that client's following reads"""
+        response = self.route_reads(self.factory.get('/api/events/'))
+        self.assertNotEqual(response.read_alias, 'default')
+        
+        response = self.route_reads(self.factory.patch('/api/events/1/'))
+        self.assertEqual(response.read_alias, 'default')
+        cookie = response.cookies[ReplicaPinningMiddleware.cookie_name]
+        self.assertEqual(cookie['max-age'], 5)
+        
+        request = self.factory.get('/api/events/')
+        request.COOKIES[ReplicaPinningMiddleware.cookie_name] = cookie.value
+        self.assertEqual(self.route_reads(request).read_alias, 'default')
+
+
+class DenormalizedDistrictTest(APITestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.district1 = District.objects.create(name='Chuy Region', code='CHU')
+        self.district2 = District.objects.create(name='Osh Region', code='OSH')
+        self.farm = Farm.objects.create(
+            district=self.district1,
+            farmer_name='Bolot Mamatov',
+            phone='+996 555 123 456',
+            village='Tokmok'
+        )
+        self.event = Event.objects.create(farm=self.farm, event_type='vet_visit', description='Routine visit')
+        self.crop_issue = CropIssue.objects.create(
+            farm=self.farm,
+            crop_type='wheat',
+            problem_type='pest',
+            title='Aphids',
+            description='Aphids on wheat',
+            severity='low'
+        )
+    
+    def test_district_copied_from_farm_on_save(self):
+        """Test that events and crop issues store their farm's district"""
+        self.assertEqual(self.event.district_id, self.district1.id)
+        self.assertEqual(self.crop_issue.district_id, self.district1.id)
+    
+    def test_farm_moving_district_updates_records(self):
+        """Test that moving a farm re-points its events and crop issues"""
+        farm = Farm.objects.get(pk=self.farm.pk)
+        farm.district = self.district2
+        farm.save()
+        
+        self.event.refresh_from_db()
+        self.crop_issue.refresh_from_db()
+        self.assertEqual(self.event.district_id, self.district2.id)
+        self.assertEqual(self.crop_issue.district_id, self.district2.id)
+        
+        response = self.client.get(reverse('event-list'), {'district': 'OSH'})
+        self.assertEqual(len(response.json()), 1)
+    
+    def test_farm_moving_district_updates_archived_records(self):
+        """Test that moving a farm re-points its archived events and crop issues too"""
+        a_year_ago = timezone.now() - timedelta(days=400)
+        Event.objects.update(status='resolved', created_at=a_year_ago)
+        CropIssue.objects.update(status='resolved', created_at=a_year_ago)
+        archive_resolved()
+        farm = Farm.objects.get(pk=self.farm.pk)
+        farm.district = self.district2
+        farm.save()
+        
+        self.assertEqual(ArchivedEvent.objects.get().district_id, self.district2.id)
+        self.assertEqual(ArchivedCropIssue.objects.get().district_id, self.district2.id)
+    
+    def test_district_filter_skips_farm_join(self):
+        """Test that the district filter is a single-table lookup on the record"""
+        url = reverse('cropissue-list')
+        self.client.get(url, {'district': 'CHU'})  # warm the district code cache
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'district': 'CHU'})
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"core_cropissue"."district_id" =', queries[0]['sql'])
+    
+    def test_unknown_district_returns_nothing(self):
+        """Test that an unknown district code matches no records"""
+        response = self.client.get(reverse('event-list'), {'district': 'XXX'})
+        self.assertEqual(response.json(), [])
+        
+        # Repeating it doesn't reload the District table on every request
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                self.client.get(reverse('event-list'), {'district': 'XXX'})
+        self.assertFalse([query for query in queries if 'FROM "core_district"' in query['sql']])
+
+
+class ArchivalTest(APITestCase):
+    def setUp(self):
+        """Set up resolved records from a past season alongside current work"""
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        self.farm = Farm.objects.create(
+            district=district,
+            farmer_name='Bolot Mamatov',
+            phone='+996 555 123 456',
+            village='Tokmok'
+        )
+        last_year = timezone.now() - timedelta(days=400)
+        
+        self.old_events = [
+            Event.objects.create(farm=self.farm, event_type='vaccination', status='resolved', description=f'Old campaign {i}')
+            for i in range(3)
+        ]
+        Event.objects.filter(id__in=[e.id for e in self.old_events]).update(created_at=last_year)
+        self.old_open = Event.objects.create(farm=self.farm, event_type='disease_report', description='Still open')
+        Event.objects.filter(id=self.old_open.id).update(created_at=last_year)
+        self.recent = Event.objects.create(farm=self.farm, event_type='vet_visit', status='resolved', description='Recent visit')
+        
+        self.old_issue = CropIssue.objects.create(
+            farm=self.farm,
+            crop_type='wheat',
+            problem_type='pest',
+            title='Locusts',
+            description='Locust swarm',
+            severity='high',
+            status='resolved'
+        )
+        CropIssue.objects.filter(id=self.old_issue.id).update(created_at=last_year)
+    
+    def test_archive_moves_only_old_resolved_records(self):
+        """Test that only resolved records older than the cutoff are archived, in batches"""
+        results = archive_resolved(older_than_days=365, batch_size=2)
+        
+        self.assertEqual(results, {'event': 3, 'crop_issue': 1})
+        self.assertEqual(
+            set(Event.objects.values_list('id', flat=True)),
+            {self.old_open.id, self.recent.id}
+        )
+        self.assertEqual(
+            set(ArchivedEvent.objects.values_list('id', flat=True)),
+            {e.id for e in self.old_events}
+        )
+        archived = ArchivedCropIssue.objects.get()
+        self.assertEqual(archived.id, self.old_issue.id)
+        self.assertEqual(archived.title, 'Locusts')
+        self.assertTrue(ArchiveCheckpoint.objects.get(model_label='event').completed)
+    
+    def test_resume_continues_interrupted_run(self):
+        """Test that --resume reuses the interrupted run's cutoff and position"""
+        cutoff = timezone.now() - timedelta(days=365)
+        ArchiveCheckpoint.objects.create(model_label='event', cutoff=cutoff, last_id=self.old_events[0].id)
+        
+        results = archive_resolved(older_than_days=0, batch_size=10, resume=True)
+        
+        # Position was past the first old event, and the recent one is newer than the cutoff
+        self.assertEqual(results['event'], 2)
+        self.assertTrue(Event.objects.filter(id=self.old_events[0].id).exists())
+        self.assertTrue(Event.objects.filter(id=self.recent.id).exists())
+    
+    def test_list_merges_archive_on_request(self):
+        """Test that listings read hot data unless include_archived is passed"""
+        archive_resolved(older_than_days=365, batch_size=100)
+        url = reverse('event-list')
+        
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()), 2)
+        
+        response = self.client.get(url, {'include_archived': '1', 'status': 'resolved'})
+        data = response.json()
+        self.assertEqual(len(data), 4)
+        self.assertEqual(data[0]['id'], self.recent.id)
+        self.assertEqual(data[0]['created_at'], max(e['created_at'] for e in data))
+        self.assertEqual(data[-1]['farm_summary']['farmer_name'], 'Bolot Mamatov')
+        
+        response = self.client.get(reverse('cropissue-list'), {'include_archived': '1'})
+        self.assertEqual([c['id'] for c in response.json()], [self.old_issue.id])
+
+
+class PopulationAtRiskTest(APITestCase):
+    def setUp(self):
+        """Set up farms at known distances from an outbreak"""
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        
+        def farm(name, lat, lng):
+            return Farm.objects.create(
+                district=district, farmer_name=name, phone='+996 555 000 000',
+                village='Tokmok', location_lat=lat, location_lng=lng
+            )
+        
+        self.origin = farm('Origin', 42.80, 75.30)
+        self.near = farm('Near', 42.85, 75.30)  # ~5.6 km north
+        self.far = farm('Far', 43.30, 75.30)  # ~56 km north
+        Herd.objects.create(farm=self.origin, animal_type='cattle', headcount=20)
+        Herd.objects.create(farm=self.near, animal_type='cattle', headcount=30)
+        Herd.objects.create(farm=self.near, animal_type='sheep', headcount=100)
+        Herd.objects.create(farm=self.near, animal_type='poultry', headcount=500)
+        Herd.objects.create(farm=self.far, animal_type='cattle', headcount=40)
+        
+        self.event = Event.objects.create(
+            farm=self.origin,
+            event_type='disease_report',
+            description='FMD suspected',
+            disease_suspected='Foot-and-mouth disease'
+        )
+    
+    def test_at_risk_sums_susceptible_species_within_radius(self):
+        """Test that only susceptible herds on farms inside the radius are counted"""
+        url = reverse('event-at-risk', args=[self.event.id])
+        response = self.client.get(url, {'radius_km': 10})
+        
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['totals_by_species'], {'cattle': 50, 'sheep': 100, 'goat': 0})
+        self.assertEqual(data['total_animals_at_risk'], 150)
+        self.assertEqual([f['farm_id'] for f in data['farms']], [self.origin.id, self.near.id])
+        self.assertAlmostEqual(data['farms'][1]['distance_km'], 5.56, places=1)
+    
+    def test_coordinate_cache_refreshes_on_farm_change(self):
+        """Test that moving a farm is reflected in the next radius query"""
+        url = reverse('event-at-risk', args=[self.event.id])
+        self.client.get(url, {'radius_km': 10})
+        
+        self.far.location_lat = 42.81
+        self.far.save()
+        
+        data = self.client.get(url, {'radius_km': 10}).json()
+        self.assertEqual(data['totals_by_species']['cattle'], 90)
+    
+    def test_coordinate_cache_follows_other_processes(self):
+        """Test that a farm moved by another process shows up once the shared generation moves"""
+        url = reverse('event-at-risk', args=[self.event.id])
+        self.client.get(url, {'radius_km': 10})
+        
+        # Written by another process: no signal here, only its generation bump in the shared cache
+        Farm.objects.filter(pk=self.far.id).update(location_lat=42.81)
+        self.assertEqual(self.client.get(url, {'radius_km': 10}).json()['totals_by_species']['cattle'], 50)
+        bump_generation('farm-coordinates')
+        self.assertEqual(self.client.get(url, {'radius_km': 10}).json()['totals_by_species']['cattle'], 90)
+    
+    def test_at_risk_validates_radius(self):
+        """Test that a missing or out-of-range radius is rejected"""
+        url = reverse('event-at-risk', args=[self.event.id])
+        self.assertEqual(self.client.get(url, {'radius_km': 'far'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'radius_km': 10000}).status_code, 400)
+
+
+class CropIssueStatsTest(APITestCase):
+    def setUp(self):
+        """Set up crop issues across two districts"""
+        chuy = District.objects.create(name='Chuy Region', code='CHU')
+        osh = District.objects.create(name='Osh Region', code='OSH')
+        farm1 = Farm.objects.create(district=chuy, farmer_name='Bolot Mamatov', phone='+996 555 123 456', village='Tokmok')
+        farm2 = Farm.objects.create(district=osh, farmer_name='Aigul Bekova', phone='+996 556 234 567', village='Kara-Suu')
+        self.chuy, self.farm2 = chuy, farm2
+        
+        def issue(farm, crop_type, problem_type, area):
+            return CropIssue.objects.create(
+                farm=farm, crop_type=crop_type, problem_type=problem_type,
+                title='Issue', description='Issue', severity='high', area_affected_ha=area
+            )
+        
+        issue(farm1, 'wheat', 'pest', 2.0)
+        issue(farm1, 'wheat', 'pest', 3.0)
+        issue(farm1, 'wheat', 'disease', None)
+        issue(farm1, 'barley', 'pest', 1.5)
+        issue(farm2, 'wheat', 'weed', 4.0)
+        self.url = reverse('crop-issue-stats')
+    
+    def test_rollup_subtotals_every_level(self):
+        """Test that each grouping prefix gets its own subtotal rows"""
+        response = self.client.get(self.url, {
+            'group_by': 'district,crop_type',
+            'metrics': 'count,area_sum,area_avg',
+        })
+        self.assertEqual(response.status_code, 200)
+        levels = response.json()['levels']
+        
+        self.assertEqual([level['group_by'] for level in levels], [[], ['district'], ['district', 'crop_type']])
+        self.assertEqual(levels[0]['rows'], [{'count': 5, 'area_sum': 10.5, 'area_avg': 2.625}])
+        self.assertEqual(levels[1]['rows'], [
+            {'district': 'CHU', 'count': 4, 'area_sum': 6.5, 'area_avg': 2.167},
+            {'district': 'OSH', 'count': 1, 'area_sum': 4.0, 'area_avg': 4.0},
+        ])
+        self.assertIn(
+            {'district': 'CHU', 'crop_type': 'wheat', 'count': 3, 'area_sum': 5.0, 'area_avg': 2.5},
+            levels[2]['rows']
+        )
+    
+    def test_filters_and_single_query(self):
+        """Test dimension filters and that the rollup is one aggregate query"""
+        cache.clear()
+        self.client.get(self.url, {'district': 'CHU'})  # warm the district code cache
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'group_by': 'problem_type', 'district': 'CHU'})
+        self.assertEqual(len(queries), 1)
+        rows = response.json()['levels'][1]['rows']
+        self.assertEqual(rows, [{'problem_type': 'disease', 'count': 1}, {'problem_type': 'pest', 'count': 3}])
+        
+        # Same shape is served from cache until a crop issue changes
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'group_by': 'problem_type', 'district': 'CHU'})
+        self.assertEqual(len(queries), 0)
+        
+        CropIssue.objects.filter(problem_type='disease').get().delete()
+        response = self.client.get(self.url, {'group_by': 'problem_type', 'district': 'CHU'})
+        self.assertEqual(response.json()['levels'][0]['rows'], [{'count': 3}])
+    
+    def test_crop_spellings_share_one_row(self):
+        """Test that crop_type groups and filters by the canonical crop, and unknown names by trimmed text"""
+        farm = CropIssue.objects.first().farm
+        for crop_type in ['Wheat ', 'Пшеница', 'dragon fruit', ' dragon fruit ']:
+            CropIssue.objects.create(
+                farm=farm, crop_type=crop_type, problem_type='pest', title='Issue', description='Issue', severity='low'
+            )
+        rows = self.client.get(self.url, {'group_by': 'crop_type'}).json()['levels'][1]['rows']
+        self.assertEqual(rows, [
+            {'crop_type': 'barley', 'count': 1},
+            {'crop_type': 'dragon fruit', 'count': 2},
+            {'crop_type': 'wheat', 'count': 6},
+        ])
+        for value, count in [('buudai', 6), ('Dragon Fruit', 2), ('mango', 0)]:
+            response = self.client.get(self.url, {'crop_type': value})
+            self.assertEqual(response.json()['levels'][0]['rows'], [{'count': count}], value)
+    
+    def test_farm_moving_district_refreshes_rollup(self):
+        """Test that moving a farm, by save or by registry import, moves its crop issues in the rollup"""
+        def counts():
+            rows = self.client.get(self.url, {'group_by': 'district'}).json()['levels'][1]['rows']
+            return {row['district']: row['count'] for row in rows}
+        
+        self.assertEqual(counts(), {'CHU': 4, 'OSH': 1})
+        self.farm2.district = self.chuy
+        self.farm2.save()
+        self.assertEqual(counts(), {'CHU': 5})
+        
+        registry = 'district,farmer_name,phone,village\nOSH,Aigul Bekova,+996 556 234 567,Kara-Suu\n'
+        import_farms(io.BytesIO(registry.encode()), 'registry.csv')
+        self.assertEqual(counts(), {'CHU': 4, 'OSH': 1})
+    
+    def test_rejects_unknown_dimensions_and_metrics(self):
+        """Test that only whitelisted dimensions and metrics are accepted"""
+        self.assertEqual(self.client.get(self.url, {'group_by': 'title'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'metrics': 'area_max'}).status_code, 400)
+
+
+class RiskScoreTest(APITestCase):
+    def setUp(self):
+        """Set up farms near and far from an open outbreak"""
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        
+        def farm(name, lat, lng):
+            return Farm.objects.create(
+                district=district, farmer_name=name, phone='+996 555 000 000',
+                village='Tokmok', location_lat=lat, location_lng=lng
+            )
+        
+        self.origin = farm('Origin', 42.80, 75.30)
+        self.near_cattle = farm('Near cattle', 42.82, 75.30)
+        self.near_poultry = farm('Near poultry', 42.82, 75.31)
+        self.far_cattle = farm('Far cattle', 44.00, 75.30)
+        self.no_coordinates = farm('Unknown location', None, None)
+        Herd.objects.create(farm=self.near_cattle, animal_type='cattle', headcount=100)
+        Herd.objects.create(farm=self.near_poultry, animal_type='poultry', headcount=1000)
+        Herd.objects.create(farm=self.far_cattle, animal_type='cattle', headcount=100)
+        Herd.objects.create(farm=self.no_coordinates, animal_type='cattle', headcount=100)
+        
+        Event.objects.create(
+            farm=self.origin,
+            event_type='disease_report',
+            description='FMD suspected',
+            disease_suspected='Foot-and-mouth disease'
+        )
+        CropIssue.objects.create(
+            farm=self.no_coordinates, crop_type='wheat', problem_type='pest',
+            title='Locusts', description='Locusts', severity='high'
+        )
+    
+    def test_scores_rank_exposed_susceptible_farms_first(self):
+        """Test that nearby susceptible herds outrank distant or non-susceptible ones"""
+        self.assertEqual(refresh_risk_scores(batch_size=2), 5)
+        scores = dict(Farm.objects.values_list('farmer_name', 'risk_score'))
+        
+        self.assertGreater(scores['Near cattle'], scores['Far cattle'])
+        self.assertEqual(scores['Near poultry'], 0)
+        self.assertEqual(scores['Far cattle'], 0)
+        self.assertEqual(scores['Unknown location'], 1.5)  # high-severity crop issue only
+        
+        response = self.client.get(reverse('farm-list'), {'ordering': '-risk_score'})
+        self.assertEqual(response.json()[0]['farmer_name'], 'Near cattle')
+    
+    def test_refresh_only_writes_changed_scores(self):
+        """Test that a second refresh with no changes writes nothing"""
+        refresh_risk_scores()
+        self.assertEqual(refresh_risk_scores(), 0)
+        
+        Herd.objects.create(farm=self.near_poultry, animal_type='sheep', headcount=10)
+        self.assertEqual(refresh_risk_scores(), 1)
+
+
+class VaccinationCoverageTest(APITestCase):
+    def setUp(self):
+        """Set up two districts with cattle and sheep herds, one farm vaccinated"""
+        self.chuy = District.objects.create(name='Chuy Region', code='CHU')
+        self.osh = District.objects.create(name='Osh Region', code='OSH')
+        
+        def farm(district, name):
+            return Farm.objects.create(
+                district=district, farmer_name=name, phone='+996 555 000 000', village='Tokmok'
+            )
+        
+        self.vaccinated = farm(self.chuy, 'Vaccinated')
+        self.unvaccinated = farm(self.chuy, 'Unvaccinated')
+        self.osh_farm = farm(self.osh, 'Osh farm')
+        Herd.objects.create(farm=self.vaccinated, animal_type='cattle', headcount=30)
+        Herd.objects.create(farm=self.vaccinated, animal_type='sheep', headcount=100)
+        Herd.objects.create(farm=self.unvaccinated, animal_type='cattle', headcount=10)
+        Herd.objects.create(farm=self.osh_farm, animal_type='cattle', headcount=50)
+        Event.objects.create(farm=self.vaccinated, event_type='vaccination', description='FMD vaccine')
+    
+    def coverage(self, **params):
+        response = self.client.get(reverse('vaccination-coverage'), params)
+        self.assertEqual(response.status_code, 200)
+        return {(row['district'], row['animal_type']): row for row in response.json()['results']}
+    
+    def test_coverage_per_district_and_animal_type(self):
+        """Test that herds and headcounts are split by vaccination within the window"""
+        self.vaccinated.refresh_from_db()
+        self.assertIsNotNone(self.vaccinated.last_vaccinated_at)
+        refresh_vaccination_coverage()
+        
+        rows = self.coverage()
+        cattle = rows[('CHU', 'cattle')]
+        self.assertEqual((cattle['herds_total'], cattle['herds_vaccinated']), (2, 1))
+        self.assertEqual((cattle['headcount_total'], cattle['headcount_vaccinated']), (40, 30))
+        self.assertEqual(cattle['headcount_coverage'], 0.75)
+        self.assertEqual(rows[('CHU', 'sheep')]['herd_coverage'], 1.0)
+        self.assertEqual(rows[('OSH', 'cattle')]['herds_vaccinated'], 0)
+        
+        self.assertEqual(set(self.coverage(district='OSH', animal_type='cattle')), {('OSH', 'cattle')})
+        response = self.client.get(reverse('vaccination-coverage'), {'animal_type': 'camel'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_refresh_only_recomputes_changed_districts(self):
+        """Test that signals mark districts stale and untouched districts are skipped"""
+        refresh_vaccination_coverage()
+        self.assertEqual(refresh_vaccination_coverage(), 0)
+        
+        Event.objects.create(farm=self.osh_farm, event_type='vaccination', description='FMD vaccine')
+        Herd.objects.create(farm=self.osh_farm, animal_type='goat', headcount=5)
+        self.assertEqual(refresh_vaccination_coverage(), 1)
+        
+        rows = self.coverage(district='OSH')
+        self.assertEqual(rows[('OSH', 'cattle')]['herds_vaccinated'], 1)
+        self.assertEqual(rows[('OSH', 'goat')]['headcount_vaccinated'], 5)
+        self.assertFalse(any(row['stale'] for row in rows.values()))
+    
+    def test_mark_stale_during_refresh_is_kept(self):
+        """Test that a row flagged stale after the refresh read the coverage rows stays stale"""
+        refresh_vaccination_coverage()
+        Herd.objects.bulk_create([Herd(farm=self.osh_farm, animal_type='goat', headcount=5)])
+        aggregate = Herd.objects.filter
+        
+        def flag_while_aggregating(*args, **kwargs):
+            # Another process's herd signal, landing between the read and the write
+            mark_stale(self.osh.id, 'goat')
+            return aggregate(*args, **kwargs)
+        
+        with mock.patch.object(Herd.objects, 'filter', side_effect=flag_while_aggregating):
+            refresh_vaccination_coverage(full=True)
+        rows = self.coverage(district='OSH')
+        self.assertTrue(rows[('OSH', 'goat')]['stale'])
+        self.assertFalse(rows[('OSH', 'cattle')]['stale'])
+        self.assertEqual(refresh_vaccination_coverage(), 1)
+        self.assertEqual(self.coverage(district='OSH')[('OSH', 'goat')]['headcount_total'], 5)
+    
+    def test_vaccinations_age_out_of_the_window(self):
+        """Test that a district is recomputed once its vaccinations leave the window"""
+        refresh_vaccination_coverage()
+        later = timezone.now() + timedelta(days=366)
+        with mock.patch('core.coverage.timezone.now', return_value=later):
+            self.assertEqual(refresh_vaccination_coverage(), 1)
+        
+        self.assertEqual(self.coverage(district='CHU')[('CHU', 'cattle')]['herds_vaccinated'], 0)
+    
+    def test_deleting_vaccination_rolls_back_last_vaccinated_at(self):
+        """Test that deleting the only vaccination clears the farm's last vaccination"""
+        Event.objects.filter(farm=self.vaccinated).delete()
+        self.vaccinated.refresh_from_db()
+        self.assertIsNone(self.vaccinated.last_vaccinated_at)
+
+
+class ListFilterTest(APITestCase):
+    def setUp(self):
+        """Set up events and crop issues across two districts and dates"""
+        self.chuy = District.objects.create(name='Chuy Region', code='CHU')
+        self.osh = District.objects.create(name='Osh Region', code='OSH')
+        self.naryn = District.objects.create(name='Naryn Region', code='NAR')
+        self.chuy_farm = Farm.objects.create(
+            district=self.chuy, farmer_name='Aibek', phone='+996 555 000 001', village='Tokmok'
+        )
+        self.osh_farm = Farm.objects.create(
+            district=self.osh, farmer_name='Gulnara', phone='+996 555 000 002', village='Uzgen'
+        )
+        Farm.objects.create(district=self.naryn, farmer_name='Bakyt', phone='+996 555 000 003', village='At-Bashy')
+        
+        for farm, status_value in [(self.chuy_farm, 'new'), (self.chuy_farm, 'in_progress'), (self.osh_farm, 'resolved')]:
+            Event.objects.create(farm=farm, event_type='vet_visit', description='Checkup', status=status_value)
+            CropIssue.objects.create(
+                farm=farm, crop_type='wheat', problem_type='pest', title='Aphids',
+                description='Aphids', severity='medium', status=status_value
+            )
+        self.old_event = Event.objects.create(farm=self.osh_farm, event_type='mortality', description='Old')
+        Event.objects.filter(pk=self.old_event.pk).update(created_at=timezone.now() - timedelta(days=30))
+    
+    def test_comma_separated_values(self):
+        """Test that comma-separated values match any of the listed values"""
+        response = self.client.get(reverse('event-list'), {'status': 'new,in_progress'})
+        self.assertEqual(len(response.json()), 3)
+        
+        response = self.client.get(reverse('cropissue-list'), {'status': 'new,resolved', 'district': 'CHU,OSH'})
+        self.assertEqual(len(response.json()), 2)
+        
+        response = self.client.get(reverse('farm-list'), {'district': 'CHU,NAR,UNKNOWN'})
+        self.assertEqual({farm['farmer_name'] for farm in response.json()}, {'Aibek', 'Bakyt'})
+    
+    def test_created_at_range(self):
+        """Test created_after/created_before bounds, including bare dates"""
+        week_ago = (timezone.now() - timedelta(days=7)).isoformat()
+        response = self.client.get(reverse('event-list'), {'created_after': week_ago})
+        self.assertEqual(len(response.json()), 3)
+        
+        old_day = (timezone.now() - timedelta(days=30)).date().isoformat()
+        response = self.client.get(reverse('event-list'), {'created_before': old_day})
+        self.assertEqual([event['id'] for event in response.json()], [self.old_event.id])
+        
+        response = self.client.get(reverse('farm-list'), {'created_before': old_day})
+        self.assertEqual(response.json(), [])
+    
+    def test_invalid_date_is_rejected(self):
+        """Test that an unparseable date returns 400"""
+        response = self.client.get(reverse('cropissue-list'), {'created_after': 'last week'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+    
+    def test_filters_compile_to_in_predicates(self):
+        """Test that multi-value filters become a single IN predicate"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('event-list'), {'event_type': 'vet_visit,mortality'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"event_type" IN', sql)
+
+
+class DashboardBundleTest(APITestCase):
+    def setUp(self):
+        """Set up a farm with an open outbreak and a high-severity crop issue"""
+        cache.clear()
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        District.objects.create(name='Osh Region', code='OSH')
+        self.farm = Farm.objects.create(
+            district=district, farmer_name='Aibek', phone='+996 555 000 001', village='Tokmok'
+        )
+        Herd.objects.create(farm=self.farm, animal_type='cattle', headcount=12)
+        Event.objects.create(
+            farm=self.farm, event_type='disease_report', description='FMD suspected',
+            disease_suspected='Foot-and-mouth disease'
+        )
+        Event.objects.create(farm=self.farm, event_type='vet_visit', description='Checkup')
+        CropIssue.objects.create(
+            farm=self.farm, crop_type='wheat', problem_type='pest', title='Locusts',
+            description='Locusts', severity='high'
+        )
+        CropIssue.objects.create(
+            farm=self.farm, crop_type='wheat', problem_type='weed', title='Weeds',
+            description='Weeds', severity='low'
+        )
+    
+    def test_bundle_contents_and_query_budget(self):
+        """Test that the bundle is built with a fixed number of queries and then cached"""
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('dashboard-bundle'), {'district': 'CHU'})
+        data = response.json()
+        self.assertEqual(data['summary']['total_animals'], 12)
+        self.assertEqual([d['code'] for d in data['districts']], ['CHU', 'OSH'])
+        self.assertEqual([e['event_type'] for e in data['recent_outbreaks']], ['disease_report'])
+        self.assertEqual([c['title'] for c in data['recent_severe_crop_issues']], ['Locusts'])
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('dashboard-bundle'), {'district': 'CHU'}).json(), data)
+    
+    def test_bundle_invalidated_by_new_records(self):
+        """Test that a new outbreak shows up in the next bundle"""
+        self.client.get(reverse('dashboard-bundle'))
+        Event.objects.create(farm=self.farm, event_type='mortality', description='Two cows died')
+        data = self.client.get(reverse('dashboard-bundle')).json()
+        self.assertEqual(len(data['recent_outbreaks']), 2)
+        self.assertEqual(data['summary']['open_outbreaks'], 2)
+    
+    def test_bundle_limit_validation(self):
+        """Test that limit must be within the configured range"""
+        response = self.client.get(reverse('dashboard-bundle'), {'limit': '500'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('dashboard-bundle'), {'limit': '1'})
+        self.assertEqual(response.status_code, 200)
+
+
+class BatchIdsTest(APITestCase):
+    def setUp(self):
+        """Set up three farms with herds, events and a crop issue"""
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        self.farms = [
+            Farm.objects.create(
+                district=district, farmer_name=f'Farmer {n}', phone='+996 555 000 000', village='Tokmok'
+            )
+            for n in range(3)
+        ]
+        for farm in self.farms:
+            Herd.objects.create(farm=farm, animal_type='cattle', headcount=5)
+        self.events = [
+            Event.objects.create(farm=farm, event_type='vet_visit', description='Checkup')
+            for farm in self.farms
+        ]
+        self.crop_issue = CropIssue.objects.create(
+            farm=self.farms[0], crop_type='wheat', problem_type='pest', title='Aphids',
+            description='Aphids', severity='low'
+        )
+    
+    def test_ids_returned_in_requested_order_with_missing_reported(self):
+        """Test that ?ids= returns the records in order and lists missing ids in a header"""
+        ids = [self.farms[2].id, 9999, self.farms[0].id]
+        with self.assertNumQueries(2):  # farms + prefetched herds
+            response = self.client.get(reverse('farm-list'), {'ids': ','.join(map(str, ids))})
+        self.assertEqual([farm['id'] for farm in response.json()], [self.farms[2].id, self.farms[0].id])
+        self.assertEqual(response['X-Missing-Ids'], '9999')
+        
+        response = self.client.get(reverse('event-list'), {'ids': f'{self.events[1].id}'})
+        self.assertEqual([event['id'] for event in response.json()], [self.events[1].id])
+        self.assertNotIn('X-Missing-Ids', response)
+    
+    def test_ids_include_archived_records(self):
+        """Test that archived records are found with include_archived=1"""
+        CropIssue.objects.filter(pk=self.crop_issue.pk).update(
+            status='resolved', created_at=timezone.now() - timedelta(days=400)
+        )
+        archive_resolved()
+        params = {'ids': str(self.crop_issue.id)}
+        self.assertEqual(self.client.get(reverse('cropissue-list'), params).json(), [])
+        params['include_archived'] = '1'
+        self.assertEqual(len(self.client.get(reverse('cropissue-list'), params).json()), 1)
+    
+    @override_settings(BATCH_IDS_MAX=2)
+    def test_ids_validation(self):
+        """Test that too many or non-integer ids return 400"""
+        response = self.client.get(reverse('farm-list'), {'ids': '1,2,3'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('farm-list'), {'ids': '1,abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FarmTimelineTest(APITestCase):
+    def setUp(self):
+        """Set up a farm with interleaved events and crop issues"""
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        self.farm = Farm.objects.create(
+            district=district, farmer_name='Aibek', phone='+996 555 000 001', village='Tokmok'
+        )
+        other = Farm.objects.create(
+            district=district, farmer_name='Other', phone='+996 555 000 002', village='Tokmok'
+        )
+        Event.objects.create(farm=other, event_type='vet_visit', description='Other farm')
+        
+        base = timezone.now() - timedelta(days=10)
+        self.expected = []
+        for n in range(7):
+            created_at = base + timedelta(hours=n)
+            if n % 2:
+                record = Event.objects.create(farm=self.farm, event_type='vet_visit', description=f'Visit {n}')
+                Event.objects.filter(pk=record.pk).update(created_at=created_at)
+                self.expected.append(('event', record.pk))
+            else:
+                record = CropIssue.objects.create(
+                    farm=self.farm, crop_type='wheat', problem_type='pest', title=f'Issue {n}',
+                    description='Pests', severity='low'
+                )
+                CropIssue.objects.filter(pk=record.pk).update(created_at=created_at)
+                self.expected.append(('crop_issue', record.pk))
+        # An event and a crop issue created at the same instant
+        tie = Event.objects.create(farm=self.farm, event_type='mortality', description='Tie')
+        Event.objects.filter(pk=tie.pk).update(created_at=base)
+        self.expected.insert(1, ('event', tie.pk))  # events sort first on ties
+        self.expected.reverse()
+    
+    def fetch_all(self, **params):
+        url = reverse('farm-timeline', args=[self.farm.pk])
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(url, {**params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            seen.extend((row['type'], row['id']) for row in data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                return seen
+    
+    def test_timeline_is_merged_newest_first(self):
+        """Test that one page holds both kinds in created_at order"""
+        response = self.client.get(reverse('farm-timeline', args=[self.farm.pk]))
+        self.assertEqual([(row['type'], row['id']) for row in response.json()['results']], self.expected)
+        self.assertIsNone(response.json()['next_cursor'])
+    
+    def test_cursor_pages_cover_every_record_once(self):
+        """Test that paging with the cursor returns every record exactly once, in order"""
+        self.assertEqual(self.fetch_all(limit=3), self.expected)
+        self.assertEqual(self.fetch_all(limit=1), self.expected)
+    
+    def test_timeline_includes_archived_records(self):
+        """Test that archived records are merged in with include_archived=1"""
+        Event.objects.filter(farm=self.farm).update(status='resolved')
+        archive_resolved(older_than_days=1)
+        self.assertEqual(len(self.fetch_all(limit=3)), 4)
+        self.assertEqual(self.fetch_all(limit=3, include_archived='1'), self.expected)
+    
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor returns 400"""
+        response = self.client.get(reverse('farm-timeline', args=[self.farm.pk]), {'cursor': 'nonsense'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AdminChangelistTest(APITestCase):
+    def setUp(self):
+        """Set up a superuser and a few events and crop issues"""
+        from django.contrib.auth.models import User
+        
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.user)
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        farms = [
+            Farm.objects.create(
+                district=district, farmer_name=f'Farmer {n}', phone='+996 555 000 000', village='Tokmok'
+            )
+            for n in range(3)
+        ]
+        for farm in farms:
+            Herd.objects.create(farm=farm, animal_type='cattle', headcount=5)
+            Event.objects.create(farm=farm, event_type='vet_visit', description='Checkup')
+            CropIssue.objects.create(
+                farm=farm, crop_type='wheat', problem_type='pest', title='Aphids',
+                description='Aphids', severity='high'
+            )
+    
+    def test_changelists_avoid_per_row_queries_and_full_counts(self):
+        """Test that changelist queries don't grow with rows and reuse the precomputed table counts"""
+        precompute_admin_counts()
+        for name in ['core_event_changelist', 'core_cropissue_changelist', 'core_herd_changelist', 'core_farm_changelist']:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(f'admin:{name}'))
+            self.assertEqual(response.status_code, 200)
+            table = name.replace('_changelist', '')
+            unbounded_counts = [
+                query['sql'] for query in queries.captured_queries
+                if query['sql'].startswith(f'SELECT COUNT(*) AS "__count" FROM "{table}"')
+            ]
+            self.assertEqual(unbounded_counts, [], name)
+            row_queries = [
+                query['sql'] for query in queries.captured_queries
+                if 'FROM "core_farm"' in query['sql'] and '"core_farm"."id" =' in query['sql']
+            ]
+            self.assertEqual(row_queries, [], name)
+        
+        response = self.client.get(reverse('admin:core_event_changelist'), {'status__exact': 'new'})
+        self.assertEqual(response.status_code, 200)
+    
+    def test_counts_are_exact_after_deletes(self):
+        """Test that changelist counts stay exact when ids have gaps, filtered or not"""
+        Event.objects.order_by('id').first().delete()
+        response = self.client.get(reverse('admin:core_event_changelist'))
+        self.assertEqual(response.context['cl'].paginator.count, 2)
+        response = self.client.get(reverse('admin:core_event_changelist'), {'status__exact': 'new'})
+        self.assertEqual(response.context['cl'].paginator.count, 2)
+    
+    def test_bulk_status_action_is_one_update(self):
+        """Test that the resolve action updates all selected rows in one statement"""
+        ids = list(CropIssue.objects.values_list('id', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('admin:core_cropissue_changelist'), {
+                'action': 'mark_resolved',
+                '_selected_action': ids,
+            })
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "core_cropissue"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(CropIssue.objects.filter(status='resolved').count(), 3)
+    
+    def test_bulk_status_action_touches_updated_at_and_publishes(self):
+        """Test that the bulk action sets updated_at and pushes a live update per row"""
+        CropIssue.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        ids = list(CropIssue.objects.values_list('id', flat=True))
+        broker = mock.Mock()
+        with mock.patch('core.signals.get_broker', return_value=broker):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('admin:core_cropissue_changelist'), {
+                    'action': 'mark_in_progress',
+                    '_selected_action': ids,
+                })
+        messages = [call.args[0] for call in broker.publish.call_args_list]
+        self.assertEqual(sorted(message['id'] for message in messages), sorted(ids))
+        self.assertEqual({(message['action'], message['status']) for message in messages}, {('updated', 'in_progress')})
+        stale = CropIssue.objects.filter(updated_at__lt=timezone.now() - timedelta(hours=1))
+        self.assertFalse(stale.exists())
+
+
+class FarmImportTest(APITestCase):
+    HEADER = 'district,farmer_name,phone,village,location_lat,location_lng,cattle,sheep\n'
+    
+    def setUp(self):
+        """Set up districts and an existing farm that the registry will update"""
+        self.chuy = District.objects.create(name='Chuy Region', code='CHU')
+        self.osh = District.objects.create(name='Osh Region', code='OSH')
+        self.existing = Farm.objects.create(
+            district=self.chuy, farmer_name='Aibek Mamatov', phone='+996 555 123 456', village='Tokmok'
+        )
+        Herd.objects.create(farm=self.existing, animal_type='cattle', headcount=3)
+        Event.objects.create(farm=self.existing, event_type='vet_visit', description='Checkup')
+        ArchivedEvent.objects.create(
+            id=1000, farm=self.existing, district=self.chuy, event_type='vet_visit', description='Old checkup',
+            status='resolved', created_at=timezone.now() - timedelta(days=400),
+        )
+    
+    def registry(self, *lines):
+        return io.BytesIO((self.HEADER + ''.join(line + '\n' for line in lines)).encode())
+    
+    def test_import_upserts_by_normalized_phone_and_name(self):
+        """Test that matching rows update farms and herds and new rows create them"""
+        run = import_farms(self.registry(
+            'OSH,  aibek   MAMATOV ,0555 123-456,Uzgen,40.77,73.30,12,40',
+            'CHU,Gulnara Bekova,+996 700 000 001,Kant,,,5,',
+            'XXX,Nobody,+996 700 000 002,Kant,,,,',
+        ), 'registry.csv', chunk_size=2)
+        
+        self.assertEqual(run.status, 'completed')
+        self.assertEqual((run.rows_processed, run.farms_created, run.farms_updated, run.rows_failed), (3, 1, 1, 1))
+        self.assertEqual(run.errors[0]['row'], 3)
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.district, self.existing.village), (self.osh, 'Uzgen'))
+        self.assertEqual(
+            dict(self.existing.herds.values_list('animal_type', 'headcount')), {'cattle': 12, 'sheep': 40}
+        )
+        # The denormalized district follows the farm
+        self.assertEqual(self.existing.events.get().district, self.osh)
+        self.assertEqual(self.existing.archived_events.get().district, self.osh)
+        self.assertEqual(Farm.objects.get(farmer_name='Gulnara Bekova').phone_normalized, '996700000001')
+    
+    def test_import_xlsx(self):
+        """Test that an .xlsx registry imports like a CSV, including numeric phone cells"""
+        from openpyxl import Workbook
+        
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(self.HEADER.strip().split(','))
+        sheet.append(['CHU', 'Gulnara Bekova', 996700000001, 'Kant', 42.88, 74.85, 5, None])
+        output = io.BytesIO()
+        workbook.save(output)
+        output.seek(0)
+        
+        run = import_farms(output, 'registry.xlsx')
+        self.assertEqual((run.status, run.farms_created, run.rows_failed), ('completed', 1, 0))
+        farm = Farm.objects.get(farmer_name='Gulnara Bekova')
+        self.assertEqual((farm.phone_normalized, farm.location_lat), ('996700000001', 42.88))
+        self.assertEqual(dict(farm.herds.values_list('animal_type', 'headcount')), {'cattle': 5})
+    
+    def test_resume_continues_after_last_committed_row(self):
+        """Test that a failed import resumes from its checkpoint without redoing rows"""
+        lines = [f'CHU,Farmer {n},+996 700 000 {n:03d},Kant,,,1,' for n in range(5)]
+        with mock.patch('core.imports._write_chunk', side_effect=[(2, 0, 2), RuntimeError('disk full')]):
+            with self.assertRaises(RuntimeError):
+                import_farms(self.registry(*lines), 'registry.csv', chunk_size=2)
+        failed = ImportRun.objects.get()
+        self.assertEqual((failed.status, failed.rows_processed), ('failed', 2))
+        
+        run = import_farms(self.registry(*lines), 'registry.csv', chunk_size=2, resume=True)
+        self.assertEqual(run.pk, failed.pk)
+        self.assertEqual((run.status, run.rows_processed, run.farms_created), ('completed', 5, 5))
+        self.assertEqual(Farm.objects.filter(farmer_name__startswith='Farmer').count(), 3)
+    
+    def test_upload_endpoint_is_staff_only(self):
+        """Test that the upload endpoint queues an import job for staff and rejects anonymous users"""
+        from django.contrib.auth.models import User
+        
+        upload = SimpleUploadedFile('registry.csv', self.registry('CHU,New Farmer,+996 700 111 222,Kant,,,,').read())
+        response = self.client.post(reverse('farm-import-registry'), {'file': upload}, format='multipart')
+        self.assertIn(response.status_code, (401, 403))
+        
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        upload.seek(0)
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            response = self.client.post(reverse('farm-import-registry'), {'file': upload}, format='multipart')
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json()['kind'], 'import_farms')
+            self.assertEqual(run_pending(), 1)
+        
+        job = self.client.get(reverse('job-detail', args=[response.json()['id']])).json()
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['result']['farms_created'], 1)
+        
+        response = self.client.post(
+            reverse('farm-import-registry'),
+            {'file': SimpleUploadedFile('registry.txt', b'x')},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(JOB_RETRY_BACKOFF_SECONDS=0)
+class JobQueueTest(APITestCase):
+    def setUp(self):
+        """Set up a staff user and a throwaway media directory for job files"""
+        from django.contrib.auth.models import User
+        
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=self.media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+    
+    def test_jobs_run_by_priority(self):
+        """Test that the highest-priority due job is claimed first"""
+        low = enqueue('refresh_risk_scores', priority=0)
+        high = enqueue('refresh_vaccination_coverage', priority=5)
+        self.assertEqual(claim_next('test').pk, high.pk)
+        self.assertEqual(claim_next('test').pk, low.pk)
+        self.assertIsNone(claim_next('test'))
+    
+    def test_failed_jobs_retry_then_fail(self):
+        """Test that a failing job is retried until max_attempts and keeps the error"""
+        failing = enqueue('export_farms', max_attempts=2)
+        with mock.patch('core.tasks.Farm.objects.order_by', side_effect=RuntimeError('boom')):
+            self.assertEqual(run_pending(), 2)
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), ('failed', 2))
+        self.assertIn('boom', failing.error)
+    
+    def test_create_status_and_download_result(self):
+        """Test queueing an export through the API and downloading its CSV"""
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        Farm.objects.create(district=district, farmer_name='Aibek', phone='+996 555 000 001', village='Tokmok')
+        
+        response = self.client.post(reverse('job-list'), {'kind': 'export_farms', 'params': {'district': 'CHU'}}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'queued')
+        run_pending()
+        
+        job = self.client.get(reverse('job-detail', args=[response.json()['id']])).json()
+        self.assertEqual((job['status'], job['result']), ('succeeded', {'farms': 1}))
+        download = self.client.get(job['result_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertIn(b'Aibek', b''.join(download.streaming_content))
+        
+        response = self.client.post(reverse('job-list'), {'kind': 'rm_rf'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class JobWorkerTest(TransactionTestCase):
+    def test_worker_runs_jobs_on_its_thread_pool(self):
+        """Test that the polling worker runs every queued job and stops cleanly"""
+        jobs = [enqueue('refresh_vaccination_coverage') for _ in range(3)]
+        worker = Worker(threads=2, poll_seconds=0.05)
+        thread = threading.Thread(target=worker.run)
+        thread.start()
+        try:
+            for _ in range(100):
+                if not Job.objects.exclude(status='succeeded').exists():
+                    break
+                threading.Event().wait(0.05)
+        finally:
+            worker.stop()
+            thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(
+            set(Job.objects.filter(pk__in=[job.pk for job in jobs]).values_list('status', flat=True)),
+            {'succeeded'},
+        )
+    
+    @override_settings(JOB_HEARTBEAT_SECONDS=0.05)
+    def test_heartbeat_and_lost_lock(self):
+        """Test that a running job's lock is refreshed and a requeued job's old run doesn't record success"""
+        refreshed = []
+        
+        def slow(job):
+            locked_at = Job.objects.get(pk=job.pk).locked_at
+            threading.Event().wait(0.3)
+            refreshed.append(Job.objects.get(pk=job.pk).locked_at > locked_at)
+            # Requeued as stale while still running
+            Job.objects.filter(pk=job.pk).update(status='queued', locked_by='', locked_at=None)
+            return {'done': True}
+        
+        with mock.patch.dict('core.jobs._handlers', {'slow': slow}):
+            slow_job = enqueue('slow')
+            self.assertFalse(execute(claim_next('worker-a')))
+        self.assertEqual(refreshed, [True])
+        slow_job.refresh_from_db()
+        self.assertEqual((slow_job.status, slow_job.result), ('queued', None))
+
+
+class WarmupTest(APITestCase):
+    def setUp(self):
+        """Set up two districts with a farm each"""
+        cache.clear()
+        for name, code in [('Chuy Region', 'CHU'), ('Osh Region', 'OSH')]:
+            district = District.objects.create(name=name, code=code)
+            Farm.objects.create(district=district, farmer_name='Farmer', phone='+996 555 000 000', village='Village')
+    
+    def test_warm_up_precomputes_every_district(self):
+        """Test that after warm-up dashboard requests are served without queries"""
+        self.assertEqual(warm_up(), 10)  # summary + bundle for all, CHU and OSH; 4 admin counts
+        with self.assertNumQueries(0):
+            for code in ['', 'CHU', 'OSH']:
+                response = self.client.get(reverse('dashboard-summary'), {'district': code} if code else {})
+                self.assertEqual(response.status_code, 200)
+            self.client.get(reverse('dashboard-bundle'), {'district': 'OSH'})
+        self.assertEqual(response.json()['total_farms'], 1)
+    
+    def test_precompute_only_rebuilds_outdated_payloads(self):
+        """Test that a repeated precompute builds nothing until a write bumps the generation"""
+        from .warmup import precompute_dashboards
+        
+        precompute_dashboards()
+        with mock.patch('core.dashboard.build_summary', return_value={}) as build:
+            precompute_dashboards()
+            build.assert_not_called()
+            Farm.objects.create(district=District.objects.get(code='CHU'), farmer_name='New', phone='+996 555 000 009', village='Kant')
+            precompute_dashboards()
+            self.assertTrue(build.called)
+    
+    def test_startup_hook_is_opt_in(self):
+        """Test that nothing is warmed or scheduled unless WARMUP_ON_STARTUP is set"""
+        with mock.patch('core.warmup.warm_up') as warm, mock.patch('core.warmup.start_scheduler') as start:
+            with override_settings(WARMUP_ON_STARTUP=False):
+                on_startup()
+            warm.assert_not_called()
+            with override_settings(WARMUP_ON_STARTUP=True):
+                on_startup()
+            warm.assert_called_once()
+            start.assert_called_once()
+    
+    def test_scheduler_repeats_and_survives_failures(self):
+        """Test that the scheduler keeps running its task after an exception"""
+        calls = []
+        done = threading.Event()
+        
+        def task():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError('first run fails')
+            done.set()
+        
+        scheduler = PeriodicScheduler(task, 0.01)
+        with mock.patch('core.warmup.close_old_connections'), self.assertLogs('core.warmup', 'ERROR'):
+            scheduler.start()
+            self.assertTrue(done.wait(2))
+            scheduler.stop()
+        self.assertGreaterEqual(len(calls), 2)
+
+
+class ProfilingMiddlewareTest(APITestCase):
+    def setUp(self):
+        """Set up a staff user and a farm"""
+        from django.contrib.auth.models import User
+        
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'password', is_staff=True)
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        Farm.objects.create(district=district, farmer_name='Farmer', phone='+996 555 000 000', village='Tokmok')
+    
+    def test_staff_gets_report_with_queries(self):
+        """Test that ?_profile=1 returns samples and SQL with call sites instead of the response"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('farm-list'), {'_profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual(report['status_code'], 200)
+        self.assertIn('folded', report)
+        self.assertGreater(report['queries']['count'], 0)
+        sites = [query['call_site'] for query in report['queries']['items']]
+        self.assertTrue(any(site and site.startswith('core/') for site in sites))
+    
+    def test_header_and_folded_output(self):
+        """Test that the X-Profile header enables profiling and folded mode returns plain text"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('farm-list'), HTTP_X_PROFILE='folded')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+    
+    def test_ignored_for_anonymous_and_when_off(self):
+        """Test that non-staff requests and requests without the flag get the normal response"""
+        for params in [{'_profile': '1'}, {}]:
+            response = self.client.get(reverse('farm-list'), params)
+            self.assertNotIn('queries', response.json())
+    
+    def test_report_is_stored(self):
+        """Test that reports are written to PROFILE_STORE_DIR when set"""
+        self.client.force_login(self.staff)
+        with tempfile.TemporaryDirectory() as directory, override_settings(PROFILE_STORE_DIR=directory):
+            report = self.client.get(reverse('farm-list'), {'_profile': '1'}).json()
+            self.assertTrue(os.path.exists(report['stored_as']))
+            self.assertEqual(len(os.listdir(directory)), 2)
+    
+    def test_idempotency_key_stores_response_not_report(self):
+        """Test that a profiled POST with an Idempotency-Key stores the view's response for retries"""
+        self.client.force_login(self.staff)
+        payload = {'farm': Farm.objects.get().id, 'event_type': 'vet_visit', 'description': 'Checkup'}
+        profiled = self.client.post(
+            reverse('event-list') + '?_profile=1', payload, format='json', HTTP_IDEMPOTENCY_KEY='profiled'
+        )
+        self.assertEqual(profiled.json()['status_code'], 201)
+        retry = self.client.post(reverse('event-list') + '?_profile=1', payload, format='json', HTTP_IDEMPOTENCY_KEY='profiled')
+        self.assertEqual(retry.json()['status_code'], 201)
+        stored = IdempotencyKey.objects.get(key='profiled')
+        self.assertNotIn(b'queries', bytes(stored.response_body))
+        self.assertEqual(Event.objects.count(), 1)
+
+
+class ThrottlingTest(APITestCase):
+    def setUp(self):
+        """Set up a district and start from empty buckets"""
+        cache.clear()
+        self.district = District.objects.create(name='Chuy Region', code='CHU')
+    
+    def tearDown(self):
+        cache.clear()
+    
+    @override_settings(THROTTLE_BUDGETS={'read': {'burst': 5, 'per_second': 1}, 'write': {'burst': 2, 'per_second': 0.1}})
+    def test_write_budget_is_separate_from_reads(self):
+        """Test that exhausting the write budget returns 429 with Retry-After while reads still pass"""
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse('event-list'), {}).status_code, 400)
+        response = self.client.post(reverse('event-list'), {})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 9)
+        self.assertEqual(self.client.get(reverse('event-list')).status_code, 200)
+    
+    @override_settings(THROTTLE_BUDGETS={'read': {'burst': 1, 'per_second': 0.1}, 'write': {'burst': 1, 'per_second': 0.1}})
+    def test_budgets_are_per_endpoint_and_client(self):
+        """Test that each endpoint and each user has its own bucket"""
+        from django.contrib.auth.models import User
+        
+        self.assertEqual(self.client.get(reverse('district-list')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('district-list')).status_code, 429)
+        self.assertEqual(self.client.get(reverse('farm-list')).status_code, 200)
+        self.client.force_login(User.objects.create_user('worker', password='password'))
+        self.assertEqual(self.client.get(reverse('district-list')).status_code, 200)
+    
+    def test_more_than_one_process_requires_shared_cache(self):
+        """Test that run_worker and the deploy checks refuse the per-process memory cache"""
+        from django.core.checks import run_checks
+        from django.core.management import CommandError, call_command
+        
+        with self.assertRaisesMessage(CommandError, 'AKYL_JER_REDIS_URL'):
+            call_command('run_worker', once=True, stdout=io.StringIO())
+        self.assertIn('core.E001', [error.id for error in run_checks(include_deployment_checks=True)])
+        
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379'}}
+        with override_settings(CACHES=redis):
+            self.assertNotIn('core.E001', [error.id for error in run_checks(include_deployment_checks=True)])
+
+
+class LoadSheddingTest(APITestCase):
+    def setUp(self):
+        """Set up a district and simulate a slow database"""
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        self.farm = Farm.objects.create(district=district, farmer_name='Aibek', phone='+996 555 000 001', village='Tokmok')
+        db_latency.reset()
+        self.addCleanup(db_latency.reset)
+        for _ in range(50):
+            db_latency.observe(1000)
+    
+    def test_reads_are_shed_while_database_is_slow(self):
+        """Test that reads get 503 with Retry-After and writes and health checks still pass"""
+        response = self.client.get(reverse('district-list'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertEqual(self.client.get(reverse('health')).status_code, 200)
+        response = self.client.post(reverse('event-list'), {
+            'farm': self.farm.id, 'event_type': 'vet_visit', 'description': 'Checkup'
+        })
+        self.assertEqual(response.status_code, 201)
+    
+    def test_average_recovers_when_idle(self):
+        """Test that the latency average decays without new queries"""
+        with override_settings(LOAD_SHED_IDLE_HALF_LIFE_SECONDS=0.01):
+            threading.Event().wait(0.2)
+            self.assertEqual(self.client.get(reverse('district-list')).status_code, 200)
+    
+    def test_only_measured_samples_count(self):
+        """Test that queries outside measured requests are ignored and one slow query doesn't shed"""
+        db_latency.reset()
+        with connection.execute_wrapper(db_latency):
+            list(District.objects.all())
+        self.assertEqual(db_latency.value_ms(), 0)
+        
+        with db_latency.measure():
+            db_latency.observe_writer_wait(10000)
+        self.assertLessEqual(db_latency.value_ms(), 50)
+        self.assertEqual(self.client.get(reverse('district-list')).status_code, 200)
+
+
+class IdempotencyKeyTest(APITestCase):
+    def setUp(self):
+        """Set up a farm and a crop issue payload"""
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        farm = Farm.objects.create(district=district, farmer_name='Aibek', phone='+996 555 000 001', village='Tokmok')
+        self.payload = {
+            'farm': farm.id, 'crop_type': 'wheat', 'problem_type': 'pest', 'title': 'Aphids',
+            'description': 'Aphids on the lower leaves', 'severity': 'medium',
+        }
+    
+    def post(self, payload, key='3f1c9a'):
+        return self.client.post(reverse('cropissue-list'), payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+    
+    def test_retry_replays_stored_response(self):
+        """Test that a retried create returns the first response without writing again"""
+        first = self.post(self.payload)
+        self.assertEqual(first.status_code, 201)
+        with mock.patch('core.views.CropIssueViewSet.create') as create:
+            retry = self.post(self.payload)
+        create.assert_not_called()
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(CropIssue.objects.count(), 1)
+    
+    def test_requests_without_key_are_not_deduplicated(self):
+        """Test that creates without the header run every time"""
+        for _ in range(2):
+            self.client.post(reverse('cropissue-list'), self.payload, format='json')
+        self.assertEqual(CropIssue.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+    
+    def test_key_reused_for_other_body_or_in_flight(self):
+        """Test that a key reused with another body gets 422 and an unfinished one gets 409"""
+        self.post(self.payload)
+        self.assertEqual(self.post({**self.payload, 'title': 'Rust'}).status_code, 422)
+        
+        IdempotencyKey.objects.update(status_code=None)
+        response = self.post(self.payload)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+    
+    def test_sweep_deletes_expired_keys(self):
+        """Test that the sweep command deletes expired keys in batches and keeps live ones"""
+        from django.core.management import call_command
+        
+        for key in ['a', 'b', 'c']:
+            self.post({**self.payload, 'title': key}, key=key)
+        IdempotencyKey.objects.exclude(key='c').update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('sweep_idempotency_keys', batch_size=1, stdout=io.StringIO())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['c'])
+        
+        # An expired key no longer replays
+        self.assertEqual(self.post({**self.payload, 'title': 'a'}, key='a').status_code, 201)
+        self.assertEqual(CropIssue.objects.filter(title='a').count(), 2)
+    
+    def test_throttled_request_is_not_stored(self):
+        """Test that a 429 releases the key so the retry after the budget refills really runs"""
+        cache.clear()
+        with override_settings(THROTTLE_BUDGETS={'read': {'burst': 5, 'per_second': 1}, 'write': {'burst': 1, 'per_second': 0.1}}):
+            self.assertEqual(self.post({**self.payload, 'title': 'First'}, key='first').status_code, 201)
+            self.assertEqual(self.post(self.payload).status_code, 429)
+        self.assertFalse(IdempotencyKey.objects.filter(key='3f1c9a').exists())
+        cache.clear()
+        retry = self.post(self.payload)
+        self.assertEqual(retry.status_code, 201)
+        self.assertFalse(retry.has_header('Idempotent-Replayed'))
+        self.assertTrue(CropIssue.objects.filter(title='Aphids').exists())
+
+
+class VocabularyTest(APITestCase):
+    def setUp(self):
+        """Set up a farm; the vocabularies are seeded by migration"""
+        self.addCleanup(clear_vocabulary_cache)
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        self.farm = Farm.objects.create(district=district, farmer_name='Aibek', phone='+996 555 000 001', village='Tokmok')
+    
+    def crop_issue(self, crop_type):
+        return CropIssue.objects.create(
+            farm=self.farm, crop_type=crop_type, problem_type='pest', title='Aphids',
+            description='Aphids', severity='low',
+        )
+    
+    def outbreak(self, disease):
+        return Event.objects.create(farm=self.farm, event_type='disease_report', disease_suspected=disease, description='Sick')
+    
+    def test_terms_resolve_across_languages_and_scripts(self):
+        """Test that English, Kyrgyz, Russian and transliterated spellings resolve on save"""
+        wheat = Crop.objects.get(name='wheat')
+        for spelling in ['Wheat ', 'Пшеница', 'буудай', 'buudai', 'Winter-Wheat']:
+            self.assertEqual(self.crop_issue(spelling).crop_id, wheat.id, spelling)
+        self.assertIsNone(self.crop_issue('dragon fruit').crop_id)
+        self.assertEqual(self.outbreak('Бруцеллёз').disease.name, 'Brucellosis')
+    
+    def test_crop_filter_uses_indexed_equality(self):
+        """Test that ?crop_type= resolves known names to crop ids and keeps substring matching otherwise"""
+        wheat_ids = {self.crop_issue('wheat').id, self.crop_issue('пшеница').id}
+        self.crop_issue('barley')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cropissue-list'), {'crop_type': 'Пшеница'})
+        self.assertEqual({issue['id'] for issue in response.json()}, wheat_ids)
+        self.assertTrue(any('"crop_id" =' in query['sql'] for query in queries.captured_queries))
+        
+        response = self.client.get(reverse('cropissue-list'), {'crop_type': 'barl'})
+        self.assertEqual([issue['crop_type'] for issue in response.json()], ['barley'])
+    
+    def test_outbreaks_grouped_by_canonical_disease(self):
+        """Test that differently typed names of one disease are counted together"""
+        for disease in ['Brucellosis', 'brucellosis ', 'Бруцеллёз', 'Lumpy skin disease']:
+            self.outbreak(disease)
+        response = self.client.get(reverse('dashboard-summary'))
+        self.assertEqual(response.json()['outbreaks_by_disease'], [
+            {'disease_suspected': 'Brucellosis', 'count': 3},
+            {'disease_suspected': 'Lumpy skin disease', 'count': 1},
+        ])
+        response = self.client.get(reverse('event-list'), {'disease': 'бруцеллез'})
+        self.assertEqual(len(response.json()), 3)
+    
+    def test_relink_after_adding_synonym(self):
+        """Test that records typed before a synonym existed are linked by relink_records"""
+        issue = self.crop_issue('Bugday')
+        self.assertIsNone(issue.crop_id)
+        CropSynonym.objects.create(crop=Crop.objects.get(name='wheat'), term='Bugday')
+        self.assertEqual(relink_records('crop'), 1)
+        issue.refresh_from_db()
+        self.assertEqual(issue.crop.name, 'wheat')
+    
+    def test_synonym_added_by_another_process(self):
+        """Test that a synonym saved elsewhere resolves here once the shared generation moves"""
+        self.assertIsNone(self.crop_issue('Earth Apple').crop_id)
+        # Written by another process: no signal here, only its generation bump in the shared cache
+        CropSynonym.objects.bulk_create([CropSynonym(crop=Crop.objects.get(name='potatoes'), term='earth apple')])
+        self.assertIsNone(self.crop_issue('Earth Apple').crop_id)
+        bump_generation('vocabulary-crop')
+        self.assertEqual(self.crop_issue('Earth Apple').crop.name, 'potatoes')
+
+
+class DuplicateReportTest(APITestCase):
+    def setUp(self):
+        """Set up two farms in one district"""
+        district = District.objects.create(name='Chuy Region', code='CHU')
+        self.farm = Farm.objects.create(district=district, farmer_name='Aibek', phone='+996 555 000 001', village='Tokmok')
+        self.other_farm = Farm.objects.create(district=district, farmer_name='Nurlan', phone='+996 555 000 002', village='Kant')
+    
+    def crop_issue(self, title, description, farm=None, problem_type='pest'):
+        return CropIssue.objects.create(
+            farm=farm or self.farm, crop_type='wheat', problem_type=problem_type, title=title,
+            description=description, severity='medium',
+        )
+    
+    def test_near_duplicate_points_to_original(self):
+        """Test that a reworded repeat of a report on the same farm is marked as its duplicate"""
+        original = self.crop_issue('Aphids on wheat', 'Aphids all over the lower leaves of the wheat field near the canal')
+        repeat = self.crop_issue('Aphids on wheat!', 'aphids all over the lower leaves of the wheat field near the canal.')
+        third = self.crop_issue('Aphids on the wheat', 'Aphids all over the lower leaves of the wheat field near canal')
+        self.assertEqual(repeat.duplicate_of_id, original.id)
+        self.assertEqual(third.duplicate_of_id, original.id)
+        
+        unrelated = self.crop_issue('Rust', 'Orange pustules on barley leaves after the rain')
+        other_farm = self.crop_issue('Aphids on wheat', 'Aphids all over the lower leaves of the wheat field near the canal', farm=self.other_farm)
+        other_type = self.crop_issue('Aphids on wheat', 'Aphids all over the lower leaves of the wheat field near the canal', problem_type='disease')
+        self.assertEqual([unrelated.duplicate_of_id, other_farm.duplicate_of_id, other_type.duplicate_of_id], [None, None, None])
+    
+    def test_reports_outside_window_are_not_compared(self):
+        """Test that an identical report older than DUPLICATE_WINDOW_DAYS is not a duplicate"""
+        old = self.crop_issue('Locusts', 'A swarm of locusts is eating the young wheat')
+        ReportSignature.objects.filter(record_id=old.id).update(created_at=timezone.now() - timedelta(days=30))
+        self.assertIsNone(self.crop_issue('Locusts', 'A swarm of locusts is eating the young wheat').duplicate_of_id)
+    
+    def test_collapse_duplicates_and_open_outbreaks(self):
+        """Test that ?collapse_duplicates=1 and the open outbreak count leave duplicates out"""
+        description = 'Three cows have high fever and blisters in the mouth, not eating since yesterday'
+        original, repeat = [
+            Event.objects.create(farm=self.farm, event_type='disease_report', disease_suspected='Foot-and-mouth disease', description=description)
+            for _ in range(2)
+        ]
+        self.assertEqual(repeat.duplicate_of_id, original.id)
+        
+        response = self.client.get(reverse('event-list'), {'collapse_duplicates': '1'})
+        self.assertEqual([event['id'] for event in response.json()], [original.id])
+        response = self.client.get(reverse('event-list'))
+        self.assertEqual({event['duplicate_of'] for event in response.json()}, {None, original.id})
+        self.assertEqual(self.client.get(reverse('dashboard-summary')).json()['open_outbreaks'], 1)
+    
+    def test_duplicate_link_survives_archiving_original(self):
+        """Test that archiving a resolved original keeps its open duplicate collapsed"""
+        description = 'Two sheep are coughing and have a runny nose since the cold night'
+        original, repeat = [
+            Event.objects.create(farm=self.farm, event_type='disease_report', disease_suspected='Pneumonia', description=description)
+            for _ in range(2)
+        ]
+        Event.objects.filter(pk=original.id).update(status='resolved', created_at=timezone.now() - timedelta(days=400))
+        archive_resolved()
+        self.assertTrue(ArchivedEvent.objects.filter(pk=original.id, duplicate_of_id=None).exists())
+        repeat.refresh_from_db()
+        self.assertEqual(repeat.duplicate_of_id, original.id)
+        response = self.client.get(reverse('event-list'), {'collapse_duplicates': '1'})
+        self.assertEqual(response.json(), [])
+        self.assertEqual(self.client.get(reverse('dashboard-summary')).json()['open_outbreaks'], 0)
+    
+    def test_backfill_command(self):
+        """Test that index_report_duplicates signs unsigned recent reports and finds their duplicates"""
+        from django.core.management import call_command
+        
+        first = self.crop_issue('Weeds', 'Wild oats are spreading through the barley field')
+        second = self.crop_issue('Weeds', 'Wild oats are spreading through the barley field')
+        CropIssue.objects.update(duplicate_of=None)
+        ReportSignature.objects.all().delete()
+        
+        call_command('index_report_duplicates', stdout=io.StringIO())
+        second.refresh_from_db()
+        self.assertEqual(second.duplicate_of_id, first.id)
+        self.assertEqual(ReportSignature.objects.count(), 2)
+    
+    def test_maintenance_job_prunes_old_signatures(self):
+        """Test that the index_report_duplicates job drops signatures older than the window"""
+        old = self.crop_issue('Hail', 'Hail broke the sunflower stems')
+        self.crop_issue('Frost', 'Late frost burned the apple blossoms')
+        month_ago = timezone.now() - timedelta(days=30)
+        CropIssue.objects.filter(pk=old.id).update(created_at=month_ago)
+        ReportSignature.objects.filter(record_id=old.id).update(created_at=month_ago)
+        job = enqueue('index_report_duplicates')
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result['pruned']), ('succeeded', 1))
+        self.assertEqual(ReportSignature.objects.count(), 1)
+
+
+class FarmResolutionTest(APITestCase):
+    def setUp(self):
+        """Set up a farm registered twice, a relative sharing its phone and a namesake"""
+        self.district = District.objects.create(name='Chuy Region', code='CHU')
+        self.farm = Farm.objects.create(district=self.district, farmer_name='Aibek Usenov', phone='+996 555 123 456', village='Tokmok')
+        self.again = Farm.objects.create(
+            district=self.district, farmer_name='Aybek Usenov', phone='0555 123 456', village='Tokmak',
+            location_lat=42.84, location_lng=75.29,
+        )
+        self.relative = Farm.objects.create(district=self.district, farmer_name='Aigul Usenova', phone='+996 555 123 456', village='Tokmok')
+        self.namesake = Farm.objects.create(district=self.district, farmer_name='Aibek Usenov', phone='+996 700 999 888', village='Kant')
+    
+    def test_plan_matches_same_farm_only(self):
+        """Test that the plan merges the re-registration, keeps the relative and only reviews the namesake"""
+        plan = build_plan()
+        self.assertEqual([(merge['survivor'], merge['merged']) for merge in plan['merges']], [(self.farm.id, [self.again.id])])
+        reviewed = {tuple(item['farms']) for item in plan['review']}
+        self.assertIn((self.farm.id, self.namesake.id), reviewed)
+        self.assertNotIn(self.relative.id, {farm_id for pair in reviewed for farm_id in pair})
+        # Blocking compares farms sharing a key, not all six pairs
+        self.assertLess(plan['pairs_compared'], 6)
+    
+    def test_dry_run_changes_nothing(self):
+        """Test that resolve_farm_duplicates without --apply only reports the plan"""
+        from django.core.management import call_command
+        
+        output = io.StringIO()
+        call_command('resolve_farm_duplicates', stdout=output)
+        self.assertIn('Dry run', output.getvalue())
+        self.assertEqual(Farm.objects.count(), 4)
+    
+    def test_apply_repoints_records(self):
+        """Test that applying the plan moves herds, events and crop issues to the surviving farm"""
+        Herd.objects.create(farm=self.farm, animal_type='sheep', headcount=40)
+        Herd.objects.create(farm=self.again, animal_type='sheep', headcount=45)
+        Herd.objects.create(farm=self.again, animal_type='cattle', headcount=3)
+        event = Event.objects.create(farm=self.again, event_type='vaccination', description='Sheep vaccinated')
+        crop_issue = CropIssue.objects.create(
+            farm=self.again, crop_type='wheat', problem_type='pest', title='Aphids', description='Aphids on wheat', severity='low',
+        )
+        
+        plan = resolve_farms(apply=True)
+        self.assertEqual(plan['records_moved'], 2)
+        self.assertFalse(Farm.objects.filter(pk=self.again.pk).exists())
+        self.assertEqual(
+            sorted(self.farm.herds.values_list('animal_type', 'headcount')), [('cattle', 3), ('sheep', 45)]
+        )
+        event.refresh_from_db()
+        crop_issue.refresh_from_db()
+        self.assertEqual((event.farm_id, crop_issue.farm_id), (self.farm.id, self.farm.id))
+        self.farm.refresh_from_db()
+        self.assertEqual((self.farm.location_lat, self.farm.location_lng), (42.84, 75.29))
+        self.assertIsNotNone(self.farm.last_vaccinated_at)
+
+
+class FacetCountsTest(APITestCase):
+    def setUp(self):
+        """Set up events in two districts"""
+        chuy = District.objects.create(name='Chuy Region', code='CHU')
+        osh = District.objects.create(name='Osh Region', code='OSH')
+        self.chuy_farm = Farm.objects.create(district=chuy, farmer_name='Aibek', phone='+996 555 000 001', village='Tokmok')
+        self.osh_farm = Farm.objects.create(district=osh, farmer_name='Nurlan', phone='+996 555 000 002', village='Uzgen')
+        for farm, event_type, status_value in [
+            (self.chuy_farm, 'vaccination', 'new'),
+            (self.chuy_farm, 'vet_visit', 'resolved'),
+            (self.chuy_farm, 'vaccination', 'in_progress'),
+            (self.osh_farm, 'vaccination', 'new'),
+        ]:
+            Event.objects.create(farm=farm, event_type=event_type, status=status_value, description=f'{event_type} {status_value}')
+    
+    def test_facets_exclude_own_filter(self):
+        """Test that each facet counts under the other filters but not its own"""
+        response = self.client.get(reverse('event-list'), {
+            'facets': 'status,event_type,district', 'district': 'CHU', 'status': 'new',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        facets = response.data['facets']
+        self.assertEqual(facets['status'], {'new': 1, 'in_progress': 1, 'resolved': 1})
+        self.assertEqual(facets['event_type']['vaccination'], 1)
+        self.assertEqual(facets['event_type']['vet_visit'], 0)
+        self.assertEqual(facets['district'], {'CHU': 1, 'OSH': 1})
+    
+    def test_facets_single_query(self):
+        """Test that all facet counts come from one aggregate query"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('cropissue-list'), {'facets': 'status,severity,problem_type,district'})
+        self.assertEqual(sum('COUNT' in query['sql'] for query in queries.captured_queries), 1)
+    
+    def test_unknown_facet_and_plain_list(self):
+        """Test that unknown facets are rejected and lists without ?facets stay plain arrays"""
+        response = self.client.get(reverse('event-list'), {'facets': 'severity'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+        self.assertIsInstance(self.client.get(reverse('event-list')).json(), list)
+        
+        response = self.client.get(reverse('event-list'), {'facets': 'status', 'district': 'NOPE'})
+        self.assertEqual(response.json()['facets']['status'], {'new': 0, 'in_progress': 0, 'resolved': 0})
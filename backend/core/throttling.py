@@ -0,0 +1,139 @@
+"""
+Request throttling and database latency tracking
+
+``TokenBucketThrottle`` gives every client (user, or IP when anonymous) one
+token bucket per endpoint, with separate budgets for reads and writes, held
+in the default cache, which must be Redis or memcached whenever more than
+one process runs (see CACHES); with a per-process cache every worker would
+hand each client its own full budget. Buckets refill continuously, so a
+client can burst up to its budget and then proceeds at the refill rate.
+
+``db_latency`` keeps an exponentially weighted moving average of how long
+requests wait on the database: the time of each query, and with the
+sqlite_wal backend the time spent queueing for the writer lock. It is an
+execute wrapper and writer-wait observer installed on every connection (see
+signals), and only samples inside ``db_latency.measure()``, which
+core.middleware.LoadSheddingMiddleware enters for the requests it may shed,
+so admin pages, precompute threads and jobs don't move it. The middleware
+sheds reads while the average is high.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per client, endpoint and budget ('read' or 'write')
+
+    Budgets come from THROTTLE_BUDGETS as {"burst": tokens, "per_second":
+    refill rate}. Concurrent requests from one client can race on the stored
+    bucket and let a request or two extra through, like DRF's own throttles.
+    """
+
+    def get_scope(self, request):
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def get_cache_key(self, request, scope):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        match = request.resolver_match
+        endpoint = match.url_name if match and match.url_name else request.path
+        return f'throttle:{scope}:{endpoint}:{ident}'
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request)
+        budget = settings.THROTTLE_BUDGETS.get(scope)
+        if not budget:
+            return True
+        burst, per_second = budget['burst'], budget['per_second']
+        key = self.get_cache_key(request, scope)
+        now = time.time()
+        tokens, updated = cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * per_second)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+            self.wait_seconds = None
+        else:
+            self.wait_seconds = (1 - tokens) / per_second
+        # A bucket untouched until it would be full again is the same as no bucket
+        cache.set(key, (tokens, now), math.ceil(burst / per_second) + 1)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class LatencyEWMA:
+    """
+    Moving average of database wait time, shared by all threads of a process
+
+    Each sample moves the average LOAD_SHED_EWMA_ALPHA of the way to its own
+    duration, capped at twice LOAD_SHED_LATENCY_MS so one slow query can't
+    push the average over the threshold; only a run of slow samples does.
+    With no samples (e.g. while reads are being shed) the average halves
+    every LOAD_SHED_IDLE_HALF_LIFE_SECONDS, so shedding stops by itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._measuring = ContextVar('db_latency_measuring', default=False)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._value_ms = 0.0
+            self._updated = time.monotonic()
+
+    @contextmanager
+    def measure(self):
+        """Sample the queries and writer waits of the enclosed code (e.g. one request)"""
+        token = self._measuring.set(True)
+        try:
+            yield
+        finally:
+            self._measuring.reset(token)
+
+    def _decayed(self, now):
+        idle = now - self._updated
+        return self._value_ms * 0.5 ** (idle / settings.LOAD_SHED_IDLE_HALF_LIFE_SECONDS)
+
+    def observe(self, duration_ms):
+        alpha = settings.LOAD_SHED_EWMA_ALPHA
+        if settings.LOAD_SHED_LATENCY_MS:
+            duration_ms = min(duration_ms, 2 * settings.LOAD_SHED_LATENCY_MS)
+        now = time.monotonic()
+        with self._lock:
+            self._value_ms = alpha * duration_ms + (1 - alpha) * self._decayed(now)
+            self._updated = now
+
+    def value_ms(self):
+        with self._lock:
+            return self._decayed(time.monotonic())
+
+    def observe_writer_wait(self, wait_ms):
+        """Writer-wait observer for the sqlite_wal backend"""
+        if self._measuring.get():
+            self.observe(wait_ms)
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self._measuring.get():
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.observe((time.perf_counter() - started) * 1000)
+
+
+db_latency = LatencyEWMA()
@@ -0,0 +1,91 @@
+"""
+Farm timeline: events and crop issues merged newest first
+
+Each source is an indexed (farm, created_at, id) range scan that reads at
+most one page, and the sources are k-way merged with heapq. Pages are
+addressed by an opaque keyset cursor holding the sort key of the last row
+returned, so deep pages cost the same as the first one.
+
+Rows are ordered by (created_at, kind, id), all descending; kind breaks ties
+between an event and a crop issue created at the same instant.
+"""
+import base64
+import heapq
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .filters import InvalidFilter
+from .models import ArchivedCropIssue, ArchivedEvent, CropIssue, Event
+from .serializers import CropIssueSerializer, EventSerializer
+
+
+# kind -> (rank in the sort key, hot model, archive model, serializer)
+SOURCES = {
+    'event': (1, Event, ArchivedEvent, EventSerializer),
+    'crop_issue': (0, CropIssue, ArchivedCropIssue, CropIssueSerializer),
+}
+
+
+def encode_cursor(created_at, kind, record_id):
+    raw = json.dumps([created_at.isoformat(), kind, record_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, kind, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = parse_datetime(created_at)
+        if created_at is None or kind not in SOURCES or not isinstance(record_id, int):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise InvalidFilter("Invalid cursor")
+    return created_at, kind, record_id
+
+
+def _after_cursor(rank, cursor):
+    """Rows of a source with this rank that sort after the cursor"""
+    created_at, kind, record_id = cursor
+    cursor_rank = SOURCES[kind][0]
+    if rank < cursor_rank:
+        return Q(created_at__lte=created_at)
+    if rank > cursor_rank:
+        return Q(created_at__lt=created_at)
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=record_id)
+
+
+def _stream(kind, rank, rows):
+    for record in rows:
+        yield (record.created_at, rank, record.id), kind, record
+
+
+def farm_timeline(farm, limit, cursor=None, include_archived=False):
+    """Return one page of the farm's timeline and the cursor of the next page (or None)"""
+    cursor = decode_cursor(cursor) if cursor else None
+    streams = []
+    for kind, (rank, model, archive_model, _) in SOURCES.items():
+        for source in (model, archive_model) if include_archived else (model,):
+            queryset = source.objects.filter(farm=farm)
+            if cursor:
+                queryset = queryset.filter(_after_cursor(rank, cursor))
+            rows = queryset.select_related('farm__district').order_by('-created_at', '-id')[:limit + 1]
+            streams.append(_stream(kind, rank, rows))
+
+    page = []
+    for item in heapq.merge(*streams, key=lambda item: item[0], reverse=True):
+        page.append(item)
+        if len(page) > limit:
+            break
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    results = [
+        {'type': kind, **SOURCES[kind][3](record).data}
+        for _, kind, record in page
+    ]
+    next_cursor = None
+    if has_more:
+        (created_at, _, record_id), kind, _ = page[-1]
+        next_cursor = encode_cursor(created_at, kind, record_id)
+    return {'results': results, 'next_cursor': next_cursor}
@@ -1,9 +1,29 @@
-from rest_framework.decorators import api_view
+import heapq
+import json
+
+from rest_framework.decorators import action, api_view
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from rest_framework import viewsets, filters, status
-from django.db.models import Q, Count, Sum
-from .models import District, Farm, Herd, Event, CropIssue
-from .serializers import DistrictSerializer, FarmSerializer, HerdSerializer, EventSerializer, CropIssueSerializer
+from rest_framework import mixins, viewsets, filters, status
+from django.conf import settings
+from django.db.models import Q
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+from .caching import cached
+from .coverage import coverage_report
+from .dashboard import abuild_summary, cached_bundle, cached_summary
+from .facets import facet_counts, parse_facets
+from .filters import apply_filters, parse_ids, record_filters
+from .imports import RegistryImportError, read_rows
+from .jobs import enqueue
+from .models import District, Farm, Herd, Event, CropIssue, ArchivedEvent, ArchivedCropIssue, Job
+from .outbreaks import population_at_risk
+from .pubsub import get_broker
+from .timeline import farm_timeline
+from .stats import CROP_ISSUE_DIMENSIONS, CROP_ISSUE_METRICS, InvalidQuery, crop_issue_rollup, parse_list
+from .serializers import DistrictSerializer, FarmSerializer, HerdSerializer, EventSerializer, CropIssueSerializer, JobSerializer
 
 
 @api_view(['GET'])
@@ -25,6 +45,10 @@ def api_root(request):
             "farms": "/api/farms/",
             "events": "/api/events/",
             "dashboard": "/api/dashboard/summary/",
+            "dashboard_bundle": "/api/dashboard/bundle/",
+            "crop_issue_stats": "/api/stats/crop-issues/",
+            "vaccination_coverage": "/api/stats/vaccination-coverage/",
+            "live_updates": "/api/stream/",
             "admin": "/admin/"
         }
     })
@@ -33,84 +57,133 @@ def api_root(request):
 @api_view(['GET'])
 def dashboard_summary(request):
     """
-    Dashboard summary statistics
+    Dashboard summary statistics (served from the precomputed cache when warm)
     
     Query Parameters:
     - district: Filter by district code (optional)
     """
-    district_code = request.query_params.get('district', None)
-    
-    # Base querysets
-    farms_qs = Farm.objects.all()
-    herds_qs = Herd.objects.all()
-    events_qs = Event.objects.all()
-    
-    # Apply district filter if provided
-    if district_code:
-        farms_qs = farms_qs.filter(district__code=district_code)
-        herds_qs = herds_qs.filter(farm__district__code=district_code)
-        events_qs = events_qs.filter(farm__district__code=district_code)
-    
-    # Total farms
-    total_farms = farms_qs.count()
-    
-    # Total animals (sum of all herd headcounts)
-    total_animals = herds_qs.aggregate(total=Sum('headcount'))['total'] or 0
+    district_code = request.query_params.get('district') or None
+    return Response(cached_summary(district_code))
+
+
+@api_view(['GET'])
+def dashboard_bundle(request):
+    """
+    Everything the dashboard page needs in one response: the summary, the
+    district list, and the latest open outbreaks and high-severity crop issues
     
-    # Open outbreaks (disease_report or mortality with status new/in_progress)
-    open_outbreaks = events_qs.filter(
-        event_type__in=['disease_report', 'mortality'],
-        status__in=['new', 'in_progress']
-    ).count()
+    Query Parameters:
+    - district: Filter by district code (optional)
+    - limit: Number of recent outbreaks/crop issues (default DASHBOARD_BUNDLE_LIMIT)
+    """
+    district_code = request.query_params.get('district') or None
+    try:
+        limit = int(request.query_params.get('limit', settings.DASHBOARD_BUNDLE_LIMIT))
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= settings.DASHBOARD_BUNDLE_MAX_LIMIT:
+        return Response(
+            {"error": f"limit must be an integer between 1 and {settings.DASHBOARD_BUNDLE_MAX_LIMIT}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(cached_bundle(district_code, limit))
+
+
+@require_GET
+async def dashboard_summary_async(request):
+    """
+    Dashboard summary statistics with the aggregates run concurrently
     
-    # Farms by district
-    if district_code:
-        # If filtering by district, only show that district
-        farms_by_district = farms_qs.values(
-            'district__code', 'district__name'
-        ).annotate(
-            farm_count=Count('id')
-        ).order_by('district__name')
-    else:
-        # Show all districts
-        farms_by_district = Farm.objects.values(
-            'district__code', 'district__name'
-        ).annotate(
-            farm_count=Count('id')
-        ).order_by('district__name')
+    Same response shape as dashboard_summary; serve through the ASGI app.
     
-    farms_by_district_list = [
-        {
-            'district_code': item['district__code'],
-            'district_name': item['district__name'],
-            'farm_count': item['farm_count']
-        }
-        for item in farms_by_district
-    ]
+    Query Parameters:
+    - district: Filter by district code (optional)
+    """
+    district_code = request.GET.get('district') or None
+    return JsonResponse(await abuild_summary(district_code))
+
+
+@api_view(['GET'])
+def crop_issue_stats(request):
+    """
+    Crop issue aggregates with subtotals for each grouping level (rollup)
     
-    # Outbreaks by disease (for disease_report/mortality where disease_suspected is not null)
-    outbreaks_by_disease = events_qs.filter(
-        event_type__in=['disease_report', 'mortality'],
-        disease_suspected__isnull=False
-    ).values('disease_suspected').annotate(
-        count=Count('id')
-    ).order_by('-count')
+    Query Parameters:
+    - group_by: Comma-separated dimensions (district, crop_type, problem_type, severity, status, reported_via)
+    - metrics: Comma-separated metrics (count, area_sum, area_avg); default count
+    - any dimension name: Only include crop issues with that value (e.g. ?status=new)
+    """
+    try:
+        group_by = parse_list(request.query_params.get('group_by'), CROP_ISSUE_DIMENSIONS, 'dimension')
+        metrics = parse_list(request.query_params.get('metrics', 'count'), CROP_ISSUE_METRICS, 'metric') or ['count']
+    except InvalidQuery as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
     
-    outbreaks_by_disease_list = [
-        {
-            'disease_suspected': item['disease_suspected'],
-            'count': item['count']
-        }
-        for item in outbreaks_by_disease
-    ]
+    selected = {
+        dimension: request.query_params[dimension]
+        for dimension in CROP_ISSUE_DIMENSIONS
+        if request.query_params.get(dimension)
+    }
+    payload = cached(
+        'crop-issue-stats',
+        (group_by, metrics, selected),
+        lambda: crop_issue_rollup(group_by, metrics, selected),
+        settings.STATS_CACHE_SECONDS,
+    )
+    return Response(payload)
+
+
+@api_view(['GET'])
+def vaccination_coverage(request):
+    """
+    Share of herds and animals vaccinated within the coverage window, per
+    district and animal type (refreshed by manage.py refresh_vaccination_coverage)
     
-    return Response({
-        'total_farms': total_farms,
-        'total_animals': total_animals,
-        'open_outbreaks': open_outbreaks,
-        'farms_by_district': farms_by_district_list,
-        'outbreaks_by_disease': outbreaks_by_disease_list
-    })
+    Query Parameters:
+    - district: Filter by district code (optional)
+    - animal_type: Filter by animal type (optional)
+    """
+    animal_type = request.query_params.get('animal_type') or None
+    if animal_type and animal_type not in dict(Herd.ANIMAL_TYPES):
+        return Response(
+            {"error": f"Unknown animal_type: {animal_type}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(coverage_report(request.query_params.get('district') or None, animal_type))
+
+
+@require_GET
+async def live_updates(request):
+    """
+    Server-Sent Events stream of Event and CropIssue create/update notifications
+
+    Must be served through the ASGI application so each open connection is
+    an idle coroutine instead of a blocked worker.
+
+    Query Parameters:
+    - district: Only push changes for this district code (optional)
+    """
+    district_code = request.GET.get('district') or None
+    heartbeat = getattr(settings, 'LIVE_UPDATES_HEARTBEAT_SECONDS', 15)
+    subscription = get_broker().subscribe(district_code)
+
+    async def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                message = await subscription.get(timeout=heartbeat)
+                if message is None:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 class DistrictViewSet(viewsets.ReadOnlyModelViewSet):
@@ -121,24 +194,65 @@ class DistrictViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = DistrictSerializer
 
 
-class FarmViewSet(viewsets.ReadOnlyModelViewSet):
+class BatchIdsMixin:
+    """
+    Fetch several records in one request with ?ids=1,2,3
+
+    All ids are loaded with one query (plus the viewset's prefetches) and
+    returned in the requested order. Ids that don't exist or don't match the
+    other filters are listed in the X-Missing-Ids response header.
+    """
+    
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('ids'):
+            return super().list(request, *args, **kwargs)
+        
+        ids = parse_ids(request.query_params['ids'], settings.BATCH_IDS_MAX)
+        found = {record.pk: record for record in self.filter_queryset(self.get_queryset()).filter(pk__in=ids)}
+        if (
+            getattr(self, 'archive_queryset', None) is not None
+            and request.query_params.get('include_archived') in ('1', 'true')
+            and len(found) < len(ids)
+        ):
+            remaining = [pk for pk in ids if pk not in found]
+            found.update(
+                (record.pk, record)
+                for record in self.filter_records(self.archive_queryset.all()).filter(pk__in=remaining)
+            )
+        
+        serializer = self.get_serializer([found[pk] for pk in ids if pk in found], many=True)
+        response = Response(serializer.data)
+        missing = [str(pk) for pk in ids if pk not in found]
+        if missing:
+            response['X-Missing-Ids'] = ','.join(missing)
+        return response
+
+
+class FarmViewSet(BatchIdsMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for listing and retrieving farms with filtering support
     
     Query Parameters:
-    - district: Filter by district code
+    - district: Filter by district code (comma-separated for several)
+    - created_after / created_before: ISO date or datetime bounds on created_at
     - search: Search in farmer_name or phone (case-insensitive)
+    - ordering: Sort by risk_score, created_at or farmer_name (prefix with - for descending)
+    - ids: Comma-separated farm ids to fetch in one request (missing ids in X-Missing-Ids)
+    
+    GET /api/farms/{id}/timeline/ - The farm's events and crop issues, newest first
+    POST /api/farms/import/ - Queue an upsert of farms and herds from a registry CSV/XLSX upload (staff only)
     """
     queryset = Farm.objects.select_related('district').prefetch_related('herds').all()
     serializer_class = FarmSerializer
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['risk_score', 'created_at', 'farmer_name']
+    filter_params = ['district', 'created_after', 'created_before']
     
     def get_queryset(self):
         queryset = super().get_queryset()
         
-        # Filter by district code
-        district_code = self.request.query_params.get('district', None)
-        if district_code:
-            queryset = queryset.filter(district__code=district_code)
+        # District, date range filters
+        queryset = apply_filters(queryset, record_filters(self.request.query_params, self.filter_params))
         
         # Search in farmer_name or phone
         search = self.request.query_params.get('search', None)
@@ -148,41 +262,143 @@ class FarmViewSet(viewsets.ReadOnlyModelViewSet):
             )
         
         return queryset
+    
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """
+        Events and crop issues of this farm merged newest first, one page at a time
+        
+        Query Parameters:
+        - limit: Page size (default TIMELINE_PAGE_SIZE)
+        - cursor: next_cursor from the previous page
+        - include_archived: Set to 1 to include archived records
+        """
+        try:
+            limit = int(request.query_params.get('limit', settings.TIMELINE_PAGE_SIZE))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= settings.TIMELINE_MAX_PAGE_SIZE:
+            return Response(
+                {"error": f"limit must be an integer between 1 and {settings.TIMELINE_MAX_PAGE_SIZE}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        farm = get_object_or_404(self.get_queryset().prefetch_related(None), pk=pk)
+        return Response(farm_timeline(
+            farm,
+            limit,
+            cursor=request.query_params.get('cursor') or None,
+            include_archived=request.query_params.get('include_archived') in ('1', 'true'),
+        ))
+    
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        parser_classes=[MultiPartParser],
+        permission_classes=[IsAdminUser],
+    )
+    def import_registry(self, request):
+        """
+        Queue an import of an uploaded registry file (multipart field "file")
+        
+        Returns the queued job; follow its progress at /api/jobs/{id}/.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {"error": "Upload a .csv or .xlsx file in the 'file' field"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            read_rows(upload, upload.name)  # reject unsupported file types up front
+        except RegistryImportError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        upload.seek(0)
+        job = enqueue('import_farms', priority=10, input_file=upload)
+        return Response(JobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
 
 
-class EventViewSet(viewsets.ModelViewSet):
+class IncludeArchivedMixin:
+    """
+    Merge archived records into list responses when ?include_archived=1
+    
+    Hot and archived rows are fetched with the same filters and merged by
+    created_at (newest first), so the default listing only touches hot data.
+    """
+    archive_queryset = None
+    filter_params = []
+    
+    def get_queryset(self):
+        return self.filter_records(super().get_queryset())
+    
+    def filter_records(self, queryset):
+        """Apply the query parameter filters to hot or archived records"""
+        return apply_filters(queryset, record_filters(self.request.query_params, self.filter_params))
+    
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('include_archived') not in ('1', 'true'):
+            return super().list(request, *args, **kwargs)
+        
+        hot = self.filter_queryset(self.get_queryset()).order_by('-created_at')
+        archived = self.filter_records(self.archive_queryset.all()).order_by('-created_at')
+        records = heapq.merge(hot, archived, key=lambda record: record.created_at, reverse=True)
+        serializer = self.get_serializer(list(records), many=True)
+        return Response(serializer.data)
+
+
+class FacetsMixin:
+    """
+    Add value counts to list responses with ?facets=status,district
+
+    The response becomes {"results": [...], "facets": {facet: {value: count}}},
+    each facet counted under the other filters (see core.facets). Archived
+    records are counted too when ?include_archived=1.
+    """
+    facet_params = []
+    
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('facets'):
+            return super().list(request, *args, **kwargs)
+        
+        names = parse_facets(request.query_params['facets'], self.facet_params)
+        response = super().list(request, *args, **kwargs)
+        querysets = [self.queryset.model.objects.all()]
+        if request.query_params.get('include_archived') in ('1', 'true'):
+            querysets.append(self.archive_queryset.model.objects.all())
+        facets = {name: {} for name in names}
+        for queryset in querysets:
+            for name, counts in facet_counts(queryset, request.query_params, self.filter_params, names).items():
+                for value, count in counts.items():
+                    facets[name][value] = facets[name].get(value, 0) + count
+        response.data = {'results': response.data, 'facets': facets}
+        return response
+
+
+class EventViewSet(FacetsMixin, BatchIdsMixin, IncludeArchivedMixin, viewsets.ModelViewSet):
     """
     ViewSet for listing, retrieving, and updating events
     
     Query Parameters:
     - district: Filter by district code
-    - event_type: Filter by event type (disease_outbreak, vaccination, inspection, quarantine)
-    - status: Filter by status (reported, investigating, contained, resolved)
+    - event_type: Filter by event type (vet_visit, vaccination, disease_report, mortality)
+    - status: Filter by status (new, in_progress, resolved)
+    - disease: Filter by suspected disease, in any language or spelling the vocabulary knows
+    - created_after / created_before: ISO date or datetime bounds on created_at
+    - include_archived: Set to 1 to merge archived resolved events into the list
+    - collapse_duplicates: Set to 1 to leave out near-duplicates of earlier reports (see duplicate_of)
+    - ids: Comma-separated event ids to fetch in one request (missing ids in X-Missing-Ids)
+    - facets: Comma-separated district, event_type, status to count per value (response becomes {results, facets})
+    
+    district, event_type and status accept comma-separated values (?status=new,in_progress).
     
     PATCH /api/events/{id}/ - Update only the status field
+    GET /api/events/{id}/at-risk/?radius_km= - Susceptible animals on nearby farms
     """
     queryset = Event.objects.select_related('farm__district').all()
+    archive_queryset = ArchivedEvent.objects.select_related('farm__district').all()
     serializer_class = EventSerializer
-    
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        # Filter by district code
-        district_code = self.request.query_params.get('district', None)
-        if district_code:
-            queryset = queryset.filter(farm__district__code=district_code)
-        
-        # Filter by event_type
-        event_type = self.request.query_params.get('event_type', None)
-        if event_type:
-            queryset = queryset.filter(event_type=event_type)
-        
-        # Filter by status
-        status_filter = self.request.query_params.get('status', None)
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        return queryset
+    filter_params = ['district', 'event_type', 'status', 'disease', 'created_after', 'created_before', 'collapse_duplicates']
+    facet_params = ['district', 'event_type', 'status']
     
     def partial_update(self, request, *args, **kwargs):
         """
@@ -196,53 +412,62 @@ class EventViewSet(viewsets.ModelViewSet):
             )
         
         return super().partial_update(request, *args, **kwargs)
+    
+    @action(detail=True, methods=['get'], url_path='at-risk')
+    def at_risk(self, request, pk=None):
+        """
+        Population at risk: susceptible headcounts on farms within radius_km
+        of this event's farm (default 10 km)
+        """
+        try:
+            radius_km = float(request.query_params.get('radius_km', 10))
+        except ValueError:
+            radius_km = -1
+        if not 0 < radius_km <= settings.AT_RISK_MAX_RADIUS_KM:
+            return Response(
+                {"error": f"radius_km must be a number between 0 and {settings.AT_RISK_MAX_RADIUS_KM}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        result = population_at_risk(self.get_object(), radius_km)
+        if result is None:
+            return Response(
+                {"error": "The event's farm has no coordinates"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(result)
 
 
-class CropIssueViewSet(viewsets.ModelViewSet):
+class CropIssueViewSet(FacetsMixin, BatchIdsMixin, IncludeArchivedMixin, viewsets.ModelViewSet):
     """
     ViewSet for listing, retrieving, creating, and updating crop issues
     
     Query Parameters:
     - district: Filter by district code
-    - crop_type: Filter by crop type
+    - crop_type: Filter by crop, in any language or spelling the vocabulary knows
+      (names it doesn't know match as a case-insensitive substring)
     - problem_type: Filter by problem type (pest, disease, nutrient_deficiency, water_stress, weed, other)
     - severity: Filter by severity (low, medium, high)
     - status: Filter by status (new, in_progress, resolved)
+    - created_after / created_before: ISO date or datetime bounds on created_at
+    - include_archived: Set to 1 to merge archived resolved crop issues into the list
+    - collapse_duplicates: Set to 1 to leave out near-duplicates of earlier reports (see duplicate_of)
+    - ids: Comma-separated crop issue ids to fetch in one request (missing ids in X-Missing-Ids)
+    - facets: Comma-separated district, problem_type, severity, status to count per value
+      (response becomes {results, facets})
+    
+    All filters except the date bounds accept comma-separated values (?severity=medium,high).
     
     PATCH /api/crop-issues/{id}/ - Update only the status field
     """
     queryset = CropIssue.objects.select_related('farm__district').all()
+    archive_queryset = ArchivedCropIssue.objects.select_related('farm__district').all()
     serializer_class = CropIssueSerializer
-    
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        # Filter by district code
-        district_code = self.request.query_params.get('district', None)
-        if district_code:
-            queryset = queryset.filter(farm__district__code=district_code)
-        
-        # Filter by crop_type
-        crop_type = self.request.query_params.get('crop_type', None)
-        if crop_type:
-            queryset = queryset.filter(crop_type__icontains=crop_type)
-        
-        # Filter by problem_type
-        problem_type = self.request.query_params.get('problem_type', None)
-        if problem_type:
-            queryset = queryset.filter(problem_type=problem_type)
-        
-        # Filter by severity
-        severity = self.request.query_params.get('severity', None)
-        if severity:
-            queryset = queryset.filter(severity=severity)
-        
-        # Filter by status
-        status_filter = self.request.query_params.get('status', None)
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        return queryset
+    filter_params = [
+        'district', 'crop_type', 'problem_type', 'severity', 'status', 'created_after', 'created_before',
+        'collapse_duplicates',
+    ]
+    facet_params = ['district', 'problem_type', 'severity', 'status']
     
     def partial_update(self, request, *args, **kwargs):
         """
@@ -256,3 +481,38 @@ class CropIssueViewSet(viewsets.ModelViewSet):
             )
         
         return super().partial_update(request, *args, **kwargs)
+
+
+class JobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Background jobs run by manage.py run_worker (staff only)
+    
+    POST /api/jobs/ - Queue a job: {"kind": ..., "params": {...}, "priority": 0}
+    GET /api/jobs/{id}/ - Status, progress and result
+    GET /api/jobs/{id}/result/ - Download the job's result file
+    
+    Query Parameters:
+    - status: Filter by status (queued, running, succeeded, failed)
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsAdminUser]
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        status_filter = self.request.query_params.get('status', None)
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        return queryset
+    
+    @action(detail=True, methods=['get'])
+    def result(self, request, pk=None):
+        """Download the job's result file"""
+        job = self.get_object()
+        if not job.result_file:
+            raise Http404("This job has no result file")
+        return FileResponse(
+            job.result_file.open('rb'),
+            as_attachment=True,
+            filename=job.result_file.name.rsplit('/', 1)[-1],
+        )
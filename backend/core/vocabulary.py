@@ -0,0 +1,140 @@
+"""
+Controlled vocabularies for crop types and suspected diseases
+
+CropIssue.crop_type and Event.disease_suspected stay free text as typed, and
+are resolved on save to the Crop / Disease they name (see signals). A term
+matches a canonical entry when its normalized form (core.normalize) equals
+the entry's English, Kyrgyz or Russian name or one of its synonyms, or when
+their Latin transliterations are equal, so 'Бруцеллёз', 'brutsellez' and
+'brucellosis ' all resolve to Brucellosis.
+
+Vocabularies are small, so each is loaded whole into an in-process map.
+Saving or deleting an entry or synonym bumps the vocabulary's generation in
+the shared cache (see signals and core.caching); every process compares its
+map's generation with the shared one on use and reloads when it is behind,
+so all workers resolve the same terms. Records saved before a synonym was
+added are re-linked by manage.py relink_vocabulary.
+"""
+import threading
+
+from .caching import bump_generation, get_generation
+from .models import ArchivedCropIssue, ArchivedEvent, Crop, CropIssue, CropSynonym, Disease, DiseaseSynonym, Event
+from .normalize import normalize_term, transliterate
+
+
+# Vocabulary name -> (entry model, synonym model, synonym FK field)
+VOCABULARIES = {
+    'crop': (Crop, CropSynonym, 'crop_id'),
+    'disease': (Disease, DiseaseSynonym, 'disease_id'),
+}
+
+# Vocabulary name -> records whose free text resolves to it, as (model, text field)
+RECORDS = {
+    'crop': [(CropIssue, 'crop_type'), (ArchivedCropIssue, 'crop_type')],
+    'disease': [(Event, 'disease_suspected'), (ArchivedEvent, 'disease_suspected')],
+}
+
+_lock = threading.Lock()
+# Vocabulary name -> (generation, ids by term, names by id)
+_maps = {}
+
+
+def _generation_namespace(vocabulary):
+    return f'vocabulary-{vocabulary}'
+
+
+def _load(vocabulary, generation):
+    entry_model, synonym_model, entry_field = VOCABULARIES[vocabulary]
+    ids_by_term = {}
+    names_by_id = {}
+    spellings = []
+    for entry_id, name, name_ky, name_ru in entry_model.objects.values_list('id', 'name', 'name_ky', 'name_ru'):
+        names_by_id[entry_id] = name
+        spellings += [(name, entry_id), (name_ky, entry_id), (name_ru, entry_id)]
+    spellings += synonym_model.objects.values_list('term', entry_field)
+    for spelling, entry_id in spellings:
+        term = normalize_term(spelling)
+        if term:
+            ids_by_term.setdefault(term, entry_id)
+            ids_by_term.setdefault(transliterate(term), entry_id)
+    maps = (generation, ids_by_term, names_by_id)
+    with _lock:
+        _maps[vocabulary] = maps
+    return maps
+
+
+def _current(vocabulary):
+    """(ids by term, names by id) of ``vocabulary``, reloaded if another process changed it"""
+    # Read before loading, so a change during the load triggers another reload
+    generation = get_generation(_generation_namespace(vocabulary))
+    maps = _maps.get(vocabulary)
+    if maps is None or maps[0] != generation:
+        maps = _load(vocabulary, generation)
+    return maps[1], maps[2]
+
+
+def clear_vocabulary_cache(vocabulary=None):
+    """Drop this process's maps of ``vocabulary`` (default all)"""
+    with _lock:
+        for name in [vocabulary] if vocabulary else list(VOCABULARIES):
+            _maps.pop(name, None)
+
+
+def invalidate_vocabulary(vocabulary=None):
+    """Make every process reload ``vocabulary`` (default all) on next use"""
+    for name in [vocabulary] if vocabulary else list(VOCABULARIES):
+        bump_generation(_generation_namespace(name))
+    clear_vocabulary_cache(vocabulary)
+
+
+def resolve(vocabulary, text):
+    """Id of the ``vocabulary`` entry that ``text`` names, or None"""
+    term = normalize_term(text)
+    if not term:
+        return None
+    ids_by_term = _current(vocabulary)[0]
+    entry_id = ids_by_term.get(term)
+    if entry_id is None:
+        entry_id = ids_by_term.get(transliterate(term))
+    return entry_id
+
+
+def canonical_name(vocabulary, entry_id):
+    return _current(vocabulary)[1].get(entry_id)
+
+
+def resolve_crop(text):
+    return resolve('crop', text)
+
+
+def resolve_disease(text):
+    return resolve('disease', text)
+
+
+def canonical_disease_name(text):
+    """Canonical name of the disease ``text`` names, or ``text`` itself if unknown"""
+    disease_id = resolve_disease(text)
+    return text if disease_id is None else canonical_name('disease', disease_id)
+
+
+def relink_records(vocabulary):
+    """
+    Re-resolve every distinct free-text value of ``vocabulary``'s records
+
+    One UPDATE per distinct value whose rows point elsewhere; returns rows changed.
+    """
+    entry_field = VOCABULARIES[vocabulary][2]
+    clear_vocabulary_cache(vocabulary)
+    changed = 0
+    for model, text_field in RECORDS[vocabulary]:
+        texts = model.objects.order_by().values_list(text_field, flat=True).distinct()
+        for text in list(texts):
+            entry_id = resolve(vocabulary, text)
+            changed += model.objects.filter(**{text_field: text}).exclude(**{entry_field: entry_id}).update(
+                **{entry_field: entry_id}
+            )
+    if changed:
+        # queryset.update() skips model signals
+        bump_generation('dashboard')
+        bump_generation('crop-issue-stats')
+    return changed
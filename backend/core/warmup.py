@@ -0,0 +1,116 @@
+"""
+Warm-up on app load and periodic precomputation
+
+``on_startup`` is called from akyl_jer/wsgi.py and asgi.py once the app has
+loaded. When WARMUP_ON_STARTUP is set it:
+
+- opens a connection to every configured database on the loading thread,
+  which is the thread that serves requests in sync WSGI workers (keep
+  CONN_MAX_AGE > 0 so it stays open; load the app per worker, not in a
+  pre-forking master)
+- primes the district code map and the farm coordinate index
+- precomputes the dashboard summary and bundle for every district and for
+  the whole country, and the row counts of the unfiltered admin changelists
+  over large tables
+
+and starts a daemon thread that repeats the precomputation every
+DASHBOARD_PRECOMPUTE_SECONDS, so readers rarely build them on a request.
+Only payloads missing from the shared cache are built, i.e. those whose
+generation was bumped by a write or that expired; the others, including
+those another process already rebuilt, are left alone.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .admin import precompute_admin_counts
+from .dashboard import cached_bundle, cached_summary
+from .geo import farm_index
+from .lookups import prime_district_cache
+from .models import District
+
+
+logger = logging.getLogger(__name__)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def open_connections():
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def prime_lookups():
+    prime_district_cache()
+    farm_index.arrays()
+
+
+def precompute_dashboards():
+    """Cache the dashboard payloads of every district that aren't cached yet; returns payloads checked"""
+    codes = [None] + list(District.objects.values_list('code', flat=True))
+    for code in codes:
+        cached_summary(code)
+        cached_bundle(code)
+    return len(codes) * 2
+
+
+def precompute():
+    return precompute_dashboards() + precompute_admin_counts()
+
+
+def warm_up():
+    open_connections()
+    prime_lookups()
+    return precompute()
+
+
+class PeriodicScheduler:
+    """Daemon thread running ``task`` every ``interval`` seconds until stopped"""
+
+    def __init__(self, task, interval):
+        self.task = task
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='precompute-scheduler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join(timeout=self.interval)
+
+    def _loop(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                close_old_connections()
+                self.task()
+            except Exception:
+                logger.exception("Scheduled precomputation failed")
+
+
+def start_scheduler():
+    global _scheduler
+    interval = settings.DASHBOARD_PRECOMPUTE_SECONDS
+    with _scheduler_lock:
+        if _scheduler is None and interval > 0:
+            _scheduler = PeriodicScheduler(precompute, interval)
+            _scheduler.start()
+    return _scheduler
+
+
+def on_startup():
+    """Warm the process and start periodic precomputation if WARMUP_ON_STARTUP is set"""
+    if not settings.WARMUP_ON_STARTUP:
+        return
+    try:
+        built = warm_up()
+    except Exception:
+        # A cold start is slower, not broken; don't keep the app from loading
+        logger.exception("Warm-up failed")
+    else:
+        logger.info("Warm-up precomputed %s payloads", built)
+    start_scheduler()